@@ -22,10 +22,11 @@
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 
 import copy
+import hashlib
 import json
 import os
-import re
 import sys
+import time
 import uuid
 from pathlib import Path
 
@@ -34,19 +35,11 @@ from . import SpchtUtility
 from .SpchtUtility import if_possible_make_this_numerical, insert_list_into_str, schema_validation, regex_validation
 
 from . import SpchtErrors
-try:
-    from termcolor import colored  # only needed for debug print
-except ModuleNotFoundError:
-    def colored(text, *args):
-        return text  # throws args away returns non colored text
+from Spcht.Utils.local_tools import colored  # only needed for debug print, imports termcolor on first use
 
 import logging
 logger = logging.getLogger(__name__)
-
-try:
-    import rdflib
-except ImportError:
-    logger.warning("RDFLib import error in Spcht, limits function")
+# ? rdflib is only imported by SpchtThird.convert2rdflib, Spcht itself works fine without it
 
 # ! comment about the spcht structure
 """ 26.11.2021
@@ -62,6 +55,10 @@ annoyed me greatly when creating the SpchtBuilder utility, although, i am increa
 i am sorry - JPK
 """
 
+# ? referenced maps like languages.json are used by many nodes and many Spcht instances, key is the absolute path,
+# ? value is (mtime, size, parsed json) so a changed file gets read again
+_REF_FILE_CACHE = {}
+
 
 class Spcht:
     def __init__(self, filename=None, schema_path=None, debug=False, log_debug=False):
@@ -75,9 +72,14 @@ class Spcht:
         self._debug = debug
         self.default_fields = ['fullrecord']
         self.descriptor_file = None
+        self._input_files = []  # every file that went into the loaded descriptor, descriptor first
+        self._ref_cache = {}  # referenced files of the current descriptor load, absolute path: parsed json
         self._raw_dict = None  # processing data
         self._m21_dict = None
+        self._deadline = None  # time.monotonic() value after which the current record is abandoned
         self._schema_path = schema_path
+        self._node_filter = None  # indices of the nodes whose triples are wanted, None for all
+        self.last_subject = None  # subject of the most recently processed record, even if it gave no triples
         self.name = None
         if filename is not None:
             if not self.load_descriptor_file(filename):
@@ -130,6 +132,53 @@ class Spcht:
                 raise TypeError("An element in the list is not a string")
         self._default_fields = list_of_strings
 
+    @property
+    def id_field(self):
+        """
+        The field of the raw data that contains the identifier, None if no descriptor is loaded
+
+        :rtype: str or None
+        """
+        if not self._DESCRI:
+            return None
+        return self._DESCRI['id_field']
+
+    @property
+    def descriptor(self):
+        """
+        The loaded descriptor with all references resolved, None if nothing is loaded. Meant for reading only, changes
+        to it change the processing
+
+        :rtype: dict or None
+        """
+        return self._DESCRI
+
+    @property
+    def node_filter(self):
+        """
+        Indices of the root nodes whose triples process_data returns, None means all. Mandatory nodes outside of the
+        filter are still checked so a record gets dismissed exactly like with all nodes
+
+        :rtype: set or None
+        """
+        return self._node_filter
+
+    @node_filter.setter
+    def node_filter(self, indices):
+        self._node_filter = None if indices is None else set(indices)
+
+    @property
+    def descriptor_hash(self):
+        """
+        Hash of the loaded descriptor with all references resolved, changes whenever the mapping could produce
+        different triples. None if no descriptor is loaded
+
+        :rtype: str or None
+        """
+        if not self._DESCRI:
+            return None
+        return hashlib.sha256(json.dumps(self._DESCRI, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
     @property
     def debug(self):
         """
@@ -181,7 +230,7 @@ class Spcht:
     def __iter__(self):
         return SpchtIterator(self)
 
-    def process_data(self, raw_dict, subject, marc21="fullrecord", marc21_source="dict"):
+    def process_data(self, raw_dict, subject, marc21="fullrecord", marc21_source="dict", time_budget=None):
         """
             takes a raw solr query and converts it to a list of sparql queries to be inserted in a triplestore
             per default it assumes there is a marc entry in the solrdump but it can be provided directly
@@ -191,6 +240,7 @@ class Spcht:
             :param str subject: beginning of the assigned subject all entries become triples of
             :param str marc21: the raw_dict dictionary key that contains additional marc21 data
             :param str marc21_source: source for marc21 data
+            :param float time_budget: maximum time in seconds the record may take, None for no limit
             :return: a list of tuples with 4 entries (subject, predicat, object, bit) - bit = 1 -> object is another triple. Returns True if absolutly nothing was matched but the process was a success otherwise. False if something didnt worked
             :rtype: list or bool
         """
@@ -201,6 +251,10 @@ class Spcht:
         # most elemental check
         if not self:
             return False
+        # ? the budget is checked cooperatively at the start of every node, a single runaway regex can only be stopped
+        # ? by the timeout of the 'regex' engine
+        self._deadline = time.monotonic() + time_budget if time_budget else None
+        self.last_subject = None
         if raw_dict:
             self._raw_dict = raw_dict
         # Preparation of Data to make it more handy in the further processing
@@ -226,7 +280,7 @@ class Spcht:
             # ? what if there are just no marc data and we know that in advance?
             # * i leave this cause, well, its 2021 and of course this exact thing happened, yeah?
 
-        if 'rdflib' in sys.modules and isinstance(subject, rdflib.URIRef):
+        if 'rdflib' in sys.modules and isinstance(subject, sys.modules['rdflib'].URIRef):
             subject = subject.toPython()
         elif isinstance(subject, SpchtThird):
             subject = subject.content
@@ -254,11 +308,17 @@ class Spcht:
             raise ValueError("Ressource ID could not be found, aborting this entry")
 
         main_subject = SpchtThird(subject+ressource, uri=True)
+        self.last_subject = main_subject.content
         triple_list = []
-        for node in self._DESCRI['nodes']:
+        for index, node in enumerate(self._DESCRI['nodes']):
+            filtered = self._node_filter is not None and index not in self._node_filter
+            if filtered and node['required'] != "mandatory":
+                continue
             # ! MAIN CALL TO PROCESS DATA
             try:
                 triples = self._recursion_node(node)
+            except SpchtErrors.RecordTimeoutError:
+                raise  # ? running out of time dooms the entire record, not just the node
             except Exception as e:
                 triples = None
                 logger.debug(f"_recursion_node throws Exception {e.__class__.__name__}: '{e}'")
@@ -269,6 +329,8 @@ class Spcht:
                     logger.info(f"NodeName '{node.get('name', '?')}' required field {node['field']} but its not present")
                     raise SpchtErrors.MandatoryError(f"Field {node['field']} is a mandatory field but not present")
                 continue
+            if filtered:  # ? only there for the mandatory check
+                continue
             # ? check inner structure
             for dreier in triples:
                 if not dreier.subject:
@@ -276,6 +338,7 @@ class Spcht:
             triple_list += triples
         self._m21_dict = None
         self._raw_dict = None
+        self._deadline = None
         return triple_list  # * can be empty []
     # TODO: Error logs for known error entries and total failures as statistic
 
@@ -322,6 +385,102 @@ class Spcht:
         except Exception as e:
             print("File Error", e, file=self.std_err)
 
+    @staticmethod
+    def compiled_descriptor_path(filename: str) -> str:
+        """
+        The place where a compiled artifact of the given descriptor is looked for, 'default.spcht.json' becomes
+        'default.spchtc' in the same folder
+
+        :param str filename: path to a descriptor json
+        :return: path of the corresponding compiled descriptor
+        :rtype: str
+        """
+        base = str(filename)
+        for suffix in (".json", ".spcht"):
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        return base + SpchtConstants.COMPILED_SUFFIX
+
+    def export_compiled_descriptor(self, filename=None):
+        """
+        Writes the loaded, validated and fully resolved descriptor as single json artifact, stamped with modification
+        time, size and sha256 of every file that was used to build it (descriptor, referenced maps and the schema). As
+        long as none of those files change the artifact is loaded instead of the descriptor, skipping the validation
+        and all reference loading. The artifact carries a checksum of its own content, a damaged or edited one is
+        ignored
+
+        :param str filename: target path, defaults to the path given by compiled_descriptor_path
+        :return: the path of the written artifact, False if something went wrong
+        :rtype: str or bool
+        """
+        if not self:
+            return False
+        if filename is None:
+            filename = self.compiled_descriptor_path(self.descriptor_file)
+        try:
+            schema = self._schema_path if self._schema_path else SpchtUtility.DEFAULT_SCHEMA
+            artifact = {
+                "format": SpchtConstants.COMPILED_FORMAT,
+                "source": os.path.abspath(self.descriptor_file),
+                "inputs": [SpchtUtility.file_stamp(each) for each in dict.fromkeys(self._input_files + [str(schema)])],
+                "descriptor": self._DESCRI
+            }
+            artifact['checksum'] = self._compiled_checksum(artifact)
+            # ? write & rename, multiple processes might read the artifact at the same time
+            with open(f"{filename}.tmp", "w", encoding="utf-8") as artifact_file:
+                json.dump(artifact, artifact_file)
+            os.replace(f"{filename}.tmp", filename)
+            return filename
+        except (OSError, TypeError, ValueError) as e:
+            print("File Error", e, file=self.std_err)
+            logger.error(f"Could not write compiled descriptor {filename}: {e}")
+            return False
+
+    @staticmethod
+    def _compiled_checksum(artifact: dict) -> str:
+        # ? sha256 over everything but the checksum itself, keys sorted so the order of the dictionary does not matter
+        content = {key: value for key, value in artifact.items() if key != "checksum"}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _load_compiled_descriptor(self, filename: str, explicit=False) -> bool:
+        """
+        Loads a compiled artifact as written by export_compiled_descriptor if all stamped input files are unchanged.
+        An explicitly given artifact tolerates missing input files (a deployment might only ship the artifact), a
+        stale one is replaced by loading its source descriptor the normal way
+
+        :param str filename: path to a compiled artifact
+        :param bool explicit: True if the artifact was given directly instead of found next to the descriptor
+        :return: True if a descriptor was loaded, False if not
+        :rtype: bool
+        """
+        try:
+            with open(filename, "r", encoding="utf-8") as artifact_file:
+                artifact = json.load(artifact_file)
+            if artifact.get('format') != SpchtConstants.COMPILED_FORMAT:
+                logger.info(f"Compiled descriptor {filename} has an outdated format, ignoring it")
+                return self.load_descriptor_file(artifact['source']) if explicit else False
+            if artifact.get('checksum') != self._compiled_checksum(artifact):
+                logger.warning(f"Checksum of compiled descriptor {filename} does not match its content, ignoring it")
+                return False
+        except (OSError, ValueError, AttributeError, KeyError) as e:
+            logger.warning(f"Compiled descriptor {filename} could not be read: {e}")
+            return False
+        for stamp in artifact['inputs']:
+            status = SpchtUtility.file_stamp_matches(stamp)
+            if status is None and explicit:
+                logger.info(f"Input '{stamp['path']}' of compiled descriptor {filename} is missing, trusting the artifact")
+                continue
+            if not status:
+                logger.info(f"Compiled descriptor {filename} is stale, '{stamp['path']}' changed")
+                if explicit and os.path.exists(artifact['source']):
+                    return self.load_descriptor_file(artifact['source'])
+                return False
+        self.debug_print("Compiled descriptor:", colored(filename, "cyan"))
+        self._DESCRI = artifact['descriptor']
+        self._input_files = [stamp['path'] for stamp in artifact['inputs']]
+        self.descriptor_file = artifact['source']
+        return True
+
     def load_json(self, filename):
         """
             Encapsulates the loading of a json file into a simple command to save  lines
@@ -385,6 +544,13 @@ class Spcht:
         """
         # returns None if something is amiss, returns the descriptors as dictionary
         # ? turns out i had to add some complexity starting with the "include" mapping
+        if str(filename).endswith(SpchtConstants.COMPILED_SUFFIX):
+            return self._load_compiled_descriptor(filename, explicit=True)
+        compiled = self.compiled_descriptor_path(filename)
+        if os.path.exists(compiled) and self._load_compiled_descriptor(compiled):
+            return True
+        self._input_files = [os.path.abspath(filename)]
+        self._ref_cache = {}
         descriptor = self.load_json(filename)
         spcht_path = Path(filename)
         self.debug_print("Local Dir:", colored(os.getcwd(), "blue"))
@@ -395,6 +561,8 @@ class Spcht:
         if not status:
             self.debug_print(colored(msg, "red"))
             return False
+        if descriptor.get('regex_engine') == "regex" and SpchtUtility.NOREGEX:
+            logger.warning("load_spcht: descriptor wants regex_engine 'regex' but the module is not installed, using 're' without timeouts")
         # old method of validation, replaced by jsonSchema
         # if not SpchtUtility.check_format(descriptor, base_path=spcht_path.parent):
         #     return False
@@ -404,6 +572,7 @@ class Spcht:
         for item in descriptor['nodes']:
             try:
                 a_node = self._load_ref_node(item, str(spcht_path.parent))
+                self._inherit_regex_settings(a_node, descriptor.get('regex_engine'), descriptor.get('regex_timeout'))
                 new_node.append(a_node)
             except TypeError as that_type:
                 self.debug_print("spcht_ref-type", colored(that_type, "red"))
@@ -421,6 +590,7 @@ class Spcht:
             self.debug_print(f"Regex validation failed, message: {msg}")
             return False
         descriptor['nodes'] = new_node  # replaces the old node with the new, enriched ones
+        self._ref_cache = {}
         self._DESCRI = descriptor
         self.descriptor_file = filename
         return True
@@ -451,7 +621,7 @@ class Spcht:
             self.debug_print("Reference:", colored(file_path, "green"))
             try:
                 file_place = os.path.normpath(os.path.join(base_path, file_path))
-                map_dict = self.load_json(file_place)
+                map_dict = self._load_ref_json(file_place)
                 if not map_dict:
                     raise SpchtErrors.OperationalError(f"Could not load referenced node {file_place}")
             except FileNotFoundError:
@@ -461,14 +631,16 @@ class Spcht:
             if not isinstance(map_dict, dict):  # we expect a simple, flat dictionary, nothing else
                 raise TypeError("Structure of loaded Mapping Settings is incorrect")
             # ! this here is the actual logic that does the thing:
-            # there might no mapping key at all
-            node_dict['mapping'] = node_dict.get('mapping', {})
-            for key, value in map_dict.items():
-                if not isinstance(value, str):  # only flat dictionaries, no nodes
-                    self.debug_print("spcht_map")
-                    raise TypeError("Value of mapping_settings is not a string")
-                if key not in node_dict['mapping']:  # existing keys have priority
-                    node_dict['mapping'][key] = value
+            if not all(isinstance(value, str) for value in map_dict.values()):  # only flat dictionaries, no nodes
+                self.debug_print("spcht_map")
+                raise TypeError("Value of mapping_settings is not a string")
+            if not node_dict.get('mapping'):
+                # * without own entries every node shares the one parsed map, nothing in the processing writes to it
+                node_dict['mapping'] = map_dict
+            else:
+                node_dict['mapping'] = dict(node_dict['mapping'])
+                for key, value in map_dict.items():  # existing keys have priority, order matters for $regex
+                    node_dict['mapping'].setdefault(key, value)
             # clean up mapping_settings node
             del (node_dict['mapping_settings']['$ref'])
             if len(node_dict['mapping_settings']) <= 0:
@@ -477,24 +649,79 @@ class Spcht:
 
         if 'joined_map_ref' in node_dict:  # mostly boiler plate from above, probably not my brightest day
             file_path = node_dict['joined_map_ref']
-            map_dict = self.load_json(os.path.normpath(os.path.join(base_path, file_path)))
+            file_place = os.path.normpath(os.path.join(base_path, file_path))
+            map_dict = self._load_ref_json(file_place)
             if not isinstance(map_dict, dict):
                 raise TypeError("Structure of loaded joned_map_reference is not a dictionary")
-            node_dict['joined_map'] = node_dict.get('joned_map', {})
-            for key, value in map_dict.items():
-                # 10/2021: after introducing json-schema its questionable whether i should check such things or not
-                # because i could easily do this with a two liner: one = map_dict :: one.update(node_dict['joined_map']
-                if not isinstance(value, (str, int, float)):
-                    self.debug_print("spcht_map")
-                    raise TypeError("Value of joined_map is not a string, integer or float")
-                if not isinstance(key, (str, int, float)):  # is that even possible in json? --- its all 'numbers' dear younger self
-                    self.debug_print("spcht_map")
-                    raise TypeError("Key of joined_map is not a string, integer or float")
-                node_dict['joined_map'][key] = node_dict['joined_map'].get(key, value)   # ? not replacing existing keys
+            # 10/2021: after introducing json-schema its questionable whether i should check such things or not
+            # because i could easily do this with a two liner: one = map_dict :: one.update(node_dict['joined_map']
+            # ? keys of a json object are always strings, only the values need checking
+            if not all(isinstance(value, (str, int, float)) for value in map_dict.values()):
+                self.debug_print("spcht_map")
+                raise TypeError("Value of joined_map is not a string, integer or float")
+            if not node_dict.get('joined_map'):
+                node_dict['joined_map'] = map_dict  # shared just like the mapping above
+            else:
+                node_dict['joined_map'] = dict(node_dict['joined_map'])
+                for key, value in map_dict.items():
+                    node_dict['joined_map'].setdefault(key, value)  # ? not replacing existing keys
             del node_dict['joined_map_ref']
 
         return node_dict  # whether nothing has had changed or not, this holds true
 
+    @staticmethod
+    def _inherit_regex_settings(node_dict: dict, engine=None, timeout=None):
+        """
+        Hands the global 'regex_engine' and 'regex_timeout' down to a node and all its children (fallback, sub_nodes
+        and sub_data), values a node defines itself take precedence and are inherited further down from there
+
+        :param dict node_dict: a node dictionary, gets changed in place
+        :param str engine: regex engine of the parent, either 're' or 'regex'
+        :param float timeout: regex timeout of the parent in seconds
+        :return: nothing, the node is changed in place
+        """
+        if node_dict.get('regex_engine') == "regex" and SpchtUtility.NOREGEX:
+            logger.warning(f"Node '{node_dict.get('name', node_dict.get('field', '?'))}' wants regex_engine 'regex' but the module is not installed")
+        if engine is not None:
+            node_dict.setdefault('regex_engine', engine)
+        if timeout is not None:
+            node_dict.setdefault('regex_timeout', timeout)
+        engine, timeout = node_dict.get('regex_engine'), node_dict.get('regex_timeout')
+        if isinstance(node_dict.get('fallback'), dict):
+            Spcht._inherit_regex_settings(node_dict['fallback'], engine, timeout)
+        for key in ('sub_nodes', 'sub_data'):
+            for child in node_dict.get(key, []):
+                Spcht._inherit_regex_settings(child, engine, timeout)
+
+    def _load_ref_json(self, file_place: str):
+        """
+        Loads a referenced json file of a descriptor only once, during a single descriptor load the file is taken from
+        a load-scoped cache, across loads and Spcht instances a process wide cache is used as long as modification time
+        and size of the file stay the same. Every caller gets the very same object, it must not be changed
+
+        :param str file_place: path to the referenced file
+        :return: the parsed json or None if it could not be loaded
+        :rtype: dict or list or None
+        """
+        abs_path = os.path.abspath(file_place)
+        if abs_path in self._ref_cache:
+            return self._ref_cache[abs_path]
+        self._input_files.append(abs_path)
+        try:
+            stats = os.stat(abs_path)
+            cached = _REF_FILE_CACHE.get(abs_path)
+            if cached and cached[0] == stats.st_mtime and cached[1] == stats.st_size:
+                self._ref_cache[abs_path] = cached[2]
+                return cached[2]
+        except FileNotFoundError:
+            stats = None  # load_json takes care of the error reporting
+        self.debug_print("Loading Reference:", colored(file_place, "green"))
+        ref_data = self.load_json(file_place)
+        if ref_data is not None and stats is not None:
+            _REF_FILE_CACHE[abs_path] = (stats.st_mtime, stats.st_size, ref_data)
+        self._ref_cache[abs_path] = ref_data
+        return ref_data
+
     def _recursion_node(self, sub_dict: dict):
         """
         Main function of the data processing, this decides how to handle a specific node, gets also called recursivly
@@ -513,6 +740,9 @@ class Spcht:
         # UPDATE 03.08.2020 : i made it so that this returns a tuple of the predicate and the actual value
         # this is so cause i rised the need for manipulating the used predicate for that specific object via
         # mappings, it seemed most forward to change all the output in one central place, and that is here
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.debug_print(colored("✗ time budget exceeded", "red"))
+            raise SpchtErrors.RecordTimeoutError(f"Time budget exceeded before node '{sub_dict.get('name', sub_dict.get('field', '?'))}'")
         if sub_dict.get('name', "") == "$Identifier$":
             self.debug_print(colored("ID Source:", "red"), end=" ")
         else:
@@ -570,7 +800,8 @@ class Spcht:
             main_value = self._node_postprocessing(main_value, sub_dict)  # post_processing should not delete values
             # in the absolute worst case we have some aggressive cut and we end with a list of empty strings
             if 'mapping' in sub_dict:
-                main_value = self._node_mapping(main_value, sub_dict['mapping'], sub_dict.get('mapping_settings', None))
+                main_value = self._node_mapping(main_value, sub_dict['mapping'], sub_dict.get('mapping_settings', None),
+                                                sub_dict.get('regex_engine', "re"), sub_dict.get('regex_timeout'))
             if not main_value:
                 return self._call_fallback(sub_dict)  # ? EXIT 5
             if 'insert_into' in sub_dict:
@@ -673,7 +904,8 @@ class Spcht:
                 else:
                     logger.error(f"SPCHT.node_preprocessing - unable to handle data type in list {type(item)}")
                     raise TypeError(f"SPCHT.node_preprocessing - Found a {type(item)} in the value list")
-                finding = re.search(sub_dict[f'{key_prefix}match'], str(any_text))
+                finding = SpchtUtility.regex_search(sub_dict[f'{key_prefix}match'], str(any_text),
+                                                    sub_dict.get('regex_engine', "re"), sub_dict.get('regex_timeout'))
                 if finding:
                     list_of_returns.append(item)  # ? extend ?
             return list_of_returns
@@ -710,7 +942,9 @@ class Spcht:
                     if key_prefix != "":
                         self._add_to_save_as(item.content, sub_dict)
                 else:
-                    pure_filter = re.sub(sub_dict.get(f'{key_prefix}cut', ""), sub_dict.get(f'{key_prefix}replace', ""), str(item.content))
+                    pure_filter = SpchtUtility.regex_sub(sub_dict.get(f'{key_prefix}cut', ""),
+                                                         sub_dict.get(f'{key_prefix}replace', ""), str(item.content),
+                                                         sub_dict.get('regex_engine', "re"), sub_dict.get('regex_timeout'))
                     rest_str = sub_dict.get(f'{key_prefix}prepend', "") + pure_filter + sub_dict.get(f'{key_prefix}append', "")
                     if key_prefix != "":
                         self._add_to_save_as(pure_filter, sub_dict)
@@ -720,7 +954,7 @@ class Spcht:
             logger.info("Postprocessing got a non-list value and forwarded it, that should happen")
             return value
 
-    def _node_mapping(self, value, mapping, settings=None):
+    def _node_mapping(self, value, mapping, settings=None, engine="re", timeout=None):
         """
         Used in the processing after filtering via match but before the postprocesing. This replaces every matched
         value from a dictionary or the default if no match. Its possible to set the default to inheritance to pass
@@ -729,6 +963,8 @@ class Spcht:
         :param list of SpchtThird value: the found value in the source, can be also a list of values, usually strings
         :param dict mapping: a dictionary of key:value pairs provided to replace parameter value one by one
         :param dict settings: a set list of settings that were defined in the node
+        :param str engine: regex engine used for '$regex' mappings, either 're' or 'regex'
+        :param float timeout: maximum time in seconds for a single regex mapping search
         :return: returns the same number of values as input, might replace all non_matches with the default value. It CAN return None if something funky is going on with the settings and mapping
         :rtype: list of SpchtThird
         """
@@ -765,10 +1001,10 @@ class Spcht:
             else:  # ! regex call, probably somewhat expensive
                 patterns = {}
                 for each in mapping:
-                    patterns[re.compile(each)] = each
+                    patterns[SpchtUtility.regex_compile(each, engine)] = each
                 for item in value:
                     matching = None
-                    if any((match := regex.search(item.content)) for regex in patterns):
+                    if any((match := SpchtUtility.regex_search(regex, str(item.content), engine, timeout)) for regex in patterns):
                         matching = mapping[patterns[match.re]]
                     if matching:
                         response_list.append(SpchtThird(matching))
@@ -870,7 +1106,8 @@ class Spcht:
                 sobject = Spcht._node_preprocessing([field[i]], sub_dict)  # filters out entries
                 if not sobject:
                     continue
-                sobject = self._node_mapping(sobject, sub_dict.get('mapping'), sub_dict.get('mapping_settings'))
+                sobject = self._node_mapping(sobject, sub_dict.get('mapping'), sub_dict.get('mapping_settings'),
+                                             sub_dict.get('regex_engine', "re"), sub_dict.get('regex_timeout'))
                 sobject = self._node_postprocessing(sobject, sub_dict)
                 if len(sobject) == 1:
                     sobject = sobject[0]
@@ -917,6 +1154,9 @@ class Spcht:
                 for every in others:
                     if every in each:
                         pseudo_dict[every] = each[every]
+                for every in ('regex_engine', 'regex_timeout'):  # the additional fields share the regex setup of the node
+                    if every in sub_dict:
+                        pseudo_dict[every] = sub_dict[every]
                 additional_value = self.extract_dictmarc_value(pseudo_dict)
                 # using preprocessing to filter out certain values gives quite a lot of power to this kind of process
                 # if used right that is..i see a lot of error potential here
@@ -1084,6 +1324,8 @@ class Spcht:
                     for triple in sub_values:
                         triple.subject = copy.copy(sub_subject)
                     return_quadros += sub_values
+            except SpchtErrors.RecordTimeoutError:
+                raise
             except Exception as e:
                 logger.warning(f"{self.name}SubNode throws Exception {e.__class__.__name__}: '{e}'")
                 print(colored("✗Processing of sub_node failed.", "red"))
@@ -1106,6 +1348,7 @@ class Spcht:
             if not self._handle_if(sub_dict):
                 return self._call_fallback(sub_dict)  # ? EXIT 4 # might use if_condition globally
         colibri = Spcht()  # TODO1: just create and save a separate Spcht for ever sub_data node and use them again
+        colibri._deadline = self._deadline  # the sub data shares the time budget of the record
         sub_data_list = self.extract_dictmarc_value(sub_dict, raw=True)
         if sub_data_list:
             self.debug_print(colored(f"length={len(sub_data_list)} Datapoints", "yellow"), end="...")
@@ -1451,6 +1694,7 @@ class SpchtThird:
         return ""
 
     def convert2rdflib(self):
+        import rdflib
         if self.uri:
             return rdflib.URIRef(self.content)
         else:
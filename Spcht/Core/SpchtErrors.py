@@ -83,3 +83,17 @@ class MandatoryError(Exception):
     def __repr__(self):
         return "a field that was classified as mandatory was not present, therefore failing the entire chain"
 
+
+class RecordTimeoutError(Exception):
+    def __repr__(self):
+        return "processing of a single record took longer than its time budget and was abandoned"
+
+
+class RegexTimeoutError(RecordTimeoutError):
+    def __repr__(self):
+        return "a regex of the descriptor did not finish within its configured timeout, the record cannot be processed"
+
+
+class IsqlError(OperationalError):
+    def __repr__(self):
+        return "the isql interface of virtuoso reported an error or ended unexpectedly"
@@ -22,28 +22,35 @@
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+import functools
+import hashlib
+import importlib.util
 import itertools
 import json
 import os
 import re
 import sys
 import logging
-import pymarc
 from pathlib import Path
-from pymarc.exceptions import RecordLengthInvalid, RecordLeaderInvalid, BaseAddressNotFound, BaseAddressInvalid, \
-    RecordDirectoryInvalid, NoFieldsFound
-from jsonschema import validate, ValidationError, SchemaError, RefResolutionError
+# ? pymarc, jsonschema, rdflib and regex are imported by the functions that use them, a cli call that only looks
+# ? at a work order should not wait for all of them, find_spec only looks whether they are there
 # own imports
-from Spcht.Utils.SpchtConstants import SPCHT_BOOL_OPS
+from Spcht.Utils.SpchtConstants import SPCHT_BOOL_OPS, TERM_DICT_MAGIC
+import Spcht.Core.SpchtErrors as SpchtErrors
 
 logger = logging.getLogger(__name__)
 
-try:
-    NORDF = False
-    import rdflib
-    from rdflib.namespace import DC, DCTERMS, DOAP, FOAF, SKOS, OWL, RDF, RDFS, VOID, XMLNS, XSD
-except ImportError:
-    NORDF = True
+DEFAULT_SCHEMA = Path(__file__).parent.parent / "SpchtSchema.json"
+VALIDATION_CACHE_SIZE = 256
+_SCHEMA_VALIDATORS = {}  # schema path or content hash: (file version, validator)
+_VALIDATION_RESULTS = {}  # (schema key, descriptor hash): (bool, msg) as returned by schema_validation
+
+NOREGEX = importlib.util.find_spec("regex") is None  # drop in replacement for 're' that knows timeouts
+if NOREGEX:
+    logger.info("No 'regex' module available, regex_engine 'regex' will fall back to 're' without timeouts")
+
+NORDF = importlib.util.find_spec("rdflib") is None
+if NORDF:
     logger.info("No RDF Library avaible, some functions will not work")
 
 
@@ -256,24 +263,88 @@ def slice_marc_shorthand(string: str) -> tuple:
         return None, False  # this is a tuple right ?
 
 
-def validate_regex(regex_str):
+def validate_regex(regex_str, engine="re"):
     """
     Checks if a given string is valid regex
 
     :param str regex_str: a suspicios string that may or may not be valid regex
+    :param str engine: the regex engine the string is meant for, either 're' or 'regex'
     :rtype: bool
     :return: True if valid regex was give, False in case of TypeError or re.error
     """
     # another of those super basic function where i am not sure if there isn't an easier way
+    errors = (re.error, TypeError)  # TypeError for the string not being one
+    if engine == "regex" and not NOREGEX:
+        import regex as regex_lib
+        errors += (regex_lib.error, )  # regex.error is not a child of re.error
     try:
-        re.compile(regex_str)
+        regex_compile(regex_str, engine)
         return True
-    except re.error:
-        return False
-    except TypeError:  # for the string not being one
+    except errors:
         return False
 
 
+def regex_compile(pattern: str, engine="re"):
+    """
+    Compiles the pattern with the choosen engine. 'regex' silently falls back to the standard library if the module
+    is not installed, the loading of a descriptor already warns about that
+
+    :param str pattern: a regex pattern
+    :param str engine: either 're' or 'regex'
+    :return: a compiled pattern of the respective engine
+    """
+    # both libraries keep a cache of compiled patterns, so calling this for every value is not as bad as it looks
+    if engine == "regex" and not NOREGEX:
+        import regex as regex_lib
+        return regex_lib.compile(pattern)
+    return re.compile(pattern)
+
+
+def regex_search(pattern, text: str, engine="re", timeout=None):
+    """
+    re.search with a safety net, if the engine is 'regex' and a timeout is given a search that takes longer than
+    the timeout is aborted. The standard 're' engine cannot be interrupted, the timeout is ignored there
+
+    :param str or re.Pattern pattern: a regex pattern or an already compiled pattern
+    :param str text: the string that gets searched
+    :param str engine: either 're' or 'regex'
+    :param float timeout: maximum time in seconds a single search may take
+    :return: a match object or None
+    :raises SpchtErrors.RegexTimeoutError: if the search took longer than timeout
+    """
+    if isinstance(pattern, str):
+        pattern = regex_compile(pattern, engine)
+    if timeout is None or isinstance(pattern, re.Pattern):
+        return pattern.search(text)
+    try:
+        return pattern.search(text, timeout=timeout)
+    except TimeoutError:
+        raise SpchtErrors.RegexTimeoutError(f"'{pattern.pattern[:80]}' exceeded {timeout}s on a {len(text)} chars string")
+
+
+def regex_sub(pattern, replacement: str, text: str, engine="re", timeout=None):
+    """
+    re.sub with the same safety net as regex_search
+
+    :param str or re.Pattern pattern: a regex pattern or an already compiled pattern
+    :param str replacement: the replacement for every occurrence of pattern
+    :param str text: the string that gets changed
+    :param str engine: either 're' or 'regex'
+    :param float timeout: maximum time in seconds the entire substitution may take
+    :return: the changed string
+    :rtype: str
+    :raises SpchtErrors.RegexTimeoutError: if the substitution took longer than timeout
+    """
+    if isinstance(pattern, str):
+        pattern = regex_compile(pattern, engine)
+    if timeout is None or isinstance(pattern, re.Pattern):
+        return pattern.sub(replacement, text)
+    try:
+        return pattern.sub(replacement, text, timeout=timeout)
+    except TimeoutError:
+        raise SpchtErrors.RegexTimeoutError(f"'{pattern.pattern[:80]}' exceeded {timeout}s on a {len(text)} chars string")
+
+
 def marc21_fixRecord(record: str, validation=False, record_id=0, replace_method='decimal'):
     """
     Not my own work. Attributed to Bernhard Hering (SLUB). Converts the raw string coming from a solr source into
@@ -303,6 +374,9 @@ def marc21_fixRecord(record: str, validation=False, record_id=0, replace_method=
         marcFullRecordFixed = marcFullRecordFixed.replace(replace_methods.get(replace_method)[0][i],
                                                           replace_methods.get(replace_method)[1][i])
     if validation:
+        import pymarc
+        from pymarc.exceptions import RecordLengthInvalid, RecordLeaderInvalid, BaseAddressNotFound, \
+            BaseAddressInvalid, RecordDirectoryInvalid, NoFieldsFound
         # ? we only really care if this throws an error, this is why nothing happens
         try:
             reader = pymarc.MARCReader(marcFullRecordFixed.encode('utf8'), utf8_handling='replace')
@@ -417,6 +491,7 @@ def marc2list(marc_full_record, validation=True, replace_method='decimal', expli
     """
     clean_marc = marc21_fixRecord(marc_full_record, validation=validation, replace_method=replace_method)
     if isinstance(clean_marc, str):  # would be boolean if something bad had happen
+        import pymarc
         reader = pymarc.MARCReader(clean_marc.encode('utf-8'))
         marc_list = []
         for record in reader:
@@ -503,7 +578,7 @@ def quickSparqlEntry(quadro):
     return f"{str(quadro.subject)} {str(quadro.predicate)} {str(quadro.sobject)} . \n"
 
 
-def process2RDF(quadro_list: list, export_format_type="turtle", export=True) -> str or rdflib.Graph:
+def process2RDF(quadro_list: list, export_format_type="turtle", export=True):
     """
         Leverages RDFlib to format a given list of tuples into an RDF Format
         See https://rdflib.readthedocs.io/en/stable/apidocs/rdflib.plugins.serializers.html for further information about the used
@@ -518,6 +593,7 @@ def process2RDF(quadro_list: list, export_format_type="turtle", export=True) ->
     if NORDF:  # i am quite sure that this is not the way to do such  things
         logger.critical("process2RDF - failure to convert to RDF")
         raise ImportError("No RDF Library avaible, cannot process SpchtUtility.process2RDF")
+    import rdflib
     graph = rdflib.Graph()
     for each in quadro_list:
         try:  # ! using an internal rdflib function is clearly dirty af
@@ -535,6 +611,289 @@ def process2RDF(quadro_list: list, export_format_type="turtle", export=True) ->
         return f"serialisation couldnt be completed - {e}"
 
 
+_IRI_FORBIDDEN = re.compile(r'[<>" {}|\\^`\x00-\x20]')
+_LANGUAGE_TAG = re.compile(r'^[a-zA-Z]+(-[a-zA-Z0-9]+)*$')
+_LITERAL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r"})
+_XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+@functools.lru_cache(maxsize=65536)
+def is_valid_iri(iri: str) -> bool:
+    """
+    Checks if a string can be written as IRI in N-Triples or Turtle, the same set of characters rdflib refuses, subjects
+    and predicates repeat a lot so the results are cached
+
+    :param str iri: the IRI without the enclosing <>
+    :return: True if the iri can be written as is
+    :rtype: bool
+    """
+    return bool(iri) and not _IRI_FORBIDDEN.search(iri)
+
+
+def rdf_term(third) -> str or None:
+    """
+    Formats a single SpchtThird as N-Triples term, numbers and booleans without annotation get the xsd datatype rdflib
+    would give them
+
+    :param SpchtThird third: subject, predicate or object of a SpchtTriple
+    :return: the term as string or None if it cannot be expressed
+    :rtype: str or None
+    """
+    if third.uri:
+        if not is_valid_iri(str(third.content)):
+            return None
+        return f"<{third.content}>"
+    content = third.content
+    datatype = third.annotation
+    if isinstance(content, bool):
+        content = "true" if content else "false"
+        datatype = datatype or f"{_XSD}boolean"
+    elif isinstance(content, int):
+        datatype = datatype or f"{_XSD}integer"
+    elif isinstance(content, float):
+        datatype = datatype or f"{_XSD}double"
+    literal = '"' + str(content).translate(_LITERAL_ESCAPES) + '"'
+    if datatype:
+        if not is_valid_iri(datatype):
+            return None
+        return f"{literal}^^<{datatype}>"
+    if third.language:
+        if not _LANGUAGE_TAG.match(third.language):
+            return None
+        return f"{literal}@{third.language}"
+    return literal
+
+
+def write_rdf_stream(quadro_list: list, file_handle, export_format_type="nt") -> int:
+    """
+    Writes SpchtTriples straight to an open text file without building a rdflib.Graph first, meant to be called
+    repeatedly with the triples of one record at a time. Triples that cannot be expressed are reported to stderr and
+    skipped like process2RDF does, duplicates within one call are written only once
+
+    Both formats can be read by any turtle parser, 'nt' is one triple per line, 'turtle' groups the predicates of a
+    subject together which makes the files somewhat smaller
+
+    :param list quadro_list: list of SpchtTriple as provided by Spcht.process_data
+    :param file_handle: a file opened for writing text, preferably in utf-8
+    :param str export_format_type: 'nt' or 'turtle'
+    :return: number of triples written
+    :rtype: int
+    """
+    if export_format_type not in ("nt", "turtle"):
+        raise ValueError(f"write_rdf_stream knows only 'nt' and 'turtle', not '{export_format_type}'")
+    subjects = {}  # ? dictionaries are ordered, the order of the records stays intact
+    for each in quadro_list:
+        terms = rdf_term(each.subject), rdf_term(each.predicate), rdf_term(each.sobject)
+        if None in terms:
+            print(f"RDF Exception [write_rdf_stream] occured with {each.predicate} - cannot express {each}", file=sys.stderr)
+            continue
+        subjects.setdefault(terms[0], {})[terms[1:]] = None
+    written = 0
+    for subject, pairs in subjects.items():
+        written += len(pairs)
+        if export_format_type == "nt":
+            file_handle.writelines(f"{subject} {predicate} {sobject} .\n" for predicate, sobject in pairs)
+        else:
+            file_handle.write(f"{subject} " + " ;\n    ".join(f"{predicate} {sobject}" for predicate, sobject in pairs) + " .\n\n")
+    return written
+
+
+# ? record types of the term dictionary format, every record starts with one of those bytes
+_TD_PREFIX, _TD_IRI, _TD_LITERAL, _TD_TRIPLE = 1, 2, 3, 4
+
+
+def _varint(number: int) -> bytes:
+    chunk = bytearray()
+    while number > 0x7f:
+        chunk.append((number & 0x7f) | 0x80)
+        number >>= 7
+    chunk.append(number)
+    return bytes(chunk)
+
+
+def _read_varint(file_handle) -> int or None:
+    number = shift = 0
+    while True:
+        byte = file_handle.read(1)
+        if not byte:
+            return None
+        number |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return number
+        shift += 7
+
+
+class TermDictWriter:
+    """
+    Writes SpchtTriples in a compact binary form, every distinct term is written once and gets a number, triples are
+    only three numbers. IRIs are further split into namespace and local part with the namespaces numbered as well. Terms
+    are always written before the first triple that uses them so the file can be read as stream by read_term_dict
+
+    The terms are kept as their N-Triples representation (see rdf_term), reading the file needs no rdf parsing at all
+    """
+    def __init__(self, file_handle):
+        """
+        :param file_handle: a file opened for writing bytes, the header gets written right away
+        """
+        self.file = file_handle
+        self.prefixes = {}
+        self.terms = {}
+        self.file.write(TERM_DICT_MAGIC)
+
+    def _term_id(self, term: str) -> int:
+        if term in self.terms:
+            return self.terms[term]
+        self.terms[term] = len(self.terms)
+        if term[0] == "<":
+            iri = term[1:-1]
+            cut = max(iri.rfind("/"), iri.rfind("#")) + 1
+            prefix, local = iri[:cut], iri[cut:].encode("utf-8")
+            if prefix not in self.prefixes:
+                self.prefixes[prefix] = len(self.prefixes)
+                raw = prefix.encode("utf-8")
+                self.file.write(bytes((_TD_PREFIX,)) + _varint(len(raw)) + raw)
+            self.file.write(bytes((_TD_IRI,)) + _varint(self.prefixes[prefix]) + _varint(len(local)) + local)
+        else:
+            raw = term.encode("utf-8")
+            self.file.write(bytes((_TD_LITERAL,)) + _varint(len(raw)) + raw)
+        return self.terms[term]
+
+    def write(self, quadro_list: list) -> int:
+        """
+        Appends the triples, same rules as write_rdf_stream, unusable triples are reported and skipped and duplicates
+        within one call are written once
+
+        :param list quadro_list: list of SpchtTriple as provided by Spcht.process_data
+        :return: number of triples written
+        :rtype: int
+        """
+        written = set()
+        for each in quadro_list:
+            terms = rdf_term(each.subject), rdf_term(each.predicate), rdf_term(each.sobject)
+            if None in terms:
+                print(f"RDF Exception [TermDictWriter] occured with {each.predicate} - cannot express {each}", file=sys.stderr)
+                continue
+            ids = tuple(self._term_id(x) for x in terms)
+            if ids in written:
+                continue
+            written.add(ids)
+            self.file.write(bytes((_TD_TRIPLE,)) + _varint(ids[0]) + _varint(ids[1]) + _varint(ids[2]))
+        return len(written)
+
+
+def read_term_dict(file_handle):
+    """
+    Reads a file written by TermDictWriter, yields the triples as tuples of N-Triples terms, ready to be put in a
+    sparql query or a N-Triples file
+
+    :param file_handle: a file opened for reading bytes
+    :return: a generator of (subject, predicate, object) strings
+    :raises SpchtErrors.ParsingError: if the file is not a term dictionary or broken
+    """
+    if file_handle.read(len(TERM_DICT_MAGIC)) != TERM_DICT_MAGIC:
+        raise SpchtErrors.ParsingError("File is not a term dictionary of a known version")
+    prefixes, terms = [], []
+    while True:
+        kind = file_handle.read(1)
+        if not kind:
+            return
+        kind = kind[0]
+        if kind == _TD_TRIPLE:
+            ids = _read_varint(file_handle), _read_varint(file_handle), _read_varint(file_handle)
+            try:
+                yield terms[ids[0]], terms[ids[1]], terms[ids[2]]
+            except (IndexError, TypeError):
+                raise SpchtErrors.ParsingError(f"Triple references unknown terms {ids}")
+        elif kind == _TD_IRI:
+            prefix_id = _read_varint(file_handle)
+            length = _read_varint(file_handle)
+            if prefix_id is None or length is None or prefix_id >= len(prefixes):
+                raise SpchtErrors.ParsingError("Broken IRI record in term dictionary")
+            terms.append(f"<{prefixes[prefix_id]}{file_handle.read(length).decode('utf-8')}>")
+        elif kind in (_TD_PREFIX, _TD_LITERAL):
+            length = _read_varint(file_handle)
+            if length is None:
+                raise SpchtErrors.ParsingError("Term dictionary ends in the middle of a record")
+            text = file_handle.read(length).decode("utf-8")
+            if kind == _TD_PREFIX:
+                prefixes.append(text)
+            else:
+                terms.append(text)
+        else:
+            raise SpchtErrors.ParsingError(f"Unknown record type {kind} in term dictionary")
+
+
+class SparqlPayloadWriter:
+    """
+    Writes SpchtTriples as ready N-Triples blocks of bounded size, each block is meant to be the body of exactly one
+    sparql INSERT DATA. The blocks are separated by an empty line which N-Triples itself never contains, the named
+    graph is not part of the file and gets added when sending, see read_sparql_payloads
+    """
+    def __init__(self, file_handle, max_bytes=262144):
+        """
+        :param file_handle: a file opened for writing text
+        :param int max_bytes: upper size of a block in utf-8 bytes, a single triple larger than that gets its own block
+        """
+        self.file = file_handle
+        self.max_bytes = max_bytes
+        self.batch = []
+        self.batch_bytes = 0
+        self.batches = 0
+
+    def write(self, quadro_list: list) -> int:
+        """
+        Adds the triples to the current block, starting a new one whenever it would get too large, same rules as
+        write_rdf_stream otherwise
+
+        :param list quadro_list: list of SpchtTriple as provided by Spcht.process_data
+        :return: number of triples written
+        :rtype: int
+        """
+        lines = {}
+        for each in quadro_list:
+            terms = rdf_term(each.subject), rdf_term(each.predicate), rdf_term(each.sobject)
+            if None in terms:
+                print(f"RDF Exception [SparqlPayloadWriter] occured with {each.predicate} - cannot express {each}", file=sys.stderr)
+                continue
+            lines[f"{terms[0]} {terms[1]} {terms[2]} .\n"] = None
+        for line in lines:
+            size = len(line.encode("utf-8"))
+            if self.batch and self.batch_bytes + size > self.max_bytes:
+                self.flush()
+            self.batch.append(line)
+            self.batch_bytes += size
+        return len(lines)
+
+    def flush(self):
+        """
+        Ends the current block, must be called once after the last write
+        """
+        if self.batch:
+            self.file.write("".join(self.batch) + "\n")
+            self.batches += 1
+        self.batch = []
+        self.batch_bytes = 0
+
+
+def read_sparql_payloads(file_handle):
+    """
+    Reads the blocks of a file written by SparqlPayloadWriter
+
+    :param file_handle: a file opened for reading text
+    :return: a generator of N-Triples blocks as str
+    """
+    batch = []
+    for line in file_handle:
+        if line == "\n":
+            if batch:
+                yield "".join(batch)
+            batch = []
+        else:
+            batch.append(line)
+    if batch:  # ? a file without the final empty line
+        yield "".join(batch)
+
+
 def regex_validation(descriptor: dict or list) -> (bool, str):
     """
 
@@ -575,30 +934,69 @@ def regex_validation_recursion(node: dict) -> (bool, str):
     :return: True, msg or False, msg if any one key is wrong
     :rtype: (bool, str)
     """
+    engine = node.get('regex_engine', "re")
     # * mapping settings
-    if 'map_setting' in node:
+    if 'mapping_settings' in node:
         if '$regex' in node['mapping_settings']:
             if node['mapping_settings']['$regex'] == True and 'mapping' in node:
                 for key in node['mapping']:
-                    if not validate_regex(key):
+                    if not validate_regex(key, engine):
                         return False, "mapping"
-    if 'cut' in node:
-        if not validate_regex(node['cut']):
-            return False, "cut"
-    if 'match' in node:
-        if not validate_regex(node['match']):
-            return False, "match"
+    for key in ('cut', 'match', 'if_cut', 'if_match'):
+        if key in node:
+            if not validate_regex(node[key], engine):
+                return False, key
     if 'fallback' in node:
         return regex_validation_recursion(node['fallback'])
     return True, "none"
 
 
+def _schema_validator(schema: dict or str or Path):
+    """
+    Returns a ready jsonschema validator for the given schema and a key that identifies the schema, the validator is
+    built once per schema (and file version) and reused afterwards, building one checks the entire schema
+
+    :param dict or str or Path schema: a loaded schema or the file path of one, None for the Spcht schema
+    :return: a tuple of the schema key and the validator
+    :rtype: (str, jsonschema.protocols.Validator)
+    :raises FileNotFoundError: if the schema file does not exist
+    :raises json.JSONDecodeError: if the schema file is not valid json
+    :raises jsonschema.SchemaError: if the schema itself is not valid
+    """
+    from jsonschema.validators import validator_for
+    if isinstance(schema, dict):
+        key = hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+        version = None
+    else:
+        key = os.path.abspath(schema)
+        stats = os.stat(key)
+        version = (stats.st_mtime, stats.st_size)
+    cached = _SCHEMA_VALIDATORS.get(key)
+    if cached and cached[0] == version:
+        return key, cached[1]
+    if isinstance(schema, dict):
+        rdy_schema = schema
+    else:
+        with open(schema, "r") as schema_file:
+            rdy_schema = json.load(schema_file)
+    validator_class = validator_for(rdy_schema)
+    validator_class.check_schema(rdy_schema)
+    _SCHEMA_VALIDATORS[key] = (version, validator_class(rdy_schema))
+    # ? a new version of a schema makes all old results worthless
+    for old_key in [x for x in _VALIDATION_RESULTS if x[0] == key]:
+        del _VALIDATION_RESULTS[old_key]
+    return key, _SCHEMA_VALIDATORS[key][1]
+
+
 def schema_validation(descriptor: dict, schema=None) -> (bool, str):
     """
     Validates the given dictionary (loaded from a json) against a validation scheme, this function can technically
     accept every kind of dictionary/json-object and schema. It will write some log informations and give back a tuple
     of boolean and message
 
+    The validator of a schema is only built once, results are remembered by the content hash of the descriptor so
+    validating an unchanged descriptor again costs only the hashing
+
     :param dict descriptor: a loaded dictionary from a spcht.json
     :param str schema: file path to a json schema
     :return: True or False and a mesage
@@ -606,37 +1004,50 @@ def schema_validation(descriptor: dict, schema=None) -> (bool, str):
     """
     # ? load schema, per default this should be the Spcht one but this function is written reusable
     # ? there is also the option to directly provide a loaded json for a use case i had with SpchtBuilder
-    if isinstance(schema, dict):
-        rdy_schema = schema
-    else:
-        if not schema:  # defaulting to default module path
-            schema = Path(__file__).parent.parent / "SpchtSchema.json"
-        try:
-            with open(schema, "r") as schema_file:
-                rdy_schema = json.load(schema_file)
-        except FileNotFoundError as e:
-            if schema == "./SpchtSchema.json":
-                logger.critical("Standard Spcht Schema file could not be found, this is worrysome as its part of the package")
-            else:
-                logger.warning(f"JSON schema {schema} could not be found")
-            msg = f"Schema file {e} not found"
-            return False, msg
-        except json.JSONDecodeError as e:
-            if schema == "./SpchtSchema.json":
-                logger.critical("Package Schema for Spcht contains an error, this is worrysome.")
-            else:
-                logger.warning(f"JSON schema {schema} contains an error within the encoding")
-            msg = f"Schema file has in correct json encoding: {e}"
-            return False, msg
-        except Exception as e:
-            msg = f"Unexpected exception in 'schema_validation': {e}"
-            logger.error(msg)
-            return False, msg
+    from jsonschema import SchemaError, RefResolutionError
+    from jsonschema.exceptions import best_match
+    if not schema:  # defaulting to default module path
+        schema = DEFAULT_SCHEMA
+    try:
+        schema_key, validator = _schema_validator(schema)
+    except FileNotFoundError as e:
+        if schema == DEFAULT_SCHEMA:
+            logger.critical("Standard Spcht Schema file could not be found, this is worrysome as its part of the package")
+        else:
+            logger.warning(f"JSON schema {schema} could not be found")
+        msg = f"Schema file {e} not found"
+        return False, msg
+    except json.JSONDecodeError as e:
+        if schema == DEFAULT_SCHEMA:
+            logger.critical("Package Schema for Spcht contains an error, this is worrysome.")
+        else:
+            logger.warning(f"JSON schema {schema} contains an error within the encoding")
+        msg = f"Schema file has in correct json encoding: {e}"
+        return False, msg
+    except SchemaError as e:
+        msg = f"Schema not valid: {e}"
+        logger.warning(f"schema_validation: the schema '{schema}' seems to be not valid, error: {e}")
+        return False, msg
+    except Exception as e:
+        msg = f"Unexpected exception in 'schema_validation': {e}"
+        logger.error(msg)
+        return False, msg
+    try:
+        result_key = (schema_key, hashlib.sha256(json.dumps(descriptor, sort_keys=True).encode("utf-8")).hexdigest())
+    except (TypeError, ValueError):  # not json serializable, cannot be remembered
+        result_key = None
+    if result_key in _VALIDATION_RESULTS:
+        return _VALIDATION_RESULTS[result_key]
     # * actual validation
     try:
-        validate(instance=descriptor, schema=rdy_schema)
-        return True, "All OK"
-    except ValidationError as error:
+        error = best_match(validator.iter_errors(descriptor))
+    except RefResolutionError as e:
+        msg = f"Referenced object could not be found: {e}"
+        logger.warning(f"schema_validation: found an error within the schema '{schema}': {msg}")
+        return False, msg
+    if error is None:
+        result = True, "All OK"
+    else:
         # ? trying to retrieve node
         traversing_dict = descriptor
         try:
@@ -646,22 +1057,123 @@ def schema_validation(descriptor: dict, schema=None) -> (bool, str):
             logger.warning(f"schema_validation: when traversing the failing descriptor the offending part could not be located, key '{failing_key} unobtainable")
             traversing_dict = None
         msg = "An unnamed, unknown node"  # in case something is srsly going under
-        if traversing_dict:
+        if isinstance(traversing_dict, dict):
             if 'name' in traversing_dict:
                 msg = f"'{traversing_dict['name']}'"
             elif 'field' in traversing_dict:
                 msg = f"FIELD='{traversing_dict['field']}'"
         msg += f": an error was found with the schema, Validator: '{error.validator}', Message: '{error.message}', Instance: {error.instance}"
         logger.warning(f"schema_validator: a schema failed to validate with message {error.message}")
-        return False, msg
-    except SchemaError as e:
-        msg = f"Schema not valid: {e}"
-        logger.warning(f"schema_validation: the schema '{schema}' seems to be not valid, error: {e}")
-        return False, msg
-    except RefResolutionError as e:
-        msg = f"Referenced object could not be found: {e}"
-        logger.warning(f"schema_validation: found an error within the schema '{schema}': {msg}")
-        return False, msg
+        result = False, msg
+    if result_key is not None:
+        if len(_VALIDATION_RESULTS) >= VALIDATION_CACHE_SIZE:  # dictionaries are ordered, the oldest goes first
+            del _VALIDATION_RESULTS[next(iter(_VALIDATION_RESULTS))]
+        _VALIDATION_RESULTS[result_key] = result
+    return result
+
+
+def file_stamp(file_path: str or Path) -> dict:
+    """
+    Creates a fingerprint of a file to later decide whether it was changed or not
+
+    :param str or Path file_path: path to an existing file
+    :return: a dictionary with the absolute 'path', 'mtime', 'size' and 'sha256' of the file
+    :rtype: dict
+    :raises OSError: if the file cannot be read
+    """
+    file_path = os.path.abspath(file_path)
+    stats = os.stat(file_path)
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(65536), b""):
+            sha.update(block)
+    return {"path": file_path, "mtime": stats.st_mtime, "size": stats.st_size, "sha256": sha.hexdigest()}
+
+
+def file_stamp_matches(stamp: dict) -> bool or None:
+    """
+    Compares a fingerprint made by file_stamp with the file as it is now, if modification time and size are the same
+    the file is assumed to be unchanged, otherwise the content hash decides
+
+    :param dict stamp: a dictionary as returned by file_stamp
+    :return: True if the file is unchanged, False if it was changed, None if it does not exist anymore
+    :rtype: bool or None
+    """
+    try:
+        stats = os.stat(stamp['path'])
+        if stats.st_mtime == stamp['mtime'] and stats.st_size == stamp['size']:
+            return True
+        if stats.st_size != stamp['size']:
+            return False
+        return file_stamp(stamp['path'])['sha256'] == stamp['sha256']
+    except FileNotFoundError:
+        return None
+
+
+def node_predicates(node: dict or list) -> set:
+    """
+    All predicates a node can write, including those of its fallbacks, sub_data and joined maps
+
+    :param dict or list node: a node of a resolved descriptor or a list of those
+    :return: the predicates as plain strings
+    :rtype: set
+    """
+    predicates = set()
+    if isinstance(node, list):
+        for each in node:
+            predicates |= node_predicates(each)
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            if key == "predicate" and isinstance(value, str):
+                predicates.add(value)
+            elif key == "joined_map" and isinstance(value, dict):
+                predicates |= {x for x in value.values() if isinstance(x, str)}
+            elif isinstance(value, (dict, list)):
+                predicates |= node_predicates(value)
+    return predicates
+
+
+def _contains_key(node: dict or list, key: str) -> bool:
+    if isinstance(node, list):
+        return any(_contains_key(x, key) for x in node)
+    if isinstance(node, dict):
+        return key in node or any(_contains_key(x, key) for x in node.values())
+    return False
+
+
+def descriptor_node_diff(old_descriptor: dict, new_descriptor: dict) -> dict or None:
+    """
+    Compares two resolved descriptors node by node and finds out what has to be computed again. As a predicate scoped
+    delete removes every triple of that predicate, all nodes of the new descriptor that write one of the affected
+    predicates belong to the recompute, not only the edited ones
+
+    A change outside of the nodes, like the id, changes the subjects of everything and sub_nodes write triples of
+    other subjects, both cannot be done partially
+
+    :param dict old_descriptor: the descriptor the loaded data was made with, as in Spcht.descriptor
+    :param dict new_descriptor: the edited descriptor
+    :return: None if only a full reload will do, otherwise a dictionary with the sorted 'predicates' whose triples
+        change, the indices of the 'nodes' of the new descriptor that write those and the number of 'changed' nodes
+    :rtype: dict or None
+    """
+    def canonical(thing):
+        return json.dumps(thing, sort_keys=True, default=str)
+
+    old_header = {k: v for k, v in old_descriptor.items() if k != 'nodes'}
+    new_header = {k: v for k, v in new_descriptor.items() if k != 'nodes'}
+    if canonical(old_header) != canonical(new_header):
+        logger.info("descriptor_node_diff: something beside the nodes changed, full reload necessary")
+        return None
+    old_nodes = {canonical(x): x for x in old_descriptor['nodes']}
+    new_nodes = {canonical(x): x for x in new_descriptor['nodes']}
+    changed = [old_nodes[x] for x in old_nodes.keys() - new_nodes.keys()] + \
+              [new_nodes[x] for x in new_nodes.keys() - old_nodes.keys()]
+    if _contains_key(changed, "sub_nodes"):
+        logger.info("descriptor_node_diff: a changed node has sub_nodes, full reload necessary")
+        return None
+    predicates = node_predicates(changed)
+    nodes = [i for i, node in enumerate(new_descriptor['nodes']) if node_predicates(node) & predicates]
+    return {"predicates": sorted(predicates), "nodes": nodes, "changed": len(changed)}
 
 
 def check_format(descriptor, out=sys.stderr, base_path="", i18n=None):
@@ -21,31 +21,38 @@
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 import errno
+import hashlib
+import importlib.util
 import json
 import logging
 import math
 import multiprocessing
 import os
 import shutil
-import subprocess
 import sys
+import tempfile
 import time
 import traceback
-import xml
+import xml.parsers.expat
 from datetime import timedelta, datetime
 
-import rdflib
-
 from . import SpchtErrors as SpchtErrors
 from .SpchtCore import Spcht
-from Spcht.Utils.SpchtConstants import WORK_ORDER_STATUS
-from .SpchtUtility import process2RDF
+from Spcht.Utils.SpchtConstants import WORK_ORDER_STATUS, TERM_DICT_SUFFIX
+from .SpchtUtility import process2RDF, write_rdf_stream, TermDictWriter, read_term_dict, SparqlPayloadWriter, \
+    read_sparql_payloads, is_valid_iri, rdf_term, descriptor_node_diff
 
 from Spcht.Utils.local_tools import load_from_json, sparqlQuery, delta_now, test_json, \
-    load_remote_content, solr_handle_return
+    load_remote_content, solr_handle_return, open_file, compression_of, strip_compression, COMPRESSION_SUFFIXES, \
+    sparql_delete_values, sparql_delete_values_query, sparql_insert_data, file_lock, IsqlSession, OdbcPool, \
+    odbc_connection_string, gsp_post, configure_requests, SubjectRegistry, DeltaStore, RecordIndex
 
 logger = logging.getLogger(__name__)
 
+# ? every file the processing writes next to a chunk, clean ups and resets remove all of those
+PROCESSED_FILES = ('rdf_file', 'payload_file', 'subject_file', 'state_file', 'delta_file', 'retract_file', 'wipe_file',
+                   'record_file')
+
 
 def UpdateWorkOrder(file_path: str, force=False, **kwargs: tuple or list) -> dict:
     """
@@ -65,6 +72,11 @@ def UpdateWorkOrder(file_path: str, force=False, **kwargs: tuple or list) -> dic
     :return dict: returns a work order dictionary
     """
     # ! i actively decided against writing a file class for work order
+    with file_lock(f"{file_path}.lock"):  # ? parallel workers update the same order
+        return _UpdateWorkOrder(file_path, force, **kwargs)
+
+
+def _UpdateWorkOrder(file_path: str, force=False, **kwargs: tuple or list) -> dict:
     work_order = load_from_json(file_path)
     if work_order is not None:
         if "update" in kwargs:
@@ -98,14 +110,39 @@ def UpdateWorkOrder(file_path: str, force=False, **kwargs: tuple or list) -> dic
                 kwargs['delete'] = [kwargs['delete']]
             for deletion in kwargs['delete']:
                 DeleteNestedDictionaryKey(work_order, *deletion)
-        with open(file_path, "w") as work_order_file:
+        # ? readers do not lock, they must never see a half written file
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as work_order_file:
             json.dump(work_order, work_order_file, indent=4)
+        os.replace(temp_path, file_path)
         return work_order
 
     else:
         raise SpchtErrors.WorkOrderError
 
 
+def ClaimWorkOrderEntry(work_order_file: str, key: str, expected: tuple, status: int, timestamp: str) -> dict or None:
+    """
+    Sets the status of one entry of the file list if it still has one of the expected ones, check and update happen
+    under the lock of the work order, of several workers looking at the same entry only one gets it
+    :param str work_order_file: file path to a work order file
+    :param str key: key of the entry in the file list
+    :param tuple expected: status values the entry may have to be claimed
+    :param int status: the new status of the entry
+    :param str timestamp: name of the field that gets the current time, like 'insert_start'
+    :return: the updated work order or None if the entry is not or no longer available
+    :rtype: dict or None
+    """
+    with file_lock(f"{work_order_file}.lock"):
+        work_order = load_from_json(work_order_file)
+        if work_order is None:
+            raise SpchtErrors.WorkOrderError
+        if work_order['file_list'][key]['status'] not in expected:
+            return None
+        return UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', status),
+                               insert=('file_list', key, timestamp, datetime.now().isoformat()))
+
+
 def UpdateNestedDictionaryKey(dictionary: dict, *args) -> None or any:
     """
     Changes the content of a dictionary key in any depth that is specified, if the 'path' does not exist
@@ -239,7 +276,7 @@ def CheckWorkOrder(work_order_file: str):
             linear_delta += extremes['max_solr'] - extremes['min_solr']
         counts = {'rdf_files': 0, 'files': 0, 'un_processing': 0, 'un_insert': 0,
                   'un_intermediate': 0}  # occasions of something
-        counters = {"elements": 0, "triples": 0}  # adding counts of individual fields
+        counters = {"elements": 0, "triples": 0, "regex_timeouts": 0, "quarantined": 0}  # adding counts of individual fields
         for key in work_order['file_list']:
             # ? why, yes 'for key, item in dict.items()' is a thing
             for method in time_infos:
@@ -291,6 +328,10 @@ def CheckWorkOrder(work_order_file: str):
             print(f"Processed elements:       {counters['elements']}")
         if counters['triples'] > 0:
             print(f"Resulting triples:        {counters['triples']}")
+        if counters['regex_timeouts'] > 0:
+            print(f"Regex timeouts:           {counters['regex_timeouts']}")
+        if counters['quarantined'] > 0:
+            print(f"Quarantined records:      {counters['quarantined']}")
         print(f"Insert method:            {work_order['meta']['method']}")
         if counts['files'] > 0:
             print(f"Downloaded files:         {counts['files']}")
@@ -356,6 +397,7 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
     if 'spcht_descriptor' in kwargs and 'spcht_object' not in kwargs:
         specht = Spcht(kwargs['spcht_descriptor'])
         kwargs['spcht_object'] = specht
+    configure_requests(**kwargs)
     work_order = load_from_json(work_order_file)
     if work_order is not None:
         try:
@@ -431,9 +473,60 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                 if work_order['meta']['type'] == "insert":
                     UpdateWorkOrder(work_order_file, update=("meta", "status", 6))
                     return UseWorkOrder(**kwargs)  # jumps to the next step, a bit dirty this solution
+                if work_order['meta']['type'] == "swap":
+                    # ? the live graph is not touched until everything is loaded, no deletes needed
+                    # ? gsp and odbc stage and swap over the sparql endpoint, only isql has its own way
+                    if work_order['meta']['method'] in ("sparql", "gsp", "odbc"):
+                        expected = ("work_order_file", "named_graph", "sparql_endpoint", "user", "password")
+                    elif work_order['meta']['method'] == "isql":
+                        expected = ("work_order_file", "named_graph", "isql_path", "user", "password", "virt_folder")
+                    else:
+                        logger.critical(
+                            f"Unknown method '{work_order['meta']['method']}' in work order file {work_order_file}")
+                        return 4
+                    missing = CheckForParameters(expected, **kwargs)
+                    if missing:
+                        return missing
+                    logger.info(f"Scanned order '{os.path.basename(work_order_file)}' as type 'swap', preparing staging graph..")
+                    if not PrepareGraphSwap(**kwargs):
+                        msg = "Preparation of the staging graph failed"
+                        logging.error(msg)
+                        print(f"{msg}{boiler_print}")
+                        return 4
+                    UpdateWorkOrder(work_order_file, update=("meta", "status", 6))
+                    return UseWorkOrder(**kwargs)
+                # ? the graph store protocol has no delete for subjects, gsp orders always delete first
+                if work_order['meta']['type'] == "update" and kwargs.get('fused_update') and work_order['meta']['method'] != "gsp":
+                    # ? delete and insert in one step, 4 goes straight to 8
+                    if work_order['meta']['method'] == "sparql":
+                        expected = ("work_order_file", "named_graph", "sparql_endpoint", "user", "password")
+                        fused_step = FulfillSparqlUpdateOrder
+                    elif work_order['meta']['method'] == "isql":
+                        expected = ("work_order_file", "named_graph", "isql_path", "user", "password", "virt_folder")
+                        fused_step = FulfillISqlUpdateOrder
+                    elif work_order['meta']['method'] == "odbc":
+                        expected = ("work_order_file", "named_graph", "odbc_dsn", "user", "password")
+                        fused_step = FulfillOdbcUpdateOrder
+                    else:
+                        logger.critical(
+                            f"Unknown method '{work_order['meta']['method']}' in work order file {work_order_file}")
+                        return 4
+                    missing = CheckForParameters(expected, **kwargs)
+                    if missing:
+                        return missing
+                    logger.info(f"Scanned order '{os.path.basename(work_order_file)}' as type 'update', fused delete and insert..")
+                    UpdateWorkOrder(work_order_file, update=("meta", "status", 7), insert=("meta", "fused_update", True))
+                    if RunStage(fused_step, **kwargs):
+                        UpdateWorkOrder(work_order_file, update=("meta", "status", 8))
+                        return 8
+                    else:
+                        msg = "Fused deletion and insert failed"
+                        logging.error(msg)
+                        print(f"{msg}{boiler_print}")
+                        return 7
                 if work_order['meta']['type'] == "update":
                     # ? isql emulates sparql queries in the interface
-                    if work_order['meta']['method'] == "sparql":
+                    if work_order['meta']['method'] in ("sparql", "gsp"):
                         # ! checks
                         expected = ("work_order_file", "named_graph", "sparql_endpoint", "user", "password")
                         missing = CheckForParameters(expected, **kwargs)
@@ -442,7 +535,7 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                         logger.info(f"Scanned order '{os.path.basename(work_order_file)}' as type 'update', deletion process..")
                         UpdateWorkOrder(work_order_file, update=("meta", "status", 5))
                         # ! process
-                        if IntermediateStepSparqlDelete(**kwargs):
+                        if RunStage(IntermediateStepSparqlDelete, **kwargs):
                             UpdateWorkOrder(work_order_file, update=("meta", "status", 6))
                             return 6
                         else:
@@ -459,7 +552,24 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                         logger.info(f"Scanned order '{os.path.basename(work_order_file)}' as type 'update', deletion process..")
                         UpdateWorkOrder(work_order_file, update=("meta", "status", 5))
                         # ! process
-                        if IntermediateStepISQLDelete(**kwargs):
+                        if RunStage(IntermediateStepISQLDelete, **kwargs):
+                            UpdateWorkOrder(work_order_file, update=("meta", "status", 6))
+                            return 6
+                        else:
+                            msg = "Intermediate deletion step failed"
+                            logging.error(msg)
+                            print(f"{msg}{boiler_print}")
+                            return 5
+                    elif work_order['meta']['method'] == "odbc":
+                        # ! checks
+                        expected = ("work_order_file", "named_graph", "odbc_dsn", "user", "password")
+                        missing = CheckForParameters(expected, **kwargs)
+                        if missing:
+                            return missing
+                        logger.info(f"Scanned order '{os.path.basename(work_order_file)}' as type 'update', deletion process..")
+                        UpdateWorkOrder(work_order_file, update=("meta", "status", 5))
+                        # ! process
+                        if RunStage(IntermediateStepOdbcDelete, **kwargs):
                             UpdateWorkOrder(work_order_file, update=("meta", "status", 6))
                             return 6
                         else:
@@ -478,8 +588,13 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                     print(msg)
                     logger.critical(f"UseWorkOrder > {msg}")
                     return 3
+                if work_order['meta'].get('fused_update'):  # ? back on status 4, unfinished chunks still need deleting
+                    return UseWorkOrder(**kwargs)
             if work_order['meta']['status'] == 6 or work_order['meta']['status'] == 7:  # intermediate processing done
                 logger.debug(f"Order {work_order_file}: Status 6 detected")
+                insert_kwargs = kwargs
+                if work_order['meta']['type'] == "swap":  # ? loads into the staging graph, the live one stays as is
+                    insert_kwargs = {**kwargs, 'named_graph': work_order['meta']['staging_graph']}
                 if work_order['meta']['method'] == "isql":
                     logger.debug(f"Order {work_order_file}: Status 6 sorted into isql insert")
                     # ! checks
@@ -490,7 +605,7 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                     # ! process
                     logger.info(f"Sorted order '{os.path.basename(work_order_file)}' with method 'isql'")
                     UpdateWorkOrder(work_order_file, update=("meta", "status", 7))
-                    if FulfillISqlInsertOrder(**kwargs):
+                    if RunStage(FulfillISqlInsertOrder, **insert_kwargs):
                         UpdateWorkOrder(work_order_file, update=("meta", "status", 8))
                         return 8
                     else:
@@ -508,7 +623,7 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                     # ! process
                     logger.info(f"Sorted order '{os.path.basename(work_order_file)}' with method 'sparql'")
                     UpdateWorkOrder(work_order_file, update=("meta", "status", 7))
-                    if FulfillSparqlInsertOrder(**kwargs):
+                    if RunStage(FulfillSparqlInsertOrder, **insert_kwargs):
                         UpdateWorkOrder(work_order_file, update=("meta", "status", 8))
                         return 8
                     else:
@@ -516,8 +631,58 @@ def UseWorkOrder(work_order_file, **kwargs) -> list or int:
                         logger.critical(msg)
                         print(f"{msg}{boiler_print}")
                         return 7
+                elif work_order['meta']['method'] == "gsp":
+                    logger.debug(f"Order {work_order_file}: Status 6 sorted into graph store insert")
+                    # ! checks
+                    expected = ("work_order_file", "named_graph", "gsp_endpoint")
+                    missing = CheckForParameters(expected, **kwargs)
+                    if missing:
+                        return missing
+                    # ! process
+                    logger.info(f"Sorted order '{os.path.basename(work_order_file)}' with method 'gsp'")
+                    UpdateWorkOrder(work_order_file, update=("meta", "status", 7))
+                    if RunStage(FulfillGspInsertOrder, **insert_kwargs):
+                        UpdateWorkOrder(work_order_file, update=("meta", "status", 8))
+                        return 8
+                    else:
+                        msg = "Graph store upload failed"
+                        logger.critical(msg)
+                        print(f"{msg}{boiler_print}")
+                        return 7
+                elif work_order['meta']['method'] == "odbc":
+                    logger.debug(f"Order {work_order_file}: Status 6 sorted into odbc insert")
+                    # ! checks
+                    expected = ("work_order_file", "named_graph", "odbc_dsn", "user", "password")
+                    missing = CheckForParameters(expected, **kwargs)
+                    if missing:
+                        return missing
+                    # ! process
+                    logger.info(f"Sorted order '{os.path.basename(work_order_file)}' with method 'odbc'")
+                    UpdateWorkOrder(work_order_file, update=("meta", "status", 7))
+                    if RunStage(FulfillOdbcInsertOrder, **insert_kwargs):
+                        UpdateWorkOrder(work_order_file, update=("meta", "status", 8))
+                        return 8
+                    else:
+                        msg = "Odbc based insert operation failed"
+                        logger.critical(msg)
+                        print(f"{msg}{boiler_print}")
+                        return 7
             if work_order['meta']['status'] == 8:  # inserting completed
                 logger.debug(f"Order {work_order_file}: Status 8 detected")
+                if work_order['meta']['type'] == "swap" and not work_order['meta'].get('graph_swapped'):
+                    if work_order['meta']['method'] == "isql":
+                        expected = ("work_order_file", "named_graph", "isql_path", "user", "password")
+                    else:
+                        expected = ("work_order_file", "named_graph", "sparql_endpoint", "user", "password")
+                    missing = CheckForParameters(expected, **kwargs)
+                    if missing:
+                        return missing
+                    if not SwapStagingGraph(**kwargs):
+                        msg = "Swapping the staging graph into place failed"
+                        logging.error(msg)
+                        print(f"{msg}{boiler_print}")
+                        return 8
+                    UpdateWorkOrder(work_order_file, insert=("meta", "graph_swapped", datetime.now().isoformat()))
                 if CleanUpWorkOrder(work_order_file, **kwargs):
                     UpdateWorkOrder(work_order_file, update=("meta", "status", 9))
                     return 9
@@ -575,8 +740,7 @@ def ProcessOrderMultiCore(work_order_file: str, **kwargs):
         # del mod_kwargs
         # mod_kwargs = copy.copy(kwargs)
         # mod_kwargs['spcht_object'] = Spcht(kwargs['spcht_object'].descriptor_file)
-        time.sleep(
-            1)  # ! this all is file based, this is the sledgehammer way of avoiding problems with race conditions
+        # ? the processes claim the chunks under the lock of the work order, see ClaimWorkOrderEntry
         p = multiprocessing.Process(target=FulfillProcessingOrder, args=(work_order_file,), kwargs=kwargs)
         processes.append(p)
         p.start()
@@ -584,20 +748,54 @@ def ProcessOrderMultiCore(work_order_file: str, **kwargs):
         process.join()
 
 
+def _StageWorker(step, kwargs: dict):
+    configure_requests(**kwargs)  # ? a spawned process starts with the defaults
+    sys.exit(0 if step(**kwargs) else 1)
+
+
+def RunStage(step, **kwargs) -> bool:
+    """
+    Runs one insert or delete step, with 'insert_processes' set to more than one in that many processes at once.
+    Every process walks the whole file list and claims the entries it works on, see ClaimWorkOrderEntry, so each chunk
+    is done exactly once and reports its status on its own
+    :param step: one of the insert or delete functions, like FulfillSparqlInsertOrder
+    :param int insert_processes: optional kwarg, number of worker processes
+    :param kwargs: all parameters of the step
+    :return: True if the step or all of its workers succeeded
+    :rtype: bool
+    """
+    processes = int(kwargs.get('insert_processes') or 1)
+    if processes < 2:
+        return step(**kwargs)
+    logger.info(f"Running {step.__name__} with {processes} worker processes")
+    workers = [multiprocessing.Process(target=_StageWorker, args=(step, kwargs)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    failed = [worker.pid for worker in workers if worker.exitcode != 0]
+    if failed:
+        logger.error(f"{step.__name__}: {len(failed)} of {processes} workers failed")
+    return not failed
+
+
 def CreateWorkOrder(order_name, fetch: str, typus: str, method: str, **kwargs):
     """
     Creates a basic work order file that serves as origin for all further operation, desribes
     the steps necessary to fullfill the order
     :param str order_name: name of the order, the file name will be generated from this
     :param str fetch: Method of data retrieval, either a 'solr' or a list of plain 'file's
-    :param str typus: type or work order, either 'insert' or 'update', update deletes triples with the subject of the new data first
-    :param str method: method of inserting the data in a triplestore, 'sparql', 'isql' or 'odbc', also 'none' if no such operating should take place
+    :param str typus: type or work order, either 'insert' or 'update', update deletes triples with the subject of the new data first,
+    'swap' loads everything into a staging graph and replaces the whole named graph with it at the end
+    :param str method: method of inserting the data in a triplestore, 'sparql', 'isql', 'odbc' or 'gsp' for a graph store protocol endpoint, also 'none' if no such operating should take place
+    :param str compression: optional kwarg, 'gzip' or 'zstd', all chunk and rdf files of the order are written compressed
     :return str: the final name / file path of the work order file with all suffix
     """
     allowed = {
         "fetch": ["file", "solr"],
-        "typus": ["insert", "update"],
-        "method": ["sparql", "isql", "odbc", "none"]
+        "typus": ["insert", "update", "swap"],
+        "method": ["sparql", "isql", "odbc", "gsp", "none"],
+        "compression": [None] + list(COMPRESSION_SUFFIXES)
     }
     if fetch not in allowed['fetch']:
         print(f"Fetch method {fetch} not available, must be {allowed['fetch']}")
@@ -608,6 +806,16 @@ def CreateWorkOrder(order_name, fetch: str, typus: str, method: str, **kwargs):
     if method not in allowed['method']:
         print(f"Insert method '{method}' not available, must be {allowed['method']}")
         return False
+    compression = kwargs.get('compression') or None
+    if compression not in allowed['compression']:
+        print(f"Compression '{compression}' unknown, must be {allowed['compression'][1:]}")
+        return False
+    if compression == "zstd" and importlib.util.find_spec("zstandard") is None:
+        print("Compression 'zstd' needs the package 'zstandard' which is not installed")
+        return False
+    if method == "odbc" and importlib.util.find_spec("pyodbc") is None:
+        print("Insert method 'odbc' needs the package 'pyodbc' which is not installed")
+        return False
     logger.info("Starting Process of creating a new work order")
     if order_name == "":
         order_name = "work_order"
@@ -620,6 +828,8 @@ def CreateWorkOrder(order_name, fetch: str, typus: str, method: str, **kwargs):
         },
         "file_list": {}
     }
+    if compression:
+        work_order['meta']['compression'] = compression
     work_order_filename = os.path.join(os.getcwd(),
                                        f"{order_name}-{datetime.now().isoformat().replace(':', '-')}.json")
     logger.info(f"attempting to write order file to {work_order_filename}")
@@ -632,6 +842,114 @@ def CreateWorkOrder(order_name, fetch: str, typus: str, method: str, **kwargs):
         return False
 
 
+def CreateRecomputeOrder(order_name: str, source_order: str, old_descriptor: str, new_descriptor: str, method: str,
+                         **kwargs):
+    """
+    Creates an update order that brings data loaded with the old descriptor in line with an edited descriptor without
+    a full reload. Both descriptors are compared node by node, the raw chunks of the source order are processed again
+    with only the affected nodes and the delete steps remove only triples of the affected predicates
+
+    Update orders that ran after the source order have loaded newer versions of some records, reprocessing the old raw
+    data of those would overwrite the newer triples. All of them have to be given as 'later_orders', each record is
+    then processed from its newest raw version. Chunks that contain outdated records are written again without those,
+    next to the original chunk, the clean up of the recompute order removes them
+
+    The raw chunks of the source and the later orders must still exist, see 'keep_raw_chunks'. The new order has to be
+    processed with the new descriptor, it starts at status 2 like a fetched order
+    :param str order_name: name of the order, the file name will be generated from this
+    :param str source_order: work order file whose raw chunks are used again
+    :param str old_descriptor: file path of the descriptor the loaded data was made with
+    :param str new_descriptor: file path of the edited descriptor
+    :param str method: method of inserting the data in a triplestore, 'sparql' or 'isql'
+    :param list later_orders: optional kwarg, work order files of the same graph that were inserted after the source
+        order, oldest first
+    :param kwargs: additional parameters that all will be ignored
+    :return: the file path of the new work order or False if there is nothing to do or a partial run is not possible
+    :rtype: str or bool
+    """
+    source = load_from_json(source_order)
+    if source is None:
+        print(f"Cannot load source order {source_order}")
+        return False
+    orders = [source]
+    for later_order in kwargs.get('later_orders') or ():
+        later = load_from_json(later_order)
+        if later is None:
+            print(f"Cannot load later order {later_order}")
+            return False
+        if later['meta']['status'] < 8:  # ? its records might not be in the graph yet, nor might they ever be
+            print(f"Later order {later_order} is not inserted yet, finish it before the recompute")
+            return False
+        orders.append(later)
+    raw_files = [entry.get('file') for order in orders for entry in order['file_list'].values()]
+    if not raw_files or not all(x and os.path.exists(x) for x in raw_files):
+        print("Not all raw chunks of the source and later orders still exist, a recompute cannot cover every record")
+        return False
+    try:
+        old_spcht, new_spcht = Spcht(old_descriptor), Spcht(new_descriptor)
+    except SpchtErrors.OperationalError as e:
+        print(f"Loading of the descriptors failed: {e}")
+        return False
+    diff = descriptor_node_diff(old_spcht.descriptor, new_spcht.descriptor)
+    if diff is None:
+        print("The descriptors differ in a way that needs a full reload")
+        return False
+    if not diff['predicates']:
+        print("The descriptors produce the same triples, nothing to recompute")
+        return False
+    work_order_file = CreateWorkOrder(order_name, "file", "update", method,
+                                      compression=source['meta'].get('compression'))
+    if not work_order_file:
+        return False
+    recompute = {"source": os.path.abspath(source_order),
+                 "later": [os.path.abspath(x) for x in kwargs.get('later_orders') or ()],
+                 "descriptor_hash": new_spcht.descriptor_hash,
+                 "predicates": diff['predicates'],
+                 "nodes": diff['nodes']}
+    file_list = LatestRecordChunks(raw_files, new_spcht.id_field, work_order_file)
+    UpdateWorkOrder(work_order_file, update=[("meta", "status", 2), ("file_list", file_list)],
+                    insert=("meta", "recompute", recompute), force=True)
+    logger.info(f"Recompute order {work_order_file}: {diff['changed']} changed nodes, {len(diff['nodes'])} nodes to "
+                f"process for {len(diff['predicates'])} predicates")
+    return work_order_file
+
+
+def LatestRecordChunks(raw_files: list, id_field: str, work_order_file: str) -> dict:
+    """
+    The file list of a recompute order in which every record appears only with its newest raw version, a record in a
+    later chunk replaces the same record in an earlier one. Chunks that lose records are written again next to the
+    original with only the remaining records, noted as 'file' with the original as 'source_file'. Records without id
+    are always kept
+
+    :param list raw_files: raw chunks of the source and the later orders, oldest first
+    :param str id_field: field of the records with their id, as of the descriptor
+    :param str work_order_file: the recompute order, its name goes into the names of the rewritten chunks
+    :return: a 'file_list' for the order, every entry on status 2
+    :rtype: dict
+    """
+    newest = {}
+    for position, raw_file in enumerate(raw_files):
+        for record in load_from_json(raw_file) or ():
+            if record.get(id_field) is not None:
+                newest[str(record[id_field])] = position
+    order_hash = hashlib.sha1(os.path.basename(work_order_file).encode('utf-8')).hexdigest()[:8]
+    file_list = {}
+    for position, raw_file in enumerate(raw_files):
+        records = load_from_json(raw_file) or []
+        latest = [x for x in records if x.get(id_field) is None or newest[str(x[id_field])] == position]
+        if len(latest) == len(records):
+            file_list[str(position)] = {"file": raw_file, "status": 2}
+            continue
+        compression = compression_of(raw_file)
+        latest_file = f"{os.path.splitext(strip_compression(raw_file))[0]}_latest-{order_hash}.json" \
+                      f"{COMPRESSION_SUFFIXES.get(compression, '')}"
+        with open_file(latest_file, "w") as chunk:
+            json.dump(latest, chunk)
+        file_list[str(position)] = {"file": latest_file, "source_file": raw_file, "status": 2}
+        logger.info(f"Chunk {raw_file}: {len(records) - len(latest)} of {len(records)} records have newer versions")
+    return file_list
+
+
 def FetchWorkOrderSolr(work_order_file: str,
                        solr_url: str,
                        query="*:*",
@@ -728,13 +1046,14 @@ def FetchWorkOrderSolr(work_order_file: str,
             data = test_json(load_remote_content(solr_url, parameters))
             if data is not None:
                 file_path = f"{os.path.basename(work_order_file)}_{hash(start_time)}_{i+1}-{n}.json"
+                file_path += COMPRESSION_SUFFIXES.get(work_order['meta'].get('compression'), "")
                 filename = os.path.join(base_path, file_path)
                 try:
                     extracted_data = solr_handle_return(data)
                 except SpchtErrors.ParsingError as e:
                     logging.error(f"Error while parsing solr return: {e}")
                     return False
-                with open(filename, "w") as dumpfile:
+                with open_file(filename, "w") as dumpfile:
                     json.dump(extracted_data, dumpfile)
                 file_spec = {"file": os.path.relpath(filename), "status": 2}
                 # ? to bring file status in line with order status, files start with 2, logically file_status 1 would be
@@ -783,10 +1102,30 @@ def FetchWorkOrderSolr(work_order_file: str,
 def FulfillProcessingOrder(work_order_file: str, subject: str, spcht_object: Spcht, force=False, **kwargs):
     """
     Processes all raw data files specified in the work order file list
+
+    Records that run out of time, either the 'record_time_budget' or a regex timeout of the descriptor, are
+    abandoned and written to a quarantine file next to the chunk, see ReplayQuarantine
+
+    Next to the rdf file a 'subject_file' with every distinct subject of the chunk is written, one per line, the delete
+    steps only need those
     :param str work_order_file: filename of a work order file
     :param str subject: a part of the subject without identifier  in the <subject> <predicate> <object> chain
     :param Spcht spcht_object: ready loaded Spcht object
     :param bool force: if true, will ignore security checks like order status
+    :param float record_time_budget: optional kwarg, maximum seconds a single record may take
+    :param str rdf_writer: optional kwarg, 'turtle' (default) or 'nt' write the triples of each record directly to the
+        file, a .ttl or a .nt file respectively, 'rdflib' collects the entire chunk in a graph first like it used to be, 'termdict' writes the binary term
+        dictionary format that the insert and delete steps can read without any rdf parsing
+    :param int payload_size: optional kwarg, if set a 'payload_file' with ready sparql INSERT DATA bodies of at most
+        this many bytes is written next to the rdf file, FulfillSparqlInsertOrder sends those as they are
+    :param str delta_store: optional kwarg, folder of the delta stores, together with 'named_graph' the output is
+        compared with the loaded state and update orders only send the differences, see DiffRecord
+    :param bool delta_triples: optional kwarg, keep the triples in the delta store so single triples can be removed
+        instead of replacing every changed subject
+    :param str record_index: optional kwarg, folder of the record indices, together with 'named_graph' update orders
+        skip records that are unchanged since they were loaded the last time, with the same descriptor and subject
+
+    Orders made by CreateRecomputeOrder only process the nodes noted in the order
     :return: True if everything worked, False if something is not working
     :rtype: boolean
     """
@@ -805,6 +1144,9 @@ def FulfillProcessingOrder(work_order_file: str, subject: str, spcht_object: Spc
     if spcht_object.descriptor_file is None:
         print("Spcht object must be succesfully loaded")
         return False
+    # ? the spcht object might be shared with the next order, the filter of a recompute must not stick to it
+    old_node_filter = spcht_object.node_filter
+    delta_store, record_index = None, None
     try:
         # when traversing a list/iterable we cannot change the iterable while doing so
         # but for proper use i need to periodically check if something has changed, as the program
@@ -819,40 +1161,162 @@ def FulfillProcessingOrder(work_order_file: str, subject: str, spcht_object: Spc
             logging.error("Given order file is above status 3, is already fully processed, cannot proceed")
             return False
         work_order = work_order0
+        time_budget = kwargs.get('record_time_budget')
+        rdf_writer = kwargs.get('rdf_writer') or "turtle"
+        if rdf_writer not in ("turtle", "nt", "rdflib", "termdict"):
+            logger.error(f"Unknown rdf_writer '{rdf_writer}', must be one of 'turtle', 'nt', 'rdflib' or 'termdict'")
+            return False
+        recompute = work_order['meta'].get('recompute')
+        if recompute and recompute['descriptor_hash'] != spcht_object.descriptor_hash:
+            logger.error("Recompute orders have to be processed with the descriptor they were created for")
+            return False
+        if recompute:  # ? both know only complete records, a recompute produces parts
+            if kwargs.get('delta_store') or kwargs.get('record_index'):
+                logger.info("Recompute order, delta store and record index are not used")
+        else:
+            delta_store = DeltaStore.for_graph(kwargs.get('delta_store'), kwargs.get('named_graph'))
+            if kwargs.get('delta_store') and delta_store is None:
+                logger.warning("A delta store needs the named graph, processing without delta")
+            record_index = RecordIndex.for_graph(kwargs.get('record_index'), kwargs.get('named_graph'))
+            if kwargs.get('record_index') and record_index is None:
+                logger.warning("A record index needs the named graph, processing every record")
+        if recompute:
+            spcht_object.node_filter = recompute['nodes']
+        # ? the same record gives other triples if the descriptor or the subject changes
+        record_salt = f"{spcht_object.descriptor_hash}|{subject}"
+        # ? an insert order might fill an emptied graph, only updates may trust what was loaded before
+        skip_unchanged = record_index is not None and work_order['meta']['type'] == "update"
         logger.info(
             f"Starting processing on files of work order '{os.path.basename(work_order_file)}', detected {len(work_order['file_list'])} Files")
         print(f"Start of Spcht Processing - {os.getpid()}")
         _ = 0
         for key in work_order0['file_list']:
             _ += 1
-            if work_order['file_list'][key]['status'] == 2:  # Status 2 - Downloaded, not processed
-                work_order = UpdateWorkOrder(work_order_file,
-                                             update=('file_list', key, 'status', 3),
-                                             insert=('file_list', key, 'processing_start', datetime.now().isoformat()))
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (2,), 3, 'processing_start')
+            if claimed:  # Status 2 - Downloaded, not processed, and no other process took it
+                work_order = claimed
                 mapping_data = load_from_json(work_order['file_list'][key]['file'])
+                # ? chunk.json.gz -> chunk_rdf.ttl.gz, the quarantine stays uncompressed as its meant for humans
+                chunk_base = os.path.splitext(strip_compression(work_order['file_list'][key]['file']))[0]
+                if recompute:  # ? the raw chunks belong to another order whose files might still be around
+                    chunk_base = f"{chunk_base}_recompute"
+                quarantine_file = f"{chunk_base}_quarantine.jsonl"
+                if os.path.exists(quarantine_file):  # leftovers of an interrupted run of this very chunk
+                    os.remove(quarantine_file)
+                compression = COMPRESSION_SUFFIXES.get(work_order['meta'].get('compression'), '')
+                if rdf_writer == "termdict":
+                    rdf_dump = f"{chunk_base}_rdf{TERM_DICT_SUFFIX}{compression}"
+                    rdf_file = open_file(rdf_dump, "wb")
+                    term_writer = TermDictWriter(rdf_file)
+                else:  # ? ReadTriples only takes the fast way without rdflib for files that end with .nt
+                    rdf_dump = f"{chunk_base}_rdf.{'nt' if rdf_writer == 'nt' else 'ttl'}{compression}"
+                    rdf_file = open_file(rdf_dump, "w")
+                payload_writer = None
+                if kwargs.get('payload_size'):
+                    payload_dump = f"{chunk_base}_payload.nt{compression}"
+                    payload_writer = SparqlPayloadWriter(open_file(payload_dump, "w"), int(kwargs['payload_size']))
+                delta_dumps, delta_files = {}, {}
+                delta_stats = {"unchanged": 0, "changed": 0, "new": 0}
+                if delta_store:  # ? insert orders load everything anyway, they only need the new state
+                    kinds = ("state", "delta", "retract", "wipe") if work_order['meta']['type'] == "update" else ("state",)
+                    for kind, extension in (("state", "jsonl"), ("delta", "nt"), ("retract", "nt"), ("wipe", "txt")):
+                        if kind in kinds:
+                            delta_dumps[kind] = f"{chunk_base}_{kind}.{extension}{compression}"
+                            delta_files[kind] = open_file(delta_dumps[kind], "w")
+                if record_index:
+                    record_dump = f"{chunk_base}_records.jsonl{compression}"
+                    record_out = open_file(record_dump, "w")
+                unchanged_records = 0
                 quadros = []
+                subjects = {}
+                triples = 0
                 elements = 0
+                regex_timeouts = 0
+                quarantined = 0
                 for entry in mapping_data:
+                    record_hash = None
+                    if record_index and entry.get(spcht_object.id_field) is not None:
+                        record_hash = RecordIndex.record_hash(entry, record_salt)
+                        if skip_unchanged and record_index.get(str(entry[spcht_object.id_field])) == record_hash:
+                            unchanged_records += 1  # ? same triples as already loaded, nothing to do at all
+                            continue
                     try:
-                        quader = spcht_object.process_data(entry, subject)
+                        quader = spcht_object.process_data(entry, subject, time_budget=time_budget)
                         elements += 1
-                        quadros += quader
+                        if record_hash:
+                            record_out.write(json.dumps([str(entry[spcht_object.id_field]), record_hash]) + "\n")
+                        if recompute and spcht_object.last_subject:  # ? might have lost all its triples of the predicates
+                            subjects[spcht_object.last_subject] = None
+                        for each in quader:
+                            subjects[each.subject.content] = None
+                        changes = quader
+                        if delta_store:
+                            changes = DiffRecord(quader, delta_store, delta_files, delta_stats, kwargs.get('delta_triples'))
+                        if payload_writer:
+                            payload_writer.write(changes if 'delta' in delta_files else quader)
+                        if rdf_writer == "rdflib":
+                            quadros += quader
+                        elif rdf_writer == "termdict":
+                            triples += term_writer.write(quader)
+                        else:  # ? the triples of a record are written right away, nothing piles up in memory
+                            triples += write_rdf_stream(quader, rdf_file, rdf_writer)
                     except SpchtErrors.MandatoryError:
                         logger.info(
                             f"Mandatory field was not found in entry {elements} of file {work_order['file_list'][key]['file']}")
+                    except SpchtErrors.RecordTimeoutError as e:
+                        reason = "time_budget"
+                        if isinstance(e, SpchtErrors.RegexTimeoutError):
+                            reason = "regex_timeout"
+                            regex_timeouts += 1
+                        quarantined += 1
+                        record_id = entry.get(spcht_object.id_field, "?")
+                        logger.warning(f"Record '{record_id}' of file {work_order['file_list'][key]['file']} quarantined, {reason}: {e}")
+                        QuarantineRecord(quarantine_file, entry, record_id, reason, str(e))
 
-                logger.info(f"Finished file {_} of {len(work_order['file_list'])}, {len(quadros)} triples")
-                rdf_dump = f"{work_order['file_list'][key]['file'][:-4]}_rdf.ttl"
-                with open(rdf_dump, "w") as rdf_file:
+                if rdf_writer == "rdflib":
+                    triples = len(quadros)
                     rdf_file.write(process2RDF(quadros))  # ? avoiding circular imports
+                rdf_file.close()
+                if payload_writer:
+                    payload_writer.flush()
+                    payload_writer.file.close()
+                for each in delta_files.values():
+                    each.close()
+                if record_index:
+                    record_out.close()
+                subject_dump = f"{chunk_base}_subjects.txt{compression}"
+                with open_file(subject_dump, "w") as subject_file:
+                    subject_file.writelines(f"<{x}>\n" for x in subjects if is_valid_iri(str(x)))
+                logger.info(f"Finished file {_} of {len(work_order['file_list'])}, {triples} triples")
                 work_order = UpdateWorkOrder(work_order_file,
                                              update=('file_list', key, 'status', 4),
                                              insert=[('file_list', key, 'rdf_file', rdf_dump),
+                                                     ('file_list', key, 'subject_file', subject_dump),
                                                      (
                                                      'file_list', key, 'processing_finish', datetime.now().isoformat()),
                                                      ('file_list', key, 'elements', elements),
-                                                     ('file_list', key, 'triples', len(quadros))
+                                                     ('file_list', key, 'triples', triples),
+                                                     ('file_list', key, 'regex_timeouts', regex_timeouts),
+                                                     ('file_list', key, 'quarantined', quarantined)
                                                      ])
+                if quarantined > 0:
+                    work_order = UpdateWorkOrder(work_order_file,
+                                                 insert=('file_list', key, 'quarantine_file', quarantine_file))
+                if payload_writer:
+                    work_order = UpdateWorkOrder(work_order_file,
+                                                 insert=[('file_list', key, 'payload_file', payload_dump),
+                                                         ('file_list', key, 'payload_batches', payload_writer.batches)])
+                if delta_store:
+                    logger.info(f"Delta of file {_}: {delta_stats['new']} new, {delta_stats['changed']} changed and "
+                                f"{delta_stats['unchanged']} unchanged subjects")
+                    work_order = UpdateWorkOrder(work_order_file,
+                                                 insert=[('file_list', key, f'{kind}_file', dump) for kind, dump in delta_dumps.items()]
+                                                 + [('file_list', key, 'delta', delta_stats)])
+                if record_index:
+                    logger.info(f"Skipped {unchanged_records} unchanged records of file {_}")
+                    work_order = UpdateWorkOrder(work_order_file,
+                                                 insert=[('file_list', key, 'record_file', record_dump),
+                                                         ('file_list', key, 'unchanged_records', unchanged_records)])
         logger.info(f"Finished processing {len(work_order['file_list'])} files and creating turtle files")
         print(f"End of Spcht Processing - {os.getpid()}")
         return True
@@ -870,6 +1334,532 @@ def FulfillProcessingOrder(work_order_file: str, subject: str, spcht_object: Spc
         traceback.print_exc()
         logger.error(f"Unknown type of exception: '{e}'")
         return False
+    finally:
+        CloseLoadState({"delta_store": delta_store, "record_index": record_index})
+        spcht_object.node_filter = old_node_filter
+
+
+def QuarantineRecord(quarantine_file: str, record: dict, record_id: str, reason: str, message=""):
+    """
+    Appends a single abandoned record to a quarantine file, one json object per line, the raw record is kept as is so
+    it can be replayed later on
+
+    :param str quarantine_file: file path of the quarantine jsonl, gets created if not present
+    :param dict record: the raw record as it was given to Spcht.process_data
+    :param str record_id: identifier of the record, solely for humans
+    :param str reason: short reason for the quarantine, 'time_budget' or 'regex_timeout'
+    :param str message: the message of the causing exception
+    :return: True if the record could be written, False if not
+    :rtype: bool
+    """
+    line = {"id": record_id, "reason": reason, "message": message, "time": datetime.now().isoformat(), "record": record}
+    try:
+        with open(quarantine_file, "a") as quarantine:
+            quarantine.write(json.dumps(line) + "\n")
+        return True
+    except OSError as e:
+        logger.error(f"Could not write record '{record_id}' to quarantine file {quarantine_file}: {e}")
+        return False
+
+
+def ReplayQuarantine(quarantine_file: str, subject: str, spcht_object: Spcht, time_budget=None) -> list:
+    """
+    Runs all records of a quarantine file through the given Spcht again, with debug mode enabled so the way through
+    the nodes is traced on screen. Regex timeouts of the descriptor still apply, the per record time budget only
+    if given explicitly
+
+    :param str quarantine_file: file path of a quarantine jsonl as written by FulfillProcessingOrder
+    :param str subject: a part of the subject without identifier  in the <subject> <predicate> <object> chain
+    :param Spcht spcht_object: ready loaded Spcht object, should be the same descriptor that quarantined the records
+    :param float time_budget: maximum time in seconds per record, None for unlimited
+    :return: a list of dictionaries with id, outcome, number of triples and duration for each replayed record
+    :rtype: list
+    """
+    if not isinstance(spcht_object, Spcht) or spcht_object.descriptor_file is None:
+        print("Spcht object must be succesfully loaded")
+        return []
+    report = []
+    old_debug = spcht_object.debug
+    spcht_object.debug = True
+    try:
+        with open(quarantine_file, "r") as quarantine:
+            for line in quarantine:
+                if not line.strip():
+                    continue
+                quarantined = json.loads(line)
+                print(f"+++ Replaying record '{quarantined['id']}', quarantined for {quarantined['reason']} +++")
+                outcome, triples = "ok", 0
+                start = time.monotonic()
+                try:
+                    triples = len(spcht_object.process_data(quarantined['record'], subject, time_budget=time_budget))
+                except SpchtErrors.RegexTimeoutError as e:
+                    outcome = f"regex_timeout: {e}"
+                except SpchtErrors.RecordTimeoutError as e:
+                    outcome = f"time_budget: {e}"
+                except SpchtErrors.MandatoryError as e:
+                    outcome = f"mandatory: {e}"
+                report.append({"id": quarantined['id'], "outcome": outcome, "triples": triples,
+                               "seconds": round(time.monotonic() - start, 3)})
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Could not read quarantine file {quarantine_file}: {e}")
+    finally:
+        spcht_object.debug = old_debug
+    return report
+
+
+def ReadTriples(rdf_file: str):
+    """
+    Reads the triples of a processed rdf file, regardless of it being turtle or the binary term dictionary and with or
+    without compression. Only turtle needs rdflib, the term dictionary is read as stream
+
+    :param str rdf_file: file path of an 'rdf_file', 'delta_file' or 'retract_file' of a work order
+    :return: a generator of (subject, predicate, object) as N-Triples/sparql strings
+    :raises SpchtErrors.ParsingError: if a term dictionary is broken
+    :raises FileNotFoundError: if the file is not there
+    """
+    if strip_compression(rdf_file).endswith(TERM_DICT_SUFFIX):
+        with open_file(rdf_file, "rb") as rdf_source:
+            yield from read_term_dict(rdf_source)
+        return
+    if strip_compression(rdf_file).endswith(".nt"):  # ? written by us, one triple per line and single spaced
+        with open_file(rdf_file, "r") as rdf_source:
+            for line in rdf_source:
+                if line.strip():
+                    yield tuple(line.rstrip()[:-2].split(" ", 2))
+        return
+    import rdflib  # ? only the steps that actually parse turtle should pay for rdflib
+    that_graph = rdflib.Graph()
+    with open_file(rdf_file, "rb") as rdf_source:
+        that_graph.parse(source=rdf_source, format="turtle")
+    for sub, pred, obj in that_graph:
+        yield sub.n3(), pred.n3(), obj.n3()
+
+
+def ChunkSubjects(file_entry: dict):
+    """
+    The distinct subjects of one processed chunk, read from its 'subject_file' or, for orders processed before those
+    existed, from the rdf file
+
+    :param dict file_entry: one entry of the 'file_list' of a work order
+    :return: an iterable of subjects as N-Triples IRIs, with the <>
+    :raises FileNotFoundError: if the file is not there
+    """
+    if 'subject_file' in file_entry:
+        with open_file(file_entry['subject_file'], "r") as subject_file:
+            return [x.rstrip("\n") for x in subject_file if x.strip()]
+    return dict.fromkeys(sub for sub, _, _ in ReadTriples(file_entry['rdf_file']))
+
+
+def DeleteSubjects(file_entry: dict):
+    """
+    The subjects whose triples have to be deleted entirely before the chunk is inserted, for delta updates only those
+    listed in the 'wipe_file', otherwise all of the chunk
+
+    :param dict file_entry: one entry of the 'file_list' of a work order
+    :return: an iterable of subjects as N-Triples IRIs, with the <>
+    """
+    if 'wipe_file' in file_entry:
+        with open_file(file_entry['wipe_file'], "r") as wipe_file:
+            return [x.rstrip("\n") for x in wipe_file if x.strip()]
+    return ChunkSubjects(file_entry)
+
+
+def InsertFile(file_entry: dict) -> str:
+    """
+    :param dict file_entry: one entry of the 'file_list' of a work order
+    :return: the file with the triples that have to be inserted, for delta updates only the added ones
+    :rtype: str
+    """
+    return file_entry.get('delta_file', file_entry['rdf_file'])
+
+
+def RetractBlocks(file_entry: dict, block_size=1000):
+    """
+    The single triples a delta update removes, in blocks ready for a DELETE DATA
+
+    :param dict file_entry: one entry of the 'file_list' of a work order
+    :param int block_size: number of triples per block
+    :return: a generator of N-Triples blocks, nothing if the entry has no 'retract_file'
+    """
+    if 'retract_file' not in file_entry:
+        return
+    block = []
+    for sub, pred, obj in ReadTriples(file_entry['retract_file']):
+        block.append(f"{sub} {pred} {obj} .\n")
+        if len(block) >= block_size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+def DiffRecord(quadro_list: list, delta_store: DeltaStore, delta_files: dict, stats: dict, keep_triples=False) -> list:
+    """
+    Compares the triples of one processed record with what the delta store knows about its subjects. Writes the new
+    state of changed subjects to the 'state' file and, for update orders, the added triples to 'delta', the removed
+    ones to 'retract' and subjects that have to be replaced entirely to 'wipe'. Subjects the store knows only by hash
+    or not at all get replaced entirely
+
+    :param list quadro_list: SpchtTriples of one record
+    :param DeltaStore delta_store: store of the named graph
+    :param dict delta_files: open text files, 'state' is always needed, the others only for update orders
+    :param dict stats: counter of 'unchanged', 'changed' and 'new' subjects, gets updated
+    :param bool keep_triples: store the triples and not only their hash, allows the removal of single triples
+    :return: the SpchtTriples that have to be inserted
+    :rtype: list
+    """
+    current = {}
+    for each in quadro_list:
+        terms = rdf_term(each.subject), rdf_term(each.predicate), rdf_term(each.sobject)
+        if None not in terms:
+            current.setdefault(terms[0], {})[f"{terms[1]} {terms[2]}"] = each
+    known = delta_store.lookup(current)
+    added = []
+    for subject, pairs in current.items():
+        digest = DeltaStore.subject_hash(pairs)
+        old = known.get(subject)
+        if old is not None and old[0] == digest:
+            stats['unchanged'] += 1
+            continue
+        if old is not None and old[1] is not None:
+            stats['changed'] += 1
+            old_pairs = set(old[1])
+            fresh = [x for x in pairs if x not in old_pairs]
+            if 'retract' in delta_files:
+                delta_files['retract'].writelines(f"{subject} {x} .\n" for x in old_pairs - pairs.keys())
+        else:
+            stats['new' if old is None else 'changed'] += 1
+            fresh = list(pairs)
+            if 'wipe' in delta_files:
+                delta_files['wipe'].write(f"{subject}\n")
+        if 'delta' in delta_files:
+            delta_files['delta'].writelines(f"{subject} {x} .\n" for x in fresh)
+        added += [pairs[x] for x in fresh]
+        delta_files['state'].write(json.dumps([subject, digest, list(pairs) if keep_triples else None]) + "\n")
+    return added
+
+
+def CommitDelta(delta_store: DeltaStore or None, file_entry: dict) -> None:
+    """
+    Writes the state of a freshly inserted chunk into the delta store, only after this the next update order diffs
+    against it
+
+    :param DeltaStore or None delta_store: store of the named graph, None does nothing
+    :param dict file_entry: one entry of the file_list of a work order
+    """
+    if delta_store is None or 'state_file' not in file_entry:
+        return
+    with open_file(file_entry['state_file'], "r") as state_file:
+        delta_store.commit(tuple(json.loads(x)) for x in state_file if x.strip())
+
+
+def KnownSubjects(subjects, registry: SubjectRegistry or None) -> list:
+    """
+    Removes all subjects that are definitely not in the triplestore yet, there is nothing to delete for those
+
+    :param subjects: iterable of subjects in n-triples notation
+    :param SubjectRegistry or None registry: registry of the named graph, without one nothing is removed
+    :return: the subjects that might already exist
+    :rtype: list
+    """
+    subjects = list(subjects)
+    if registry is None:
+        return subjects
+    known = [x for x in subjects if x in registry]
+    logger.info(f"Skipping deletion of {len(subjects) - len(known)} of {len(subjects)} subjects that are new")
+    return known
+
+
+def RegisterSubjects(registry: SubjectRegistry or None, file_entry: dict) -> None:
+    """
+    Adds the subjects of a freshly inserted chunk to the subject registry and saves it right away, a registry that
+    misses inserted subjects would let later updates skip necessary deletes
+
+    :param SubjectRegistry or None registry: registry of the named graph, None does nothing
+    :param dict file_entry: one entry of the file_list of a work order
+    """
+    if registry is None:
+        return
+    registry.update(ChunkSubjects(file_entry))
+    registry.save()
+
+
+def OpenLoadState(named_graph: str, **kwargs) -> dict:
+    """
+    Opens everything that keeps track of what was loaded into a named graph, unused ones are None
+
+    :param str named_graph: the graph
+    :param kwargs: the 'subject_registry', 'delta_store' and 'record_index' settings, the rest is ignored
+    :return: a dictionary with 'registry', 'delta_store' and 'record_index'
+    :rtype: dict
+    """
+    return {"registry": SubjectRegistry.for_graph(kwargs.get('subject_registry'), named_graph),
+            "delta_store": DeltaStore.for_graph(kwargs.get('delta_store'), named_graph),
+            "record_index": RecordIndex.for_graph(kwargs.get('record_index'), named_graph)}
+
+
+def CommitLoadState(load_state: dict, file_entry: dict) -> None:
+    """
+    Tells all the stores of OpenLoadState about a chunk that was just inserted successfully
+
+    :param dict load_state: as returned by OpenLoadState
+    :param dict file_entry: one entry of the file_list of a work order
+    """
+    RegisterSubjects(load_state.get('registry'), file_entry)
+    CommitDelta(load_state.get('delta_store'), file_entry)
+    if load_state.get('record_index') is not None and 'record_file' in file_entry:
+        with open_file(file_entry['record_file'], "r") as record_file:
+            load_state['record_index'].commit(tuple(json.loads(x)) for x in record_file if x.strip())
+
+
+def CloseLoadState(load_state: dict) -> None:
+    """
+    Closes the stores of OpenLoadState that hold an open database, the subject registry is saved with every commit
+
+    :param dict load_state: as returned by OpenLoadState, an empty one does nothing
+    """
+    for store in ('delta_store', 'record_index'):
+        if load_state.get(store) is not None:
+            load_state[store].close()
+
+
+def SeedSubjectRegistry(subject_registry: str, sparql_endpoint: str, named_graph: str, user=None, password=None,
+                        page_size=10000, **kwargs) -> bool:
+    """
+    Creates the subject registry of a named graph from all subjects that are currently in the triplestore. Has to be
+    done once before the registry is used, afterwards every insert keeps it up to date. Data that reaches the graph
+    by other means than work orders makes the registry wrong, it has to be seeded anew in that case
+    :param str subject_registry: folder of the subject registries
+    :param str sparql_endpoint: endpoint of the sparql interface
+    :param str named_graph: the graph whose subjects get registered
+    :param str user: optional user for the sparql interface
+    :param str password: optional password for the sparql interface
+    :param int page_size: number of subjects fetched by one request, the store might send less, virtuoso caps every
+        result at its ResultSetMaxRows (10000 by default), the next page then starts after the rows actually received
+    :param kwargs: additional parameters that all will be ignored
+    :return: True if the registry was written, False if something went wrong
+    :rtype: bool
+    """
+    count_query = f"SELECT (COUNT(DISTINCT ?s) AS ?n) WHERE {{ GRAPH <{named_graph}> {{ ?s ?p ?o }} }}"
+    status, result = sparqlQuery(count_query, sparql_endpoint, auth=user, pwd=password)
+    try:
+        total = int(result['results']['bindings'][0]['n']['value']) if status else None
+    except (KeyError, IndexError, TypeError, ValueError):
+        total = None
+    if total is None:
+        logger.error(f"Could not count the subjects of {named_graph}")
+        return False
+    # ? twice the current size leaves room for growth before the error rate goes up
+    registry = SubjectRegistry(SubjectRegistry.graph_file(subject_registry, named_graph), capacity=max(1000000, 2 * total))
+    offset = 0
+    while True:
+        query = f"SELECT DISTINCT ?s WHERE {{ GRAPH <{named_graph}> {{ ?s ?p ?o }} }} ORDER BY ?s " \
+                f"LIMIT {page_size} OFFSET {offset}"
+        status, result = sparqlQuery(query, sparql_endpoint, auth=user, pwd=password)
+        try:
+            rows = result['results']['bindings'] if status else None
+        except (KeyError, TypeError):
+            rows = None
+        if rows is None:
+            logger.error(f"Fetching subjects {offset} to {offset + page_size} of {named_graph} failed")
+            return False
+        if not rows:
+            break
+        registry.update(f"<{x['s']['value']}>" for x in rows if x['s']['type'] == "uri")
+        offset += len(rows)
+    if offset < total:  # ? a registry missing subjects would skip deletes that are needed
+        logger.error(f"Got only {offset} of {total} subjects of {named_graph}, not seeding the registry")
+        return False
+    os.makedirs(subject_registry, exist_ok=True)
+    if os.path.exists(registry.file_path):  # ? a new seed replaces the old registry, saving would merge them
+        os.remove(registry.file_path)
+    registry.save()
+    logger.info(f"Seeded subject registry {registry.file_path} of {named_graph} with {len(registry)} subjects")
+    return True
+
+
+def StagingGraph(named_graph: str, work_order_file: str) -> str:
+    """
+    Name of the temporary graph a swap order loads into, derived from the work order so a resumed order finds it again
+
+    :param str named_graph: the live graph that gets replaced
+    :param str work_order_file: file path of the swap order
+    :return: IRI of the staging graph
+    :rtype: str
+    """
+    order_hash = hashlib.sha1(os.path.basename(work_order_file).encode('utf-8')).hexdigest()[:12]
+    return f"{named_graph.rstrip('/#')}/spcht-staging-{order_hash}"
+
+
+def GraphUpdate(query: str, method: str, isql=None, sparql_endpoint=None, user=None, password=None) -> bool:
+    """
+    Sends a single sparql update either over the sparql interface or through an open isql session
+
+    :param str query: the sparql update
+    :param str method: 'sparql' or 'isql', like the method of a work order
+    :param IsqlSession isql: the session for method 'isql'
+    :return: True if the update was send without reported errors
+    :rtype: bool
+    """
+    if method == "isql":
+        try:
+            isql.execute([f"sparql {query};"])
+            return True
+        except SpchtErrors.IsqlError as e:
+            logger.error(f"Error while running isql interface: {e}")
+            return False
+    status, discard = sparqlQuery(query, sparql_endpoint, auth=user, pwd=password)
+    return bool(status)
+
+
+def CountGraphTriples(named_graph: str, method: str, isql=None, sparql_endpoint=None, user=None, password=None):
+    """
+    Counts all triples of one named graph
+
+    :param str named_graph: the graph
+    :param str method: 'sparql' or 'isql', see GraphUpdate
+    :return: the number of triples or None if the count failed
+    :rtype: int or None
+    """
+    query = f"SELECT (COUNT(*) AS ?n) WHERE {{ GRAPH <{named_graph}> {{ ?s ?p ?o }} }}"
+    try:
+        if method == "isql":
+            # ? with VERBOSE=OFF isql prints the column name, the type and then the value in a line of its own
+            lines = isql.execute([f"sparql {query};"])
+            return int([x.strip() for x in lines if x.strip().isdigit()][-1])
+        status, result = sparqlQuery(query, sparql_endpoint, auth=user, pwd=password)
+        return int(result['results']['bindings'][0]['n']['value']) if status else None
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        logger.error(f"Could not count the triples of {named_graph}: {e}")
+        return None
+    except SpchtErrors.IsqlError as e:
+        logger.error(f"Error while running isql interface: {e}")
+        return None
+
+
+def MoveLoadState(source_graph: str, target_graph: str or None, **kwargs) -> None:
+    """
+    Hands the subject registry, delta store and record index of one graph over to another graph, replacing what the
+    other graph had. Without a target the stores of the source graph are removed
+
+    :param str source_graph: graph whose store files are moved
+    :param str or None target_graph: graph that gets them, None to discard them
+    :param kwargs: the 'subject_registry', 'delta_store' and 'record_index' settings, the rest is ignored
+    """
+    for store, setting in ((SubjectRegistry, 'subject_registry'), (DeltaStore, 'delta_store'),
+                           (RecordIndex, 'record_index')):
+        if not kwargs.get(setting):
+            continue
+        source = store.graph_file(kwargs[setting], source_graph)
+        target = store.graph_file(kwargs[setting], target_graph) if target_graph else None
+        for suffix in ("-wal", "-shm"):  # ? sqlite leftovers, closed stores normally have none
+            for sidecar in (source + suffix, target + suffix if target else None):
+                if sidecar and os.path.exists(sidecar):
+                    os.remove(sidecar)
+        if not os.path.exists(source):
+            continue
+        if target:
+            os.replace(source, target)
+        else:
+            os.remove(source)
+
+
+def PrepareGraphSwap(work_order_file: str, named_graph: str, user: str, password: str, sparql_endpoint=None,
+                     isql_path=None, isql_port=1111, **kwargs):
+    """
+    First step of a swap order, empties the staging graph and its stores in case an earlier attempt left something
+    behind and notes the staging graph in the work order. With a subject registry folder an empty registry for the
+    staging graph is created, after the swap it replaces the registry of the live graph
+    :param str work_order_file: file path to a work order file
+    :param str named_graph: the live graph that gets replaced
+    :param str user: user for the sparql or isql interface
+    :param str password: password for the sparql or isql interface
+    :param str sparql_endpoint: endpoint of the sparql interface for every method but 'isql'
+    :param str isql_path: path to the isql executable for method 'isql'
+    :param int isql_port: port of the virtuoso sql database
+    :param str subject_registry: optional kwarg, folder of the subject registries
+    :param kwargs: additional parameters that all will be ignored
+    :return: the staging graph or False if something went wrong
+    :rtype: str or bool
+    """
+    work_order = load_from_json(work_order_file)
+    if work_order is None:
+        return False
+    if work_order['meta']['type'] != "swap":
+        logger.error(f"Insert type must be 'swap' for PrepareGraphSwap, but is '{work_order['meta']['type']}'")
+        return False
+    method = work_order['meta']['method']
+    staging = StagingGraph(named_graph, work_order_file)
+    isql = IsqlSession(isql_path, isql_port, user, password) if method == "isql" else None
+    try:
+        if not GraphUpdate(f"DROP SILENT GRAPH <{staging}>", method, isql, sparql_endpoint, user, password):
+            return False
+    finally:
+        if isql:
+            isql.close()
+    MoveLoadState(staging, None, **kwargs)
+    if kwargs.get('subject_registry'):
+        elements = sum(x.get('elements', 0) for x in work_order['file_list'].values())
+        registry = SubjectRegistry(SubjectRegistry.graph_file(kwargs['subject_registry'], staging),
+                                   capacity=max(1000000, 2 * elements))
+        os.makedirs(kwargs['subject_registry'], exist_ok=True)
+        registry.save()
+    UpdateWorkOrder(work_order_file, insert=("meta", "staging_graph", staging))
+    logger.info(f"Order {work_order_file}: loading into staging graph {staging} instead of {named_graph}")
+    return staging
+
+
+def SwapStagingGraph(work_order_file: str, named_graph: str, user: str, password: str, sparql_endpoint=None,
+                     isql_path=None, isql_port=1111, swap_min_ratio=0.9, force=False, **kwargs) -> bool:
+    """
+    Last step of a swap order, replaces the live graph with the completely loaded staging graph. The staging graph is
+    counted first, it must not be empty and must hold at least swap_min_ratio of the triples the processing wrote,
+    less than that means the load went wrong somewhere and the live graph stays as it is. Triples that appear in more
+    than one chunk are only stored once, therefore the ratio is not 1. The switch itself is a single sparql MOVE,
+    the old graph disappears without any per subject deletes
+    :param str work_order_file: file path to a work order file
+    :param str named_graph: the live graph that gets replaced
+    :param str user: user for the sparql or isql interface
+    :param str password: password for the sparql or isql interface
+    :param str sparql_endpoint: endpoint of the sparql interface for every method but 'isql'
+    :param str isql_path: path to the isql executable for method 'isql'
+    :param int isql_port: port of the virtuoso sql database
+    :param float swap_min_ratio: share of the processed triples that must have arrived in the staging graph
+    :param bool force: if true, swaps without the check of the staging graph
+    :param kwargs: the 'subject_registry', 'delta_store' and 'record_index' settings, the rest is ignored
+    :return: True if the live graph was replaced
+    :rtype: bool
+    """
+    work_order = load_from_json(work_order_file)
+    if work_order is None:
+        return False
+    staging = work_order['meta'].get('staging_graph')
+    if not staging:
+        logger.error(f"Order {work_order_file} has no staging graph, it was never loaded")
+        return False
+    method = work_order['meta']['method']
+    processed = sum(x.get('triples', 0) for x in work_order['file_list'].values())
+    isql = IsqlSession(isql_path, isql_port, user, password) if method == "isql" else None
+    try:
+        staged = CountGraphTriples(staging, method, isql, sparql_endpoint, user, password)
+        if staged is None:
+            return False
+        if not force and (staged == 0 or staged < processed * (swap_min_ratio or 0)):
+            logger.error(f"Staging graph {staging} holds {staged} triples of {processed} processed ones, "
+                         f"the live graph {named_graph} stays untouched")
+            return False
+        if not GraphUpdate(f"MOVE GRAPH <{staging}> TO GRAPH <{named_graph}>", method, isql, sparql_endpoint, user,
+                           password):
+            return False
+        live = CountGraphTriples(named_graph, method, isql, sparql_endpoint, user, password)
+        if live != staged:  # ? the move happened regardless, a repeated swap would find an empty staging graph
+            logger.warning(f"Graph {named_graph} holds {live} triples after the swap instead of {staged}")
+    finally:
+        if isql:
+            isql.close()
+    MoveLoadState(staging, named_graph, **kwargs)
+    logger.info(f"Swapped {staged} triples of {staging} into {named_graph}")
+    return True
 
 
 def IntermediateStepSparqlDelete(work_order_file: str, sparql_endpoint: str, user: str, password: str, named_graph: str,
@@ -882,12 +1872,16 @@ def IntermediateStepSparqlDelete(work_order_file: str, sparql_endpoint: str, use
     :param str password: plain text password for the sparql interface, deleting things is an elevated process
     :param str named_graph: fourth part of the triple where the data resides and will be removed
     :param bool force: if true, will ignore security checks like status
+    :param int delete_batch_size: optional kwarg, number of subjects of the first delete request, adapts afterwards
+    :param str subject_registry: optional kwarg, folder of the subject registries, new subjects are not deleted
     :param kwargs: additional parameters that all will be ignored but allow the function of the work order principle
     :return: True if everything went well and False if something happened
     :rtype: bool
     """
-    # f"WITH <named_graph> DELETE { <subject> ?p ?o } WHERE { <subject> ?p ?o }
+    # f"WITH <named_graph> DELETE { ?s ?p ?o } WHERE { VALUES ?s { <subject1> <subject2> } ?s ?p ?o }
+    batch_size = int(kwargs.get('delete_batch_size') or 200)
     try:
+        registry = SubjectRegistry.for_graph(kwargs.get('subject_registry'), named_graph)
         work_order0 = load_from_json(work_order_file)
         if work_order0['meta']['status'] != 5 and not force:
             logging.error("Order has to be on status 5 when using IntermediateStepSparqlDelete")
@@ -897,30 +1891,24 @@ def IntermediateStepSparqlDelete(work_order_file: str, sparql_endpoint: str, use
                 f"Insert type must be 'update' for IntermediateStepSparqlDelete, but is '{work_order0['meta']['type']}'")
             return False
             #  raise SpchtErrors.WorkOrderError(f"Insert type must be 'update' for IntermediateStepSparqlDelete, but is '{work_order0['meta']['type']}'")
+        # ? recompute orders only replace the triples of some predicates
+        predicates = work_order0['meta'].get('recompute', {}).get('predicates')
         work_order = work_order0
         for key in work_order0['file_list']:
-            if work_order['file_list'][key]['status'] == 4:
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4,), 5, 'deletion_start')
+            if claimed:
+                work_order = claimed
                 logging.info(
                     f"Deleting old entries that match new entries of {work_order['file_list'][key]['rdf_file']}")
-                work_order = UpdateWorkOrder(work_order_file,
-                                             update=('file_list', key, 'status', 5),
-                                             insert=('file_list', key, 'deletion_start', datetime.now().isoformat()))
-                f_path = work_order['file_list'][key]['rdf_file']
-                that_graph = rdflib.Graph()
-                that_graph.parse(f_path, format="turtle")
-                for evelyn in that_graph.subjects():  # the every word plays continue
-                    triples = f"<{evelyn}> ?p ?o. "
-                    query = f"WITH <{named_graph}> DELETE {{ {triples} }} WHERE {{ {triples} }}"
-                    # * this poses as a major bottleneck as the separate http requests take most of the time for this
-                    # * process, i looked into it and apparently there is no easy way to delete a lot of lines with
-                    # * sparql cause its technically a read-only language and this whole update/delete shebang seems
-                    # * to be an afterthought, you could chain where clauses but that apparent processing time for
-                    # * that scales with U^x which seems to be not very desirable
-                    status, discard = sparqlQuery(query,
-                                                  sparql_endpoint,
-                                                  auth=user,
-                                                  pwd=password,
-                                                  named_graph=named_graph)
+                # * one request per subject was a major bottleneck as the separate http requests took most of the
+                # * time, binding a batch of subjects with VALUES does the same in one request
+                subjects = KnownSubjects(DeleteSubjects(work_order['file_list'][key]), registry)
+                if not sparql_delete_values(subjects, sparql_endpoint, named_graph, batch_size=batch_size,
+                                            predicates=predicates, auth=user, pwd=password):
+                    return False
+                for block in RetractBlocks(work_order['file_list'][key]):
+                    status, discard = sparqlQuery(f"DELETE DATA {{ GRAPH <{named_graph}> {{ {block} }} }}",
+                                                  sparql_endpoint, auth=user, pwd=password, named_graph=named_graph)
                     if not status:
                         return False
                 work_order = UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 6),
@@ -933,6 +1921,9 @@ def IntermediateStepSparqlDelete(work_order_file: str, sparql_endpoint: str, use
     except FileNotFoundError as file:
         logger.critical(f"Cannot find file {file}")
         return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
     except TypeError as e:
         if e == "'NoneType' object is not subscriptable":  # feels brittle
             msg = "Could not properly load work order file"
@@ -954,11 +1945,16 @@ def IntermediateStepISQLDelete(work_order_file: str, isql_path: str, user: str,
     :param str named_graph: fourth part of the triple where the data resides and will be removed
     :param int isql_port: port on which the database server for the isql
     :param bool force: if true, will ignore security checks like status
+    :param int delete_batch_size: optional kwarg, number of subjects deleted by one isql call
+    :param str subject_registry: optional kwarg, folder of the subject registries, new subjects are not deleted
     :param kwargs: additional parameters that all will be ignored but allow the function of the work order principle
     :return: True if everything went well and False if something happened
     :rtype: bool
     """
+    batch_size = int(kwargs.get('delete_batch_size') or 200)
+    isql = IsqlSession(isql_path, isql_port, user, password)  # ? one login for the entire order
     try:
+        registry = SubjectRegistry.for_graph(kwargs.get('subject_registry'), named_graph)
         work_order0 = load_from_json(work_order_file)
         if work_order0['meta']['status'] != 5 and not force:
             logging.error("Order has to be on status 5 when using IntermediateStepSparqlDelete")
@@ -966,23 +1962,20 @@ def IntermediateStepISQLDelete(work_order_file: str, isql_path: str, user: str,
         if work_order0['meta']['type'] != "update":
             logging.error(f"Insert type must be 'update' for IntermediateStepSparqlDelete, but is '{work_order0['meta']['type']}'")
             return False
+        # ? recompute orders only replace the triples of some predicates
+        predicates = work_order0['meta'].get('recompute', {}).get('predicates')
         work_order = work_order0
         for key in work_order0['file_list']:
-            if work_order['file_list'][key]['status'] == 4:
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4,), 5, 'deletion_start')
+            if claimed:
+                work_order = claimed
                 logging.info(f"Deleting old entries that match new entries of {work_order['file_list'][key]['rdf_file']}")
-                work_order = UpdateWorkOrder(work_order_file,
-                                             update=('file_list', key, 'status', 5),
-                                             insert=('file_list', key, 'deletion_start', datetime.now().isoformat()))
-                f_path = work_order['file_list'][key]['rdf_file']
-                that_graph = rdflib.Graph()
-                that_graph.parse(f_path, format="turtle")
-                for evelyn in that_graph.subjects():  # the every word plays continue
-                    triples = f"<{evelyn}> ?p ?o. "
-                    query = f"WITH <{named_graph}> DELETE WHERE {{ {triples} }}"
-                    # ? when using this you can actually delete without specifying after the DELETE clause, weird
-                    subprocess.run([isql_path, str(isql_port), user, password, "VERBOSE=OFF", f"EXEC=sparql {query};"], capture_output=True, check=True)
-                    # ? i dont capture any output for subprocess.run cause all that i am interested in is exit code
-                    # ? non-zero which will be captures by the thrown exception
+                subjects = KnownSubjects(DeleteSubjects(work_order['file_list'][key]), registry)
+                for i in range(0, len(subjects), batch_size):  # the every word plays continue
+                    query = sparql_delete_values_query(subjects[i:i + batch_size], named_graph, predicates=predicates)
+                    isql.execute([f"sparql {query};"])
+                for block in RetractBlocks(work_order['file_list'][key]):
+                    isql.execute([f"sparql DELETE DATA {{ GRAPH <{named_graph}> {{ {block} }} }};"])
                 work_order = UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 6),
                                              insert=('file_list', key, 'deletion_finish', datetime.now().isoformat()))
         return True
@@ -993,9 +1986,11 @@ def IntermediateStepISQLDelete(work_order_file: str, isql_path: str, user: str,
     except FileNotFoundError as file:
         logger.critical(f"Cannot find file {file}")
         return False
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error while running isql interface, exited with non-zero exit-code {e.returncode}\n"
-                     f"Message from the program: {e.stderr.decode('ascii').strip()}")
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
+    except SpchtErrors.IsqlError as e:
+        logger.error(f"Error while running isql interface: {e}")
         return False
     except TypeError as e:
         if e == "'NoneType' object is not subscriptable":  # feels brittle
@@ -1004,6 +1999,8 @@ def IntermediateStepISQLDelete(work_order_file: str, isql_path: str, user: str,
             print(msg)
             logger.critical(f"{fnc} > {msg}")
         return False
+    finally:
+        isql.close()
 
 
 def FulfillSparqlInsertOrder(work_order_file: str,
@@ -1015,20 +2012,30 @@ def FulfillSparqlInsertOrder(work_order_file: str,
                              **kwargs):
     """
     Inserts read data from the processed turtle files in the triplestore, this should work regardless of what kind of
-    triplestore you are utilising.
+    triplestore you are utilising. If processing wrote a 'payload_file' its blocks are send as they are, one
+    INSERT DATA per block, otherwise the rdf file is read and send in batches whose size in bytes adapts to the
+    speed of the endpoint, see local_tools.sparql_insert_data
     :param str work_order_file: file path to a work order file
     :param str sparql_endpoint: endpoint for an authenticated sparql interface, the one of virtuoso is /sparql-auth
     :param str user: user for the sparql interface
     :param str password: plain text password for the sparql interface, inserting things is an elevated process
     :param str named_graph: fourth part of the triple where the data resides and will be removed
     :param bool force: if true, will ignore security checks like status
+    :param str subject_registry: optional kwarg, folder of the subject registries, inserted subjects get added
+    :param str delta_store: optional kwarg, folder of the delta stores, the state of inserted chunks gets saved
+    :param str record_index: optional kwarg, folder of the record indices, hashes of inserted records get saved
+    :param int insert_batch_bytes: optional kwarg, size of the first requests in bytes, adapts from there on
+    :param int sparql_concurrency: optional kwarg, number of insert requests in flight at the same time, default 1
     :param kwargs: arbitary, additional parameters that all will be ignored
     :return: True if everything went well and False if something happened
     :rtype: bool
     """
-    # WITH GRAPH_IRI INSERT { bla } WHERE {};
-    SPARQL_CHUNK = 50
+    sending = {"auth": user, "pwd": password, "concurrency": kwargs.get('sparql_concurrency') or 1}
+    if kwargs.get('insert_batch_bytes'):
+        sending['batch_bytes'] = kwargs['insert_batch_bytes']
+    load_state = {}
     try:
+        load_state = OpenLoadState(named_graph, **kwargs)
         work_order0 = load_from_json(work_order_file)
         if work_order0['meta']['status'] < 4 and not force:
             logger.error("Order hast a status below 4 and might be not fully procssed or fetch, aborting")
@@ -1041,43 +2048,116 @@ def FulfillSparqlInsertOrder(work_order_file: str,
                 f"Method in work order file is {work_order0['meta']['method']} but must be 'sparql' for this method")
         work_order = work_order0
         for key in work_order0['file_list']:
-            if work_order['file_list'][key]['status'] == 4 or work_order['file_list'][key]['status'] == 6:
-                work_order = UpdateWorkOrder(work_order_file,
-                                             update=('file_list', key, 'status', 7),
-                                             insert=('file_list', key, 'insert_start', datetime.now().isoformat()))
-                f_path = work_order['file_list'][key]['rdf_file']
-                this_graph = rdflib.Graph()
-                this_graph.parse(f_path, format="turtle")
-                triples = ""
-                rounds = 0
-                for sub, pred, obj in this_graph:
-                    rounds += 1
-                    if isinstance(obj, rdflib.term.URIRef):
-                        triples += f"<{sub.toPython()}> <{pred.toPython()}> <{obj.toPython()}> . \n"
-                    else:
-                        if obj.language:
-                            annotation = "@" + obj.language
-                        elif obj.datatype:
-                            annotation = "^^" + obj.datatype
-                        else:
-                            annotation = ""
-                        triples += f"<{sub.toPython()}> <{pred.toPython()}> \"{obj.toPython()}\"{annotation} . \n"
-                    # ! TODO: can optimize here, grouped queries
-                    if rounds > SPARQL_CHUNK:
-                        query = f"""WITH <{named_graph}> INSERT {{ {triples} }}"""
-                        # * i have the sneaking suspicion that i defined the named graph twice
-                        status, discard = sparqlQuery(query,
-                                                      sparql_endpoint,
-                                                      auth=user,
-                                                      pwd=password,
-                                                      named_graph=named_graph)
-                        if not status:
-                            return False
-                        triples = ""
-                        rounds = 0
-                # END OF FOR LOOP
-                if rounds > 0 and triples != "":
-                    query = f"""WITH <{named_graph}> INSERT {{ {triples}}}"""
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4, 6), 7, 'insert_start')
+            if claimed:
+                work_order = claimed
+                if 'payload_file' in work_order['file_list'][key]:
+                    with open_file(work_order['file_list'][key]['payload_file'], "r") as payloads:
+                        status = sparql_insert_data(read_sparql_payloads(payloads), sparql_endpoint, named_graph,
+                                                    blocks=True, **sending)
+                else:
+                    f_path = InsertFile(work_order['file_list'][key])
+                    status = sparql_insert_data((f"{sub} {pred} {obj} .\n" for sub, pred, obj in ReadTriples(f_path)),
+                                                sparql_endpoint, named_graph, **sending)
+                if not status:
+                    return False
+                CommitLoadState(load_state, work_order['file_list'][key])
+                work_order = UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 8),
+                                             insert=('file_list', key, 'insert_finish', datetime.now().isoformat()))
+        return True
+    except KeyError as foreign_key:
+        logger.critical(f"Missing key in work order: '{foreign_key}'")
+        return False
+    except FileNotFoundError as file:
+        logger.critical(f"Cannot find file {file}")
+        return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
+    except TypeError as e:
+        if e == "'NoneType' object is not subscriptable":  # feels brittle
+            msg = "Could not properly load work order file"
+            fnc = "FulFillSparqlInsertOrder"
+            print(msg)
+            logger.critical(f"{fnc} > {msg}")
+        return False
+    except xml.parsers.expat.ExpatError as e:
+        logger.error(f"Parsing of triple file failed: {e}")
+        return False
+    finally:
+        CloseLoadState(load_state)
+
+
+def FulfillSparqlUpdateOrder(work_order_file: str,
+                             sparql_endpoint: str,
+                             user: str,
+                             password: str,
+                             named_graph: str,
+                             force=False,
+                             **kwargs):
+    """
+    Delete and insert of an update order in one go, instead of deleting all subjects first and inserting everything
+    afterwards each batch of subjects gets one sparql update request that removes the old triples of those subjects
+    and inserts the new ones. This halves the number of requests and the records are only missing from the store for
+    the duration of a single request. Takes the order from status 4 directly to 8
+    :param str work_order_file: file path to a work order file
+    :param str sparql_endpoint: endpoint for an authenticated sparql interface, the one of virtuoso is /sparql-auth
+    :param str user: user for the sparql interface
+    :param str password: plain text password for the sparql interface
+    :param str named_graph: fourth part of the triple where the data resides
+    :param bool force: if true, will ignore security checks like status
+    :param int delete_batch_size: optional kwarg, number of subjects per request
+    :param str subject_registry: optional kwarg, folder of the subject registries, new subjects are not deleted
+    :param str delta_store: optional kwarg, folder of the delta stores, the state of inserted chunks gets saved
+    :param str record_index: optional kwarg, folder of the record indices, hashes of inserted records get saved
+    :param kwargs: arbitary, additional parameters that all will be ignored
+    :return: True if everything went well and False if something happened
+    :rtype: bool
+    """
+    batch_size = int(kwargs.get('delete_batch_size') or 200)
+    load_state = {}
+    try:
+        load_state = OpenLoadState(named_graph, **kwargs)
+        registry = load_state['registry']
+        work_order0 = load_from_json(work_order_file)
+        if work_order0['meta']['status'] not in (4, 7) and not force:
+            logger.error("Order has to be on status 4 when using FulfillSparqlUpdateOrder")
+            return False
+        if work_order0['meta']['type'] != "update":
+            logger.error(f"Insert type must be 'update' for FulfillSparqlUpdateOrder, but is '{work_order0['meta']['type']}'")
+            return False
+        # ? recompute orders only replace the triples of some predicates
+        predicates = work_order0['meta'].get('recompute', {}).get('predicates')
+        work_order = work_order0
+        for key in work_order0['file_list']:
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4,), 7, 'insert_start')
+            if claimed:
+                work_order = claimed
+                entry = work_order['file_list'][key]
+                subjects, retracts = {}, {}
+                for sub, pred, obj in ReadTriples(InsertFile(entry)):
+                    subjects.setdefault(sub, []).append(f"{sub} {pred} {obj} .\n")
+                if 'retract_file' in entry:  # ? delta updates remove single triples of subjects next to the wipes
+                    for sub, pred, obj in ReadTriples(entry['retract_file']):
+                        retracts.setdefault(sub, []).append(f"{sub} {pred} {obj} .\n")
+                        subjects.setdefault(sub, [])
+                known = set(KnownSubjects(DeleteSubjects(entry), registry))
+                for sub in known:  # ? subjects that lost all their triples still need their delete
+                    subjects.setdefault(sub, [])
+                subject_list = list(subjects)
+                for i in range(0, len(subject_list), batch_size):
+                    batch = subject_list[i:i + batch_size]
+                    parts = []
+                    stale = [x for x in batch if x in known]
+                    if stale:  # ? a batch of only new subjects has nothing to delete
+                        parts.append(sparql_delete_values_query(stale, named_graph, predicates=predicates))
+                    retract = "".join(line for one in batch for line in retracts.get(one, ()))
+                    if retract:
+                        parts.append(f"DELETE DATA {{ GRAPH <{named_graph}> {{ {retract} }} }}")
+                    triples = "".join(line for one in batch for line in subjects[one])
+                    if triples:
+                        parts.append(f"INSERT DATA {{ GRAPH <{named_graph}> {{ {triples} }} }}")
+                    query = " ;\n".join(parts)
                     status, discard = sparqlQuery(query,
                                                   sparql_endpoint,
                                                   auth=user,
@@ -1085,6 +2165,7 @@ def FulfillSparqlInsertOrder(work_order_file: str,
                                                   named_graph=named_graph)
                     if not status:
                         return False
+                CommitLoadState(load_state, work_order['file_list'][key])
                 work_order = UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 8),
                                              insert=('file_list', key, 'insert_finish', datetime.now().isoformat()))
         return True
@@ -1094,16 +2175,394 @@ def FulfillSparqlInsertOrder(work_order_file: str,
     except FileNotFoundError as file:
         logger.critical(f"Cannot find file {file}")
         return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
     except TypeError as e:
         if e == "'NoneType' object is not subscriptable":  # feels brittle
             msg = "Could not properly load work order file"
-            fnc = "FulFillSparqlInsertOrder"
+            fnc = "FulfillSparqlUpdateOrder"
             print(msg)
             logger.critical(f"{fnc} > {msg}")
         return False
-    except xml.parsers.expat.ExpatError as e:
-        logger.error(f"Parsing of triple file failed: {e}")
+    finally:
+        CloseLoadState(load_state)
+
+
+def FulfillISqlUpdateOrder(work_order_file: str,
+                           isql_path: str,
+                           user: str,
+                           password: str,
+                           named_graph: str,
+                           isql_port=1111,
+                           virt_folder="/tmp/",
+                           force=False,
+                           **kwargs):
+    """
+    Delete and insert of an update order in one go for the isql interface, for every chunk the deletion of its
+    subjects and the bulk load of its file are send to isql as one batch so the old records are only gone for the
+    time virtuoso needs for that single chunk. Takes the order from status 4 directly to 8
+    :param str work_order_file: file path to a work order file
+    :param str isql_path: path to the virtuoso isql-v/isql executable
+    :param str user: name of a virtuoso user with enough rights to delete and insert
+    :param str password: clear text password of the user from above
+    :param str named_graph: named graph the data resides in
+    :param int isql_port: port of the virtuoso sql database, usually 1111
+    :param str virt_folder: folder that virtuoso accepts as input for files, must have write
+    :param bool force: if true, will ignore security checks like status
+    :param int delete_batch_size: optional kwarg, number of subjects per delete statement
+    :param str subject_registry: optional kwarg, folder of the subject registries, new subjects are not deleted
+    :param str delta_store: optional kwarg, folder of the delta stores, the state of inserted chunks gets saved
+    :param str record_index: optional kwarg, folder of the record indices, hashes of inserted records get saved
+    :return: True if everything went well and False if something happened
+    :rtype: bool
+    """
+    batch_size = int(kwargs.get('delete_batch_size') or 200)
+    isql = IsqlSession(isql_path, isql_port, user, password)
+    load_state = {}
+    try:
+        load_state = OpenLoadState(named_graph, **kwargs)
+        registry = load_state['registry']
+        work_order0 = load_from_json(work_order_file)
+        if work_order0['meta']['status'] not in (4, 7) and not force:
+            logger.error("Order has to be on status 4 when using FulfillISqlUpdateOrder")
+            return False
+        if work_order0['meta']['type'] != "update":
+            logger.error(f"Insert type must be 'update' for FulfillISqlUpdateOrder, but is '{work_order0['meta']['type']}'")
+            return False
+        # ? recompute orders only replace the triples of some predicates
+        predicates = work_order0['meta'].get('recompute', {}).get('predicates')
+        work_order = work_order0
+        for key in work_order0['file_list']:
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4,), 7, 'insert_start')
+            if claimed:
+                work_order = claimed
+                subjects = KnownSubjects(DeleteSubjects(work_order['file_list'][key]), registry)
+                f_path = CopyToVirtuosoFolder(InsertFile(work_order['file_list'][key]), virt_folder)
+                commands = [f"sparql {sparql_delete_values_query(subjects[i:i + batch_size], named_graph, predicates=predicates)};"
+                            for i in range(0, len(subjects), batch_size)]
+                commands += [f"sparql DELETE DATA {{ GRAPH <{named_graph}> {{ {block} }} }};"
+                             for block in RetractBlocks(work_order['file_list'][key])]
+                commands += [f"ld_add('{f_path}', '{named_graph}');", "rdf_loader_run();", "checkpoint;"]
+                isql.execute(commands)
+                if os.path.exists(f_path):
+                    os.remove(f_path)
+                CommitLoadState(load_state, work_order['file_list'][key])
+                work_order = UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 8),
+                                             insert=('file_list', key, 'insert_finish', datetime.now().isoformat()))
+        return True
+    except KeyError as foreign_key:
+        logger.critical(f"Missing key in work order: '{foreign_key}'")
         return False
+    except PermissionError as folder:
+        logger.critical(f"Cannot access folder {folder} to copy turtle into.")
+        return False
+    except FileNotFoundError as file:
+        logger.critical(f"Cannot find file {file}")
+        return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
+    except SpchtErrors.IsqlError as e:
+        logger.error(f"Error while running isql interface: {e}")
+        return False
+    except TypeError as e:
+        if e == "'NoneType' object is not subscriptable":  # feels brittle
+            msg = "Could not properly load work order file"
+            fnc = "FulfillISqlUpdateOrder"
+            print(msg)
+            logger.critical(f"{fnc} > {msg}")
+        return False
+    finally:
+        isql.close()
+        CloseLoadState(load_state)
+
+
+# ? step of the odbc stages: claimable status, status while running, status when done and the two timestamps
+ODBC_STEPS = {"delete": ((4,), 5, 6, 'deletion_start', 'deletion_finish'),
+              "insert": ((4, 6), 7, 8, 'insert_start', 'insert_finish'),
+              "update": ((4,), 7, 8, 'insert_start', 'insert_finish')}
+
+
+def OdbcStatements(file_entry: dict, named_graph: str, delete: bool, insert: bool, registry=None, predicates=None,
+                   batch_size=200, batch_bytes=262144):
+    """
+    The sql statements of one chunk for the odbc stages, the deletes of old subjects and retracted triples first, the
+    new triples afterwards. Virtuoso takes sparql through sql with a leading SPARQL
+
+    :param dict file_entry: one entry of the file_list of a work order
+    :param str named_graph: the graph
+    :param bool delete: include the deletes
+    :param bool insert: include the inserts
+    :param SubjectRegistry registry: optional, subjects it does not know are not deleted
+    :param list predicates: optional, deletes only triples with those predicates
+    :param int batch_size: number of subjects per delete statement
+    :param int batch_bytes: upper size of the triples of one insert statement
+    :return: a generator of statements
+    """
+    if delete:
+        subjects = KnownSubjects(DeleteSubjects(file_entry), registry)
+        for i in range(0, len(subjects), batch_size):
+            yield f"SPARQL {sparql_delete_values_query(subjects[i:i + batch_size], named_graph, predicates=predicates)}"
+        for block in RetractBlocks(file_entry):
+            yield f"SPARQL DELETE DATA {{ GRAPH <{named_graph}> {{ {block} }} }}"
+    if not insert:
+        return
+    if 'payload_file' in file_entry:
+        with open_file(file_entry['payload_file'], "r") as payloads:
+            for block in read_sparql_payloads(payloads):
+                yield f"SPARQL INSERT DATA {{ GRAPH <{named_graph}> {{ {block} }} }}"
+        return
+    batch, used = [], 0
+    for sub, pred, obj in ReadTriples(InsertFile(file_entry)):
+        line = f"{sub} {pred} {obj} .\n"
+        size = len(line.encode("utf-8"))
+        if batch and used + size > batch_bytes:
+            yield f"SPARQL INSERT DATA {{ GRAPH <{named_graph}> {{ {''.join(batch)} }} }}"
+            batch, used = [], 0
+        batch.append(line)
+        used += size
+    if batch:
+        yield f"SPARQL INSERT DATA {{ GRAPH <{named_graph}> {{ {''.join(batch)} }} }}"
+
+
+def OdbcStage(step: str, work_order_file: str, odbc_dsn: str, user: str, password: str, named_graph: str,
+              force=False, **kwargs) -> bool:
+    """
+    Runs the deletes, the inserts or both for every chunk of an order over a pool of odbc connections, one
+    transaction per chunk, a chunk that fails is rolled back completely and stays in its running status. Up to
+    odbc_connections chunks are worked on at the same time
+    :param str step: 'delete', 'insert' or 'update' for both at once, see ODBC_STEPS
+    :param str work_order_file: file path to a work order file
+    :param str odbc_dsn: data source name or connection string of the virtuoso odbc driver
+    :param str user: name of a virtuoso user with enough rights to insert
+    :param str password: clear text password of the user from above
+    :param str named_graph: named graph the data is to be inserted into
+    :param bool force: if true, will ignore security checks like status
+    :param int odbc_connections: optional kwarg, size of the connection pool, default 2
+    :param int delete_batch_size: optional kwarg, number of subjects per delete statement
+    :param int insert_batch_bytes: optional kwarg, upper size of the triples of one insert statement
+    :param kwargs: the 'subject_registry', 'delta_store' and 'record_index' settings, the rest is ignored
+    :return: True if every chunk went through
+    :rtype: bool
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    try:
+        import pyodbc
+    except ImportError:
+        logger.critical("The odbc method needs the package pyodbc and an odbc driver for virtuoso")
+        return False
+    expected, running_status, finished_status, start_field, finish_field = ODBC_STEPS[step]
+    batch_size = int(kwargs.get('delete_batch_size') or 200)
+    batch_bytes = int(kwargs.get('insert_batch_bytes') or 262144)
+    pool = OdbcPool(odbc_connection_string(odbc_dsn, user, password), kwargs.get('odbc_connections') or 2)
+    load_state = {}
+    try:
+        load_state = OpenLoadState(named_graph, **kwargs)
+        work_order = load_from_json(work_order_file)
+        if work_order is None:
+            return False
+        if step != "insert" and work_order['meta']['type'] != "update":
+            logger.error(f"Insert type must be 'update' for the odbc {step}, but is '{work_order['meta']['type']}'")
+            return False
+        if not 4 <= work_order['meta']['status'] <= 8 and not force:
+            logger.error(f"Order has a status of {work_order['meta']['status']}, the odbc {step} needs 4 to 8")
+            return False
+        # ? recompute orders only replace the triples of some predicates
+        predicates = work_order['meta'].get('recompute', {}).get('predicates')
+
+        def run(entry: dict) -> None:
+            with pool.transaction() as cursor:
+                for statement in OdbcStatements(entry, named_graph, step != "insert", step != "delete",
+                                                load_state['registry'], predicates, batch_size, batch_bytes):
+                    cursor.execute(statement)
+
+        running, failed = {}, 0
+
+        def finish(done) -> int:
+            errors = 0
+            for future in done:
+                key, entry = running.pop(future)
+                try:
+                    future.result()
+                except (pyodbc.Error, SpchtErrors.ParsingError, OSError) as e:
+                    logger.error(f"Odbc {step} of chunk {key} failed and was rolled back: {e}")
+                    errors += 1
+                    continue
+                if step != "delete":
+                    CommitLoadState(load_state, entry)
+                UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', finished_status),
+                                insert=('file_list', key, finish_field, datetime.now().isoformat()))
+            return errors
+
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            for key in work_order['file_list']:
+                if len(running) >= pool.size:
+                    failed += finish(wait(running, return_when=FIRST_COMPLETED).done)
+                claimed = ClaimWorkOrderEntry(work_order_file, key, expected, running_status, start_field)
+                if claimed:
+                    running[executor.submit(run, claimed['file_list'][key])] = (key, claimed['file_list'][key])
+            failed += finish(wait(running).done)
+        return failed == 0
+    except KeyError as foreign_key:
+        logger.critical(f"Missing key in work order: '{foreign_key}'")
+        return False
+    except pyodbc.Error as e:
+        logger.error(f"Error while talking to the odbc driver: {e}")
+        return False
+    finally:
+        pool.close()
+        CloseLoadState(load_state)
+
+
+def IntermediateStepOdbcDelete(work_order_file: str, odbc_dsn: str, user: str, password: str, named_graph: str,
+                               force=False, **kwargs) -> bool:
+    """
+    Deletes all data that has the same subject as any data found in the processed files over odbc, see OdbcStage
+
+    :return: True if everything went well and False if something happened
+    :rtype: bool
+    """
+    return OdbcStage("delete", work_order_file, odbc_dsn, user, password, named_graph, force, **kwargs)
+
+
+def FulfillOdbcInsertOrder(work_order_file: str, odbc_dsn: str, user: str, password: str, named_graph: str,
+                           force=False, **kwargs) -> bool:
+    """
+    Inserts the processed files over odbc, each chunk in its own transaction, see OdbcStage
+
+    :return: True if everything went well and False if something happened
+    :rtype: bool
+    """
+    return OdbcStage("insert", work_order_file, odbc_dsn, user, password, named_graph, force, **kwargs)
+
+
+def FulfillOdbcUpdateOrder(work_order_file: str, odbc_dsn: str, user: str, password: str, named_graph: str,
+                           force=False, **kwargs) -> bool:
+    """
+    Delete and insert of an update order in one go over odbc, the old and the new triples of a chunk are replaced in
+    one transaction, the records are never missing from the store. Takes the order from status 4 directly to 8
+
+    :return: True if everything went well and False if something happened
+    :rtype: bool
+    """
+    return OdbcStage("update", work_order_file, odbc_dsn, user, password, named_graph, force, **kwargs)
+
+
+def GspDocument(rdf_file: str, gzip_body=False) -> tuple:
+    """
+    The body of a graph store upload of one rdf file, a plain file is send as it is, a gzip file too if the endpoint
+    takes a gzip Content-Encoding. Other compressions and term dictionaries are unpacked into a temporary file first,
+    the body has to be seekable for the authentication
+
+    :param str rdf_file: the 'rdf_file' or 'delta_file' of a work order entry
+    :param bool gzip_body: send gzip files compressed, the endpoint has to understand Content-Encoding gzip
+    :return: an open binary file and the headers for it
+    :rtype: tuple
+    """
+    plain = strip_compression(rdf_file)
+    # ? n-triples are valid turtle, but the 'nt' writer of the processing names its files .nt anyway
+    headers = {"Content-Type": "text/turtle" if plain.endswith(".ttl") else "application/n-triples"}
+    compression = compression_of(rdf_file)
+    if not plain.endswith(TERM_DICT_SUFFIX):
+        if not compression:
+            return open(rdf_file, "rb"), headers
+        if compression == "gzip" and gzip_body:
+            headers['Content-Encoding'] = "gzip"
+            return open(rdf_file, "rb"), headers
+    body = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    if plain.endswith(TERM_DICT_SUFFIX):
+        for sub, pred, obj in ReadTriples(rdf_file):
+            body.write(f"{sub} {pred} {obj} .\n".encode("utf-8"))
+    else:
+        with open_file(rdf_file, "rb") as packed:
+            shutil.copyfileobj(packed, body)
+    body.seek(0)
+    return body, headers
+
+
+def FulfillGspInsertOrder(work_order_file: str,
+                          gsp_endpoint: str,
+                          named_graph: str,
+                          user=None,
+                          password=None,
+                          force=False,
+                          **kwargs):
+    """
+    Inserts the processed files with the sparql 1.1 graph store protocol, every chunk is one POST of the rdf file to
+    the endpoint which is a lot cheaper than wrapping the triples in INSERT queries and works with every store that
+    implements the protocol. The deletes of update orders still need a sparql endpoint
+    :param str work_order_file: file path to a work order file
+    :param str gsp_endpoint: the graph store endpoint, the one of virtuoso is /sparql-graph-crud-auth
+    :param str named_graph: named graph the data is to be inserted into
+    :param str user: optional user for the endpoint
+    :param str password: optional password for the endpoint
+    :param bool force: if true, will ignore security checks like status
+    :param bool gsp_gzip: optional kwarg, gzip compressed files are send compressed instead of unpacked
+    :param str subject_registry: optional kwarg, folder of the subject registries, inserted subjects get added
+    :param str delta_store: optional kwarg, folder of the delta stores, the state of inserted chunks gets saved
+    :param str record_index: optional kwarg, folder of the record indices, hashes of inserted records get saved
+    :param kwargs: arbitary, additional parameters that all will be ignored
+    :return: True if everything went well and False if something happened
+    :rtype: bool
+    """
+    load_state = {}
+    try:
+        load_state = OpenLoadState(named_graph, **kwargs)
+        work_order0 = load_from_json(work_order_file)
+        if work_order0 is None:
+            return False
+        if work_order0['meta']['status'] < 4 and not force:
+            logger.error("Order hast a status below 4 and might be not fully procssed or fetch, aborting")
+            return False
+        if work_order0['meta']['status'] > 8 and not force:
+            logger.error("This work orders status indicates that its already done, aborting.")
+            return False
+        for key in work_order0['file_list']:
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4, 6), 7, 'insert_start')
+            if claimed:
+                entry = claimed['file_list'][key]
+                document, headers = GspDocument(InsertFile(entry), kwargs.get('gsp_gzip', False))
+                with document:
+                    if not gsp_post(document, gsp_endpoint, named_graph, headers, user, password):
+                        return False
+                CommitLoadState(load_state, entry)
+                UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 8),
+                                insert=('file_list', key, 'insert_finish', datetime.now().isoformat()))
+        return True
+    except KeyError as foreign_key:
+        logger.critical(f"Missing key in work order: '{foreign_key}'")
+        return False
+    except FileNotFoundError as file:
+        logger.critical(f"Cannot find file {file}")
+        return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
+    finally:
+        CloseLoadState(load_state)
+
+
+def CopyToVirtuosoFolder(rdf_file: str, virt_folder: str) -> str:
+    """
+    Puts a copy of a processed rdf file into the folder of the virtuoso bulk loader, in a format ld_add understands
+
+    :param str rdf_file: the 'rdf_file' of a work order entry
+    :param str virt_folder: folder that virtuoso accepts as input for files
+    :return: path of the copy
+    :rtype: str
+    """
+    if strip_compression(rdf_file).endswith(TERM_DICT_SUFFIX):  # ? the bulk loader needs actual rdf
+        target = os.path.join(virt_folder, os.path.basename(strip_compression(rdf_file))[:-len(TERM_DICT_SUFFIX)] + ".nt")
+        with open(target, "w", encoding="utf-8") as unpacked:
+            unpacked.writelines(f"{sub} {pred} {obj} .\n" for sub, pred, obj in ReadTriples(rdf_file))
+        return target
+    if compression_of(rdf_file) == "zstd":  # ? ld_add knows gzip but not zstd, those get unpacked on the way
+        target = os.path.join(virt_folder, os.path.basename(strip_compression(rdf_file)))
+        with open_file(rdf_file, "rb") as packed, open(target, "wb") as unpacked:
+            shutil.copyfileobj(packed, unpacked)
+        return target
+    return shutil.copy(rdf_file, virt_folder)
 
 
 def FulfillISqlInsertOrder(work_order_file: str,
@@ -1132,10 +2591,20 @@ def FulfillISqlInsertOrder(work_order_file: str,
     :param int isql_port: port of the virtuoso sql database, usually 1111
     :param str virt_folder: folder that virtuoso accepts as input for files, must have write
     :param bool force: if true, will ignore security checks like status
+    :param str subject_registry: optional kwarg, folder of the subject registries, inserted subjects get added
+    :param str delta_store: optional kwarg, folder of the delta stores, the state of inserted chunks gets saved
+    :param str record_index: optional kwarg, folder of the record indices, hashes of inserted records get saved
+    :param int bulk_loaders: optional kwarg, loads all chunks at once with that many loaders, see BulkLoadISqlOrder
     :return: True if everything went "great"
     :rtype: Bool
     """
+    if kwargs.get('bulk_loaders'):
+        return BulkLoadISqlOrder(work_order_file, isql_path, user, password, named_graph, isql_port=isql_port,
+                                 virt_folder=virt_folder, force=force, **kwargs)
+    isql = IsqlSession(isql_path, isql_port, user, password)  # ? one login for all chunks
+    load_state = {}
     try:
+        load_state = OpenLoadState(named_graph, **kwargs)
         work_order0 = load_from_json(work_order_file)
         if work_order0 is None:
             return False
@@ -1147,22 +2616,18 @@ def FulfillISqlInsertOrder(work_order_file: str,
             return False
         work_order = work_order0
         for key in work_order0['file_list']:
-            if work_order['file_list'][key]['status'] == 4 or work_order['file_list'][key]['status'] == 6:
-                work_order = UpdateWorkOrder(work_order_file,
-                                             update=('file_list', key, 'status', 7),
-                                             insert=('file_list', key, 'insert_start', datetime.now().isoformat()))
-                f_path = work_order['file_list'][key]['rdf_file']
-                f_path = shutil.copy(f_path, virt_folder)
-                command = f"EXEC=ld_add('{f_path}', '{named_graph}');"
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4, 6), 7, 'insert_start')
+            if claimed:
+                work_order = claimed
+                f_path = InsertFile(work_order['file_list'][key])
+                f_path = CopyToVirtuosoFolder(f_path, virt_folder)
                 zero_time = time.time()
-                subprocess.run([isql_path, str(isql_port), user, password, "VERBOSE=OFF", command,
-                                "EXEC=rdf_loader_run();","EXEC=checkpoint;"],
-                               capture_output=True, check=True)
-                # ? see IntermediateISQLDelete for decision process about this
+                isql.execute([f"ld_add('{f_path}', '{named_graph}');", "rdf_loader_run();", "checkpoint;"])
                 logger.debug(f"Executed ld_add command via isql, execution time was {delta_now(zero_time)}")
                 # ? apparently i cannot really tell if the isql stuff actually works
                 if os.path.exists(f_path):
                     os.remove(f_path)
+                CommitLoadState(load_state, work_order['file_list'][key])
                 # reloading work order in case something has changed since then
                 work_order = UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 8),
                                              insert=('file_list', key, 'insert_finish', datetime.now().isoformat()))
@@ -1181,22 +2646,131 @@ def FulfillISqlInsertOrder(work_order_file: str,
             print(msg)
             logger.critical(f"{fnc} > {msg}")
         return False
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error while running isql interface, exited with non-zero exit-code {e.returncode}\n"
-                     f"Message from the program: {e.stderr.decode('ascii').strip()}")
+    except SpchtErrors.IsqlError as e:
+        logger.error(f"Error while running isql interface: {e}")
         return False
     except FileNotFoundError as file:
         logger.critical(f"Cannot find file {file}")
         return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
+    finally:
+        isql.close()
+        CloseLoadState(load_state)
+
+
+def BulkLoadISqlOrder(work_order_file: str,
+                      isql_path: str,
+                      user: str,
+                      password: str,
+                      named_graph: str,
+                      isql_port=1111,
+                      virt_folder="/tmp/",
+                      bulk_loaders=2,
+                      force=False,
+                      **kwargs):
+    """
+    The way virtuoso wants to be bulk loaded, instead of one ld_add, rdf_loader_run and checkpoint per chunk all
+    chunks are copied and registered first, then bulk_loaders sessions run rdf_loader_run at the same time and take
+    the files from the shared load list, in the end there is one single checkpoint. Afterwards DB.DBA.load_list tells
+    for every file whether it was loaded or failed, only the loaded ones count as inserted
+    :param str work_order_file: filename of the work order that is to be fulfilled
+    :param str isql_path: path to the virtuoso isql-v/isql executable
+    :param str user: name of a virtuoso user with enough rights to insert
+    :param str password: clear text password of the user from above
+    :param str named_graph: named graph the data is to be inserted into
+    :param int isql_port: port of the virtuoso sql database, usually 1111
+    :param str virt_folder: folder that virtuoso accepts as input for files, must have write
+    :param int bulk_loaders: number of parallel rdf_loader_run, virtuoso suggests up to a third of the cpu cores
+    :param bool force: if true, will ignore security checks like status
+    :param kwargs: the 'subject_registry', 'delta_store' and 'record_index' settings, the rest is ignored
+    :return: True if every file was loaded
+    :rtype: bool
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    loaders = [IsqlSession(isql_path, isql_port, user, password) for _ in range(max(1, int(bulk_loaders)))]
+    load_state = {}
+    staged = {}  # ? copied file -> key and entry of the file list
+    try:
+        load_state = OpenLoadState(named_graph, **kwargs)
+        work_order = load_from_json(work_order_file)
+        if work_order is None:
+            return False
+        if work_order['meta']['status'] < 4 and not force:
+            logger.error("Order hast a status below 4 and might be not fully procssed or fetch, aborting")
+            return False
+        if work_order['meta']['status'] > 8 and not force:
+            logger.error("This work orders status indicates that its already done, aborting.")
+            return False
+        for key in work_order['file_list']:
+            claimed = ClaimWorkOrderEntry(work_order_file, key, (4, 6), 7, 'insert_start')
+            if claimed:
+                entry = claimed['file_list'][key]
+                staged[CopyToVirtuosoFolder(InsertFile(entry), virt_folder)] = (key, entry)
+        if not staged:
+            return True
+        files = ", ".join("'{}'".format(x.replace("'", "''")) for x in staged)
+        # ? a file of an earlier, failed attempt is still in the load list and would be skipped by ld_add
+        loaders[0].execute([f"DELETE FROM DB.DBA.load_list WHERE ll_file IN ({files});"]
+                           + ["ld_add('{}', '{}');".format(x.replace("'", "''"), named_graph) for x in staged])
+        zero_time = time.time()
+        with ThreadPoolExecutor(max_workers=len(loaders)) as pool:  # ? the loaders share the load list
+            list(pool.map(lambda loader: loader.execute(["rdf_loader_run();"]), loaders))
+        loaders[0].execute(["checkpoint;"])
+        logger.info(f"Bulk loaded {len(staged)} files with {len(loaders)} loaders in {delta_now(zero_time)}")
+        report = loaders[0].execute([f"SELECT concat('SPCHT_LL|', cast(ll_state AS VARCHAR), '|', "
+                                     f"coalesce(ll_error, ''), '|', ll_file) FROM DB.DBA.load_list "
+                                     f"WHERE ll_file IN ({files});"])
+        results = {}
+        for line in report:
+            # ? isql pads the column to its width, the fields are cut free of those spaces
+            if line.strip().startswith("SPCHT_LL|"):
+                state, error, file_name = (x.strip() for x in line.strip().split("|", 3)[1:])
+                results[file_name] = (state, error)
+        failed = 0
+        for file_name, (key, entry) in staged.items():
+            state, error = results.get(file_name, (None, "missing from DB.DBA.load_list"))
+            if state != "2" or error:  # ? the entry stays on 7, a reset puts it back for the next attempt
+                failed += 1
+                logger.error(f"Bulk load of {file_name} failed: {error or f'state {state}'}")
+                continue
+            if os.path.exists(file_name):
+                os.remove(file_name)
+            CommitLoadState(load_state, entry)
+            UpdateWorkOrder(work_order_file, update=('file_list', key, 'status', 8),
+                            insert=('file_list', key, 'insert_finish', datetime.now().isoformat()))
+        return failed == 0
+    except KeyError as foreign_key:
+        logger.critical(f"Missing key in work order: '{foreign_key}'")
+        return False
+    except PermissionError as folder:
+        logger.critical(f"Cannot access folder {folder} to copy turtle into.")
+        return False
+    except SpchtErrors.IsqlError as e:
+        logger.error(f"Error while running isql interface: {e}")
+        return False
+    except FileNotFoundError as file:
+        logger.critical(f"Cannot find file {file}")
+        return False
+    except SpchtErrors.ParsingError as e:
+        logger.error(f"Reading of triple file failed: {e}")
+        return False
+    finally:
+        for loader in loaders:
+            loader.close()
+        CloseLoadState(load_state)
 
 
-def CleanUpWorkOrder(work_order_filename: str, force=False, files=('file', 'rdf_file'), **kwargs):
+def CleanUpWorkOrder(work_order_filename: str, force=False, files=('file',) + PROCESSED_FILES, **kwargs):
     """
     Removes all files referenced in the work order file from the filesystem if the processing state
     necessary is reached
     :param str work_order_filename: file path to a work order file
     :param bool force: If set to true disregards meta status checks and deletes everything it touches
     :param files: dictionary keys in the 'file_list' part that get deleted
+    :param bool keep_raw_chunks: optional kwarg, the raw chunks stay for later recompute orders, those never delete
+        raw chunks as they belong to another order, only the rewritten ones of LatestRecordChunks
     :return: True if everything went smoothly, False if not.
     """
     if force:
@@ -1210,12 +2784,16 @@ def CleanUpWorkOrder(work_order_filename: str, force=False, files=('file', 'rdf_
         if work_order_0['meta']['status'] > 8 and not force:
             logger.error("Status of order indicates fulfillment, aborting.")
             return False
+        keep_raw = kwargs.get('keep_raw_chunks') or 'recompute' in work_order_0['meta']
         _ = 0
         for key in work_order_0['file_list']:
             # * for each entry in the part list
             if work_order_0['file_list'][key]['status'] == 8 or force:
                 wo_update = []  # i could just call update work order twice
                 for fileattr in files:
+                    # ? a chunk with a 'source_file' was written for this order alone, see LatestRecordChunks
+                    if fileattr == 'file' and keep_raw and 'source_file' not in work_order_0['file_list'][key]:
+                        continue
                     # * slightly complicated method to allow for more files (for whatever reason)
                     one_file = work_order_0['file_list'][key].get(fileattr)
 
@@ -1273,7 +2851,7 @@ def HardResetWorkOrder(work_order_file: str, **kwargs):
     try:
         status = work_order['meta']['status']  # prevents me from writing this a thousand time over..and its cleaner
         if status == 1:  # downloads are basically unrecoverable cause we dont know how much is missing
-            CleanUpWorkOrder(work_order_file, force=True, files=('rdf_file', 'file'))
+            CleanUpWorkOrder(work_order_file, force=True, files=PROCESSED_FILES + ('file',))
             UpdateWorkOrder(work_order_file,
                             update=[('file_list', {}), ('meta', 'status', 0)],
                             delete=[('meta', 'solr_start'), ('meta', 'solr_finish'), ('meta', 'full_download'),
@@ -1283,7 +2861,7 @@ def HardResetWorkOrder(work_order_file: str, **kwargs):
             # doesnt matter. There is some thinking of just doing all this in an sqlite database
             return True
         if status == 3:  # processing started
-            CleanUpWorkOrder(work_order_file, force=True, files=('rdf_file'))
+            CleanUpWorkOrder(work_order_file, force=True, files=PROCESSED_FILES)
             UpdateWorkOrder(work_order_file, update=('meta', 'status', 2))
             fields = ('processing_start', 'processing_finish', 'elements', 'triples')
         elif status == 5:  # post-processing started
@@ -1371,11 +2949,15 @@ def SoftResetWorkOrder(work_order_file: str, **kwargs):
                     list_of_deletes.append(('file_list', each, 'deletion_finish'))
                     list_of_updates.append(('file_list', each, 'status', 4))
         elif status == 7:
+            # ? a fused update deletes and inserts in one step, an unfinished chunk has to start again from 4
+            previous = 4 if work_order['meta'].get('fused_update') else 6
             for each in work_order['file_list']:
                 if work_order['file_list'][each]['status'] == 7:
                     list_of_deletes.append(('file_list', each, 'insert_start'))
                     list_of_deletes.append(('file_list', each, 'insert_finish'))
-                    list_of_updates.append(('file_list', each, 'status', 6))
+                    list_of_updates.append(('file_list', each, 'status', previous))
+            if previous == 4:
+                list_of_updates.append(('meta', 'status', 4))
         else:
             logger.info("Cannot soft reset anything.")
             return True
@@ -1410,7 +2992,8 @@ def PurgeWorkOrder(work_order_file: str, **kwargs):
     old_work_order = load_from_json(work_order_file)
     try:
         meta = old_work_order['meta']
-        return CreateWorkOrder(work_order_file, meta['fetch'], meta['type'], meta['method'])
+        return CreateWorkOrder(work_order_file, meta['fetch'], meta['type'], meta['method'],
+                               compression=meta.get('compression'))
     except KeyError as key:
         print(f"Key missing {key}")
         return False
@@ -22,6 +22,10 @@
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 
 SOURCES = ("dict", "marc", "tree")
+COMPILED_SUFFIX = ".spchtc"  # ready to use descriptor as json, written by Spcht.export_compiled_descriptor
+COMPILED_FORMAT = 2  # increase whenever the structure of the compiled artifact changes
+TERM_DICT_SUFFIX = ".sptd"  # binary triples with a term dictionary, see SpchtUtility.TermDictWriter
+TERM_DICT_MAGIC = b"SPTD\x01"  # the last byte is the version of the format
 SPCHT_BOOL_OPS = {"equal":"==", "eq":"==","greater":">","gr":">","lesser":"<","ls":"<",
                     "greater_equal":">=","gq":">=", "lesser_equal":"<=","lq":"<=",
                   "unequal":"!=","uq":"!=","=":"==","==":"==","<":"<",">":">","<=":"<=",">=":">=","!=":"!=","exi":"exi"}
@@ -69,7 +73,9 @@ BUILDER_KEYS = {
     "tag": "str",
     "static_field": "str",
     "append_uuid_predicate_fields": "list",
-    "append_uuid_object_fields": "list"
+    "append_uuid_object_fields": "list",
+    "regex_engine": "str",
+    "regex_timeout": "float"
 }
 # distinction between different functions Spcht uses
 BUILDER_SPCHT_TECH = ['alternatives', 'mapping', 'joined_map', 'match', 'append', 'prepend',
@@ -21,29 +21,99 @@
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 
+import collections
+import contextlib
+import datetime
+import email.utils
+import os
+import random
+import struct
+import subprocess
 import sys
+import threading
 import time
+import uuid
 import json
-import requests
+import gzip
+import math
 import logging
 import hashlib
-from dateutil.relativedelta import relativedelta
-from requests.auth import HTTPDigestAuth
-
-# more or less only needed for debug stuff
-try:
-    from termcolor import colored
-except ModuleNotFoundError:
-    def colored(string: str) -> str:
-        return string
+# ? requests, dateutil and termcolor are imported where they are needed, short lived cli calls like --CheckWorkOrder
+# ? should not pay for the http stack
 # internal modules
 import Spcht.Core.SpchtErrors as SpchtErrors
 
+try:
+    import fcntl
+except ImportError:  # ? windows, file_lock then only works between the threads of one process
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+_termcolor = None
+_http = threading.local()  # ? keep alive sessions of sparqlQuery, one per thread as requests.Session is not thread safe
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+_request_settings = {"request_retries": 5, "request_backoff": 1.0, "request_rate": None, "endpoint_concurrency": None,
+                     "request_timeout": 300.0}
+_endpoint_policies = {}  # ? one per scheme://host:port, shared by all threads of a process
+_endpoint_policies_guard = threading.Lock()
+RETRY_STATUS = (429, 502, 503, 504)  # ? a 500 of virtuoso is usually a broken query, trying again changes nothing
+MAX_BACKOFF = 60.0
+# ? why sparqlQuery failed: 'unreachable' without any answer, 'denied' for 401/403, 'unavailable' for an overloaded
+# ? server that stayed so through all retries and 'rejected' for everything else, the only one a smaller request fixes
+SparqlFailure = collections.namedtuple("SparqlFailure", "reason status_code text")
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}  # ? zstd needs the optional zstandard package
+
+
+def colored(text, *args, **kwargs):
+    """
+    termcolor.colored that imports termcolor on first use, without termcolor the text is returned as is
+
+    :param text: the text that gets colored
+    :return: the colored text
+    :rtype: str
+    """
+    # more or less only needed for debug stuff
+    global _termcolor
+    if _termcolor is None:
+        try:
+            from termcolor import colored as term_colored
+            _termcolor = term_colored
+        except ModuleNotFoundError:
+            _termcolor = lambda some_text, *a, **kw: some_text  # throws args away returns non colored text
+    return _termcolor(text, *args, **kwargs)
+
 # describes structure of the json response from solr Version 7.3.1 holding the ubl data
 
 
+@contextlib.contextmanager
+def file_lock(lock_path: str):
+    """
+    Exclusive lock between processes by flock on a separate lock file, can be entered again by the same thread while
+    it is held. Every process opens the lock file on its own, a forked child does not share the lock of its parent
+
+    :param str lock_path: path of the lock file, gets created if necessary and is never removed
+    """
+    with _file_locks_guard:
+        lock = _file_locks.setdefault((os.getpid(), lock_path), {"thread": threading.RLock(), "depth": 0, "file": None})
+    with lock['thread']:
+        if lock['depth'] == 0:
+            lock['file'] = open(lock_path, "a")
+            if fcntl:
+                fcntl.flock(lock['file'], fcntl.LOCK_EX)
+        lock['depth'] += 1
+        try:
+            yield
+        finally:
+            lock['depth'] -= 1
+            if lock['depth'] == 0:
+                if fcntl:
+                    fcntl.flock(lock['file'], fcntl.LOCK_UN)
+                lock['file'].close()
+                lock['file'] = None
+
+
 def slice_header_json(data):
     STRUCTURE = {
         "header": "responseHeader",
@@ -89,14 +159,176 @@ def solr_handle_return(data):
         return data.get('response').get('docs')
 
 
+class EndpointPolicy:
+    """
+    Retries, rate and concurrency of the requests to one endpoint. Waits between retries grow exponentially with full
+    jitter so that a bunch of workers does not hammer a recovering server in lockstep, the rate is a token bucket that
+    allows short bursts, the concurrency a semaphore. All of it is per process, with insert_processes the limits
+    multiply accordingly
+    """
+    def __init__(self, retries=5, backoff=1.0, rate=None, concurrency=None, timeout=None):
+        """
+        :param int retries: number of retries after the first attempt
+        :param float backoff: wait before the first retry in seconds, doubles with every further one, up to MAX_BACKOFF
+        :param float rate: requests per second, None for no limit
+        :param int concurrency: requests under way at the same time, None for no limit
+        :param float timeout: seconds to wait for the connection and for each answer of the server, None or 0 for ever
+        """
+        self.retries = max(0, int(retries))
+        self.backoff = max(0.0, float(backoff))
+        self.timeout = float(timeout) if timeout else None
+        self.rate = float(rate) if rate else None
+        self.burst = max(1.0, self.rate or 1.0)  # ? one second worth of requests
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(int(concurrency)) if concurrency else None
+
+    def take(self):
+        # ? tokens may go below zero, each caller then waits for its own reserved token
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    @contextlib.contextmanager
+    def slot(self):
+        if self.slots is None:
+            yield
+            return
+        with self.slots:
+            yield
+
+    def delay(self, attempt: int, retry_after=None) -> float:
+        """
+        Seconds to wait before the retry number attempt (starting with 0), a Retry-After of the server wins if given,
+        either as seconds or as http date
+        """
+        if retry_after is not None:
+            retry_after = str(retry_after).strip()
+            if retry_after.isdigit():
+                return min(MAX_BACKOFF, float(retry_after))
+            try:
+                moment = email.utils.parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError, IndexError):
+                moment = None  # ? garbage in the header, the own backoff applies
+            if moment is not None:
+                if moment.tzinfo is None:  # ? http dates are always gmt, '-0000' is parsed as naive
+                    moment = moment.replace(tzinfo=datetime.timezone.utc)
+                remaining = (moment - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+                return min(MAX_BACKOFF, max(0.0, remaining))
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+
+def _endpoint_key(url: str) -> str:
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _for_endpoint(value, key: str):
+    # ? the config file might give a dictionary of values per endpoint instead of one for all
+    if isinstance(value, dict):
+        return value.get(key, value.get(key.split("://", 1)[-1]))
+    return value
+
+
+def configure_requests(request_retries=None, request_backoff=None, request_rate=None, endpoint_concurrency=None,
+                       request_timeout=None, **kwargs):
+    """
+    Sets the retry policy, rate limit and concurrency cap used by all requests to triplestores and solr, parameters
+    that are None keep their current value. Rate and concurrency are either one number for every endpoint or a
+    dictionary with 'scheme://host:port' (or just 'host:port') as keys
+
+    :param int request_retries: retries of a failed request before giving up, default 5
+    :param float request_backoff: wait before the first retry in seconds, doubled for each further one, default 1
+    :param float or dict request_rate: requests per second and endpoint, default no limit
+    :param int or dict endpoint_concurrency: requests at the same time per endpoint, default no limit
+    :param float request_timeout: seconds to wait for the connection and each answer of a server, 0 for ever, default 300
+    :param kwargs: arbitary, additional parameters that all will be ignored, a whole config can be passed
+    :return: nothing
+    """
+    update = {key: value for key, value in (("request_retries", request_retries), ("request_backoff", request_backoff),
+                                            ("request_rate", request_rate),
+                                            ("endpoint_concurrency", endpoint_concurrency),
+                                            ("request_timeout", request_timeout)) if value is not None}
+    with _endpoint_policies_guard:
+        if any(_request_settings[key] != value for key, value in update.items()):
+            _request_settings.update(update)
+            _endpoint_policies.clear()  # ? requests under way keep their old policy
+
+
+def endpoint_policy(url: str) -> EndpointPolicy:
+    key = _endpoint_key(url)
+    with _endpoint_policies_guard:
+        if key not in _endpoint_policies:
+            _endpoint_policies[key] = EndpointPolicy(_request_settings['request_retries'],
+                                                     _request_settings['request_backoff'],
+                                                     _for_endpoint(_request_settings['request_rate'], key),
+                                                     _for_endpoint(_request_settings['endpoint_concurrency'], key),
+                                                     _request_settings['request_timeout'])
+        return _endpoint_policies[key]
+
+
+def request_with_retry(session, method: str, url: str, **kwargs):
+    """
+    Sends one http request with the policy of its endpoint, see EndpointPolicy. Connection errors, timeouts and the
+    answers in RETRY_STATUS are tried again after a growing wait, a seekable request body is rewound before that.
+    Everything else, including all other error codes, is returned or raised right away. Without an own timeout in
+    kwargs the one of the policy applies, a server that never answers would otherwise block forever
+
+    :param requests.Session session: the session that sends the request
+    :param str method: http method, GET or POST
+    :param str url: the url of the request
+    :param kwargs: everything requests.Session.request takes
+    :return: the last response
+    :rtype: requests.Response
+    :raises requests.exceptions.RequestException: if the last attempt could not connect
+    """
+    import requests
+    policy = endpoint_policy(url)
+    if policy.timeout:
+        kwargs.setdefault('timeout', policy.timeout)
+    body = kwargs.get('data')
+    start = body.tell() if hasattr(body, "seek") and hasattr(body, "tell") else None
+    for attempt in range(policy.retries + 1):
+        if attempt and start is not None:
+            body.seek(start)
+        policy.take()
+        try:
+            with policy.slot():
+                response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= policy.retries:
+                raise
+            wait = policy.delay(attempt)
+            logger.warning(f"{method} {_endpoint_key(url)} failed ({e.__class__.__name__}), retry {attempt + 1} of "
+                           f"{policy.retries} in {wait:.1f}s")
+        else:
+            if response.status_code not in RETRY_STATUS or attempt >= policy.retries:
+                return response
+            wait = policy.delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(f"{method} {_endpoint_key(url)} answered {response.status_code}, retry {attempt + 1} of "
+                           f"{policy.retries} in {wait:.1f}s")
+        time.sleep(wait)
+
+
 def load_remote_content(url, params, response_type=0, mode="GET"):
     # starts a GET request to the specified solr server with the provided list of parameters
     # response types: 0 = just the content, 1 = just the header, 2 = the entire GET-RESPONSE
+    import requests
+    session, discard = sparql_session()
     try:
         if mode != "POST":
-            resp = requests.get(url, params=params)
+            resp = request_with_retry(session, "GET", url, params=params)
         else:
-            resp = requests.post(url, data=params)
+            resp = request_with_retry(session, "POST", url, data=params)
         if resp.status_code != 200:
             raise SpchtErrors.RequestError("Request couldnt be fullfilled, check url")
         if response_type == 1:
@@ -117,8 +349,32 @@ def block_sparkle_insert(graph, insert_list):
     return sparkle
 
 
+def sparql_session(user=None, password=None) -> tuple:
+    """
+    The keep alive http session of the current thread and a reusable digest authentication for it. Reusing both saves
+    the tcp handshake and the 401 round trip of digest auth for every single request, a forked process gets its own
+
+    :param str user: optional user for digest authentication
+    :param str password: optional password for digest authentication
+    :return: (requests.Session, HTTPDigestAuth or None)
+    :rtype: tuple
+    """
+    import requests
+    from requests.auth import HTTPDigestAuth
+    if getattr(_http, "pid", None) != os.getpid():
+        _http.pid = os.getpid()
+        _http.session = requests.Session()
+        _http.auth = {}
+    if not user or not password:
+        return _http.session, None
+    if (user, password) not in _http.auth:
+        _http.auth[(user, password)] = HTTPDigestAuth(user, password)
+    return _http.session, _http.auth[(user, password)]
+
+
 def sparqlQuery(sparql_query, base_url, get_format="application/json", **kwargs) -> tuple:
     # sends a query to the sparql endpoint of a virtuoso and (per default) retrieves a json and returns the data
+    # ? a failed query returns False and a SparqlFailure
     params = {
         "default-graph": "",
         "should-sponge": "soft",
@@ -131,15 +387,25 @@ def sparqlQuery(sparql_query, base_url, get_format="application/json", **kwargs)
     }
     if "named_graph" in kwargs:
         params['default-graph-uri'] = kwargs['named_graph']
+    import requests
+    session, digest = sparql_session(kwargs.get("auth"), kwargs.get("pwd"))
     try:
-        if kwargs.get("auth", False) and kwargs.get("pwd", False):
-            # response = requests.get(base_url, auth=HTTPDigestAuth(kwargs.get("auth"), kwargs.get("pwd")), params=params)
-            response = requests.post(base_url, auth=HTTPDigestAuth(kwargs.get("auth"), kwargs.get("pwd")), data=params)
+        if digest:
+            response = request_with_retry(session, "POST", base_url, auth=digest, data=params)
+        else:
+            response = request_with_retry(session, "GET", base_url, params=params)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Connection to Sparql-Server failed: {e}")
+        return False, SparqlFailure("unreachable", None, str(e))
+    if response is not None and response.status_code >= 400:  # ? rejected queries have to be noticed for a retry
+        logger.error(f"Sparql-Server answered with {response.status_code}: {response.text[:200]}")
+        if response.status_code in (401, 403):
+            reason = "denied"
+        elif response.status_code in (408,) + RETRY_STATUS:
+            reason = "unavailable"
         else:
-            response = requests.get(base_url, params=params)
-    except requests.exceptions.ConnectionError:
-        logger.error("Connection to Sparql-Server failed")
-        return False, False
+            reason = "rejected"
+        return False, SparqlFailure(reason, response.status_code, response.text)
 
     try:
         if response is not None:
@@ -148,11 +414,639 @@ def sparqlQuery(sparql_query, base_url, get_format="application/json", **kwargs)
             else:
                 return True, response.text
         else:
-            return False, False
+            return False, SparqlFailure("unreachable", None, "")
     except json.decoder.JSONDecodeError:
         return True, response.text
 
 
+def gsp_post(document, gsp_endpoint: str, named_graph: str, headers: dict, user=None, password=None) -> bool:
+    """
+    Adds an rdf document to a named graph with a POST to a sparql 1.1 graph store protocol endpoint, the document is
+    the request body as it is, no sparql involved
+
+    :param document: seekable binary file with the document, the digest authentication might have to send it twice
+    :param str gsp_endpoint: the graph store endpoint, the one of virtuoso is /sparql-graph-crud-auth
+    :param str named_graph: the graph, send as ?graph= parameter
+    :param dict headers: at least the Content-Type of the document, maybe a Content-Encoding
+    :param str user: optional user for digest authentication
+    :param str password: optional password for digest authentication
+    :return: True if the store accepted the document
+    :rtype: bool
+    """
+    import requests
+    session, digest = sparql_session(user, password)
+    try:
+        response = request_with_retry(session, "POST", gsp_endpoint, params={"graph": named_graph}, data=document,
+                                      headers=headers, auth=digest)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Graph store upload to {gsp_endpoint} failed: {e}")
+        return False
+    if response.status_code not in (200, 201, 204):
+        logger.error(f"Graph store answered with {response.status_code}: {response.text[:200]}")
+        return False
+    return True
+
+
+def sparql_rejected(result) -> bool:
+    """
+    :param result: the second value sparqlQuery returns for a failed query
+    :return: True if the server answered and refused the query itself, a smaller one might pass
+    :rtype: bool
+    """
+    return isinstance(result, SparqlFailure) and result.reason == "rejected"
+
+
+def sparql_failure_reason(result) -> str:
+    if isinstance(result, SparqlFailure):
+        return f"{result.reason} ({result.status_code})" if result.status_code else result.reason
+    return "unknown"
+
+
+def sparql_delete_values_query(nodes: list, named_graph: str, variable="?s", pattern="?s ?p ?o", predicates=None) -> str:
+    """
+    Builds one sparql delete that removes the pattern for all given nodes at once by binding them in a VALUES block
+
+    :param list nodes: IRIs in sparql notation, with the <>
+    :param str named_graph: graph the triples are deleted from
+    :param str variable: the variable of the pattern that gets bound to the nodes
+    :param str pattern: a single triple pattern, '?s ?p ?o' deletes everything about the subjects
+    :param list predicates: optional IRIs without <>, only triples with those are deleted, the pattern has to use ?p
+    :return: the query
+    :rtype: str
+    """
+    scope = ""
+    if predicates:
+        scope = f"VALUES ?p {{ {' '.join(f'<{x}>' for x in predicates)} }} "
+    return f"WITH <{named_graph}> DELETE {{ {pattern} }} WHERE {{ VALUES {variable} {{ {' '.join(nodes)} }} {scope}{pattern} }}"
+
+
+def sparql_delete_values(nodes, sparql_endpoint: str, named_graph: str, variable="?s", pattern="?s ?p ?o",
+                         batch_size=200, max_batch_size=5000, target_seconds=10.0, predicates=None, **kwargs) -> bool:
+    """
+    Deletes a pattern for a lot of nodes with as few requests as possible, see sparql_delete_values_query. The batch
+    size adapts while running, batches that take longer than target_seconds halve the size, batches that are done in a
+    quarter of that double it up to max_batch_size. A batch the server rejects is tried again with half the size, only
+    a single failing node aborts the whole thing. Any other failure, see SparqlFailure, aborts right away as a smaller
+    request would fail the same way
+
+    :param nodes: iterable of IRIs in sparql notation, with the <>
+    :param str sparql_endpoint: endpoint for an authenticated sparql interface
+    :param str named_graph: graph the triples are deleted from
+    :param str variable: the variable of the pattern that gets bound to the nodes
+    :param str pattern: a single triple pattern
+    :param int batch_size: number of nodes of the first request
+    :param int max_batch_size: upper limit for the adaption
+    :param float target_seconds: desired duration of a single request
+    :param list predicates: optional, restricts the delete to those predicates, see sparql_delete_values_query
+    :param kwargs: 'auth' and 'pwd' for sparqlQuery
+    :return: True if all nodes were deleted, False if a request failed
+    :rtype: bool
+    """
+    nodes = list(nodes)
+    size = max(1, int(batch_size))
+    position = 0
+    while position < len(nodes):
+        batch = nodes[position:position + size]
+        query = sparql_delete_values_query(batch, named_graph, variable, pattern, predicates)
+        zero_time = time.time()
+        status, result = sparqlQuery(query, sparql_endpoint, named_graph=named_graph, **kwargs)
+        duration = time.time() - zero_time
+        if not status:
+            if not sparql_rejected(result):
+                logger.error(f"sparql_delete_values: request failed, {sparql_failure_reason(result)}, giving up")
+                return False
+            if size == 1:
+                logger.error(f"sparql_delete_values: deleting {batch[0]} failed")
+                return False
+            size = max(1, size // 2)
+            logger.info(f"sparql_delete_values: batch of {len(batch)} failed, trying again with {size}")
+            continue
+        position += len(batch)
+        if duration > target_seconds and size > 1:
+            size = max(1, size // 2)
+        elif duration < target_seconds / 4 and size < max_batch_size:
+            size = min(max_batch_size, size * 2)
+    logger.debug(f"sparql_delete_values: deleted {len(nodes)} nodes, final batch size {size}")
+    return True
+
+
+def sparql_insert_data(lines, sparql_endpoint: str, named_graph: str, batch_bytes=262144, max_batch_bytes=4194304,
+                       target_seconds=10.0, concurrency=1, blocks=False, **kwargs) -> bool:
+    """
+    Inserts N-Triples lines with INSERT DATA requests bounded by their size in bytes instead of their number of
+    triples. Like sparql_delete_values the size adapts to the measured duration of the requests, slower than
+    target_seconds halves it, done in a quarter of that doubles it up to max_batch_bytes. A request the server rejects
+    is split in half and send again, only a single failing triple aborts the whole thing. Any other failure, an
+    endpoint that cannot be reached, refuses the user or stays overloaded, aborts right away. Up to concurrency requests
+    are under way at the same time, each thread with its own keep alive session
+
+    :param lines: iterable of N-Triples lines, each with its final newline, or of whole blocks if blocks is True
+    :param str sparql_endpoint: endpoint for an authenticated sparql interface
+    :param str named_graph: graph the triples are inserted into
+    :param int batch_bytes: size of the first requests in utf-8 bytes
+    :param int max_batch_bytes: upper limit for the adaption
+    :param float target_seconds: desired duration of a single request
+    :param int concurrency: number of requests in flight at the same time
+    :param bool blocks: the items are ready blocks, for example from read_sparql_payloads, and are send as they are
+    :param kwargs: 'auth' and 'pwd' for sparqlQuery
+    :return: True if everything was inserted, False if a request failed for good
+    :rtype: bool
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    lines = iter(lines)
+    state = {"size": max(1, int(batch_bytes)), "carry": None, "sent": 0, "requests": 0}
+    retry = []
+
+    def next_batch() -> list:
+        if retry:
+            return retry.pop()
+        if blocks:
+            block = next(lines, None)
+            return block.splitlines(keepends=True) if block else []
+        batch, used = [], 0
+        if state['carry']:
+            batch.append(state['carry'])
+            used = len(state['carry'].encode("utf-8"))
+            state['carry'] = None
+        for line in lines:
+            size = len(line.encode("utf-8"))
+            if batch and used + size > state['size']:
+                state['carry'] = line
+                break
+            batch.append(line)
+            used += size
+        return batch
+
+    def send(batch: list) -> tuple:
+        query = f"INSERT DATA {{ GRAPH <{named_graph}> {{ {''.join(batch)} }} }}"
+        zero_time = time.time()
+        status, result = sparqlQuery(query, sparql_endpoint, named_graph=named_graph, **kwargs)
+        return status, result, time.time() - zero_time
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as pool:
+        while True:
+            while len(running) < max(1, int(concurrency)):
+                batch = next_batch()
+                if not batch:
+                    break
+                running[pool.submit(send, batch)] = batch
+            if not running:
+                break
+            done, discard = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = running.pop(future)
+                status, result, duration = future.result()
+                state['requests'] += 1
+                if not status:
+                    if not sparql_rejected(result):
+                        logger.error(f"sparql_insert_data: request failed, {sparql_failure_reason(result)}, giving up")
+                        for other in running:
+                            other.cancel()
+                        return False
+                    if len(batch) == 1:
+                        logger.error(f"sparql_insert_data: inserting {batch[0].strip()} failed")
+                        for other in running:
+                            other.cancel()
+                        return False
+                    state['size'] = max(1, state['size'] // 2)
+                    half = len(batch) // 2
+                    retry.extend((batch[half:], batch[:half]))
+                    logger.info(f"sparql_insert_data: batch of {len(batch)} triples failed, trying again in halves")
+                    continue
+                state['sent'] += len(batch)
+                if duration > target_seconds and state['size'] > 1:
+                    state['size'] = max(1, state['size'] // 2)
+                elif duration < target_seconds / 4 and state['size'] < max_batch_bytes:
+                    state['size'] = min(max_batch_bytes, state['size'] * 2)
+    logger.debug(f"sparql_insert_data: inserted {state['sent']} triples with {state['requests']} requests, "
+                 f"final batch size {state['size']} bytes")
+    return True
+
+
+class IsqlSession:
+    """
+    A single running isql process of virtuoso that gets its commands through stdin, logging in once instead of
+    starting isql anew for every statement. After each batch of commands a marker is selected, everything isql prints
+    until the marker appears belongs to that batch and gets checked for errors
+
+    Use as context manager, the process starts with the first batch and ends with the context::
+
+        with IsqlSession("/usr/bin/isql-v", 1111, "dba", "dba") as isql:
+            isql.execute(["sparql CLEAR GRAPH <http://example.org/>;"])
+    """
+    def __init__(self, isql_path: str, isql_port: int, user: str, password: str):
+        self.command = [isql_path, str(isql_port), user, password, "VERBOSE=OFF", "BANNER=OFF", "PROMPT=OFF",
+                        "ECHO=OFF", "ERRORS=STDOUT"]
+        self.process = None
+        self.batches = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, bufsize=1)
+
+    def execute(self, commands: list) -> list:
+        """
+        Runs a batch of isql statements, each has to end with a ;
+
+        :param list commands: the statements
+        :return: the lines isql printed for this batch
+        :rtype: list
+        :raises SpchtErrors.IsqlError: if isql reports an error or is gone
+        """
+        if self.process is None:  # ? started with the first statement, a session without any work costs nothing
+            self.open()
+        if self.process.poll() is not None:
+            raise SpchtErrors.IsqlError(f"isql is not running anymore, exit code {self.process.returncode}")
+        self.batches += 1
+        marker = f"SPCHT_{self.batches}_{uuid.uuid4().hex}"
+        try:
+            self.process.stdin.write("\n".join(commands) + f"\nSELECT '{marker}';\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise SpchtErrors.IsqlError(f"isql ended unexpectedly with exit code {self.process.wait()}")
+        output = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise SpchtErrors.IsqlError(f"isql ended unexpectedly with exit code {self.process.wait()}: {''.join(output[-5:]).strip()}")
+            if line.strip() == marker:
+                break
+            output.append(line)
+        errors = [x.strip() for x in output if x.lstrip().startswith("*** Error")]
+        if errors:
+            raise SpchtErrors.IsqlError("; ".join(errors))
+        return output
+
+    def close(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                self.process.communicate("EXIT;\n", timeout=30)
+            except (subprocess.TimeoutExpired, BrokenPipeError):
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+
+def odbc_connection_string(odbc_dsn: str, user=None, password=None) -> str:
+    """
+    :param str odbc_dsn: name of a configured data source or a complete connection string with DRIVER=... or DSN=...
+    :param str user: added as UID unless the connection string has one
+    :param str password: added as PWD unless the connection string has one
+    :return: connection string for pyodbc.connect
+    :rtype: str
+    """
+    parts = [odbc_dsn if "=" in odbc_dsn else f"DSN={odbc_dsn}"]
+    keys = {x.split("=", 1)[0].strip().upper() for x in odbc_dsn.split(";") if "=" in x}
+    if user and "UID" not in keys:
+        parts.append(f"UID={user}")
+    if password and "PWD" not in keys:
+        parts.append(f"PWD={password}")
+    return ";".join(parts)
+
+
+class OdbcPool:
+    """
+    A few odbc connections to virtuoso that are opened once and handed out one at a time. The connections run
+    without autocommit, everything that is executed within one transaction is committed together or not at all
+
+    Needs pyodbc, which is imported with the first connection::
+
+        pool = OdbcPool("DSN=VOS;UID=dba;PWD=dba", size=4)
+        with pool.transaction() as cursor:
+            cursor.execute("SPARQL CLEAR GRAPH <http://example.org/>")
+        pool.close()
+    """
+    def __init__(self, connection_string: str, size=2):
+        self.connection_string = connection_string
+        self.size = max(1, int(size))
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        A cursor of an idle or new connection, commits when the block is done and rolls back if it raises, a
+        connection that cannot even roll back is dropped instead of going back to the pool
+        """
+        import pyodbc
+        self.slots.acquire()
+        connection = None
+        try:
+            with self.lock:
+                connection = self.idle.pop() if self.idle else None
+            if connection is None:
+                connection = pyodbc.connect(self.connection_string, autocommit=False)
+            cursor = connection.cursor()
+            try:
+                yield cursor
+                connection.commit()
+            except BaseException:
+                try:
+                    connection.rollback()
+                except pyodbc.Error:
+                    connection.close()
+                    connection = None
+                raise
+            finally:
+                cursor.close()
+        finally:
+            if connection is not None:
+                with self.lock:
+                    self.idle.append(connection)
+            self.slots.release()
+
+    def close(self):
+        with self.lock:
+            for connection in self.idle:
+                connection.close()
+            self.idle = []
+
+
+class SubjectRegistry:
+    """
+    A persisted bloom filter of all subjects that were ever inserted into one named graph, used to skip deletes for
+    subjects that cannot be in the graph yet. A bloom filter never misses a subject it has seen, it only sometimes
+    claims to know one it has not seen, which costs nothing but a superfluous delete
+
+    This only holds if every insert into the graph passes through the registry, it has to be seeded once from the
+    triplestore (see WorkOrder.SeedSubjectRegistry), without a registry file nothing gets skipped
+    """
+    MAGIC = b"SPSR\x01"
+
+    def __init__(self, file_path: str, capacity=1000000, error_rate=0.01):
+        """
+        Creates a new, empty registry, use SubjectRegistry.load or for_graph for existing ones
+
+        :param str file_path: where the registry gets saved
+        :param int capacity: expected number of subjects, more work but raise the error rate
+        :param float error_rate: desired rate of false positives at capacity
+        """
+        self.file_path = file_path
+        self.capacity = max(1, int(capacity))
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, subject: str):
+        digest = hashlib.blake2b(subject.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def __contains__(self, subject: str) -> bool:
+        return all(self.bits[x >> 3] & (1 << (x & 7)) for x in self._positions(subject))
+
+    def __len__(self):
+        # ? an estimate, a new subject that happens to be a false positive is not counted
+        return self.count
+
+    def add(self, subject: str):
+        new = False
+        for x in self._positions(subject):
+            if not self.bits[x >> 3] & (1 << (x & 7)):
+                self.bits[x >> 3] |= 1 << (x & 7)
+                new = True
+        if new:
+            self.count += 1
+
+    def update(self, subjects):
+        for subject in subjects:
+            self.add(subject)
+        if self.count > self.capacity:
+            logger.warning(f"Subject registry {self.file_path} holds {self.count} subjects but was made for "
+                           f"{self.capacity}, more deletes will be done than necessary, consider seeding it anew")
+
+    def save(self):
+        """
+        Writes the registry, the old file stays intact until the new one is complete. Subjects that another process
+        saved in the meantime are merged in, parallel insert workers each have their own copy of the registry
+        """
+        with file_lock(f"{self.file_path}.lock"):
+            try:
+                other = self.load(self.file_path) if os.path.exists(self.file_path) else None
+            except SpchtErrors.ParsingError:
+                other = None
+            if other is not None and (other.size, other.hashes) == (self.size, self.hashes):
+                merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+                self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+                # ? both copies may hold the same subjects, the number of set bits gives the estimate of the union
+                ones = min(bin(merged).count("1"), self.size - 1)
+                self.count = max(self.count, other.count, round(-self.size / self.hashes * math.log(1 - ones / self.size)))
+            temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as registry_file:
+                registry_file.write(self.MAGIC + struct.pack("<QQQQ", self.capacity, self.size, self.hashes, self.count))
+                registry_file.write(self.bits)
+            os.replace(temp_path, self.file_path)
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        :param str file_path: a file written by SubjectRegistry.save
+        :return: the registry
+        :rtype: SubjectRegistry
+        :raises SpchtErrors.ParsingError: if the file is no registry
+        """
+        with open(file_path, "rb") as registry_file:
+            if registry_file.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise SpchtErrors.ParsingError(f"{file_path} is not a subject registry")
+            registry = cls(file_path)
+            registry.capacity, registry.size, registry.hashes, registry.count = struct.unpack("<QQQQ", registry_file.read(32))
+            registry.bits = bytearray(registry_file.read())
+        if len(registry.bits) != (registry.size + 7) // 8:
+            raise SpchtErrors.ParsingError(f"Subject registry {file_path} is truncated")
+        return registry
+
+    @staticmethod
+    def graph_file(folder: str, named_graph: str) -> str:
+        """
+        :return: path of the registry file of a named graph within the registry folder
+        :rtype: str
+        """
+        return os.path.join(folder, f"{hashlib.sha256(named_graph.encode('utf-8')).hexdigest()[:16]}.registry")
+
+    @classmethod
+    def for_graph(cls, folder: str or None, named_graph: str):
+        """
+        The registry of a named graph if there is one, None means that nothing may be skipped
+
+        :param str or None folder: the 'subject_registry' setting, None if unused
+        :param str named_graph: the graph
+        :return: the registry or None
+        :rtype: SubjectRegistry or None
+        """
+        if not folder:
+            return None
+        file_path = cls.graph_file(folder, named_graph)
+        if not os.path.exists(file_path):
+            logger.info(f"No subject registry for graph {named_graph} in {folder}, it has to be seeded first")
+            return None
+        return cls.load(file_path)
+
+
+class _GraphStore:
+    """
+    Common part of the local sqlite stores that exist once per named graph, several processing processes may read at
+    the same time, only the insert steps write
+    """
+    SUFFIX = ".sqlite"
+    TABLE = ""
+    LOOKUP_SIZE = 500  # ? sqlite allows only so many variables per statement
+
+    def __init__(self, file_path: str):
+        import sqlite3  # ? only the stores need sqlite
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(self.TABLE)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def graph_file(cls, folder: str, named_graph: str) -> str:
+        """
+        :return: path of the store of a named graph within the store folder
+        :rtype: str
+        """
+        return os.path.join(folder, f"{hashlib.sha256(named_graph.encode('utf-8')).hexdigest()[:16]}{cls.SUFFIX}")
+
+    @classmethod
+    def for_graph(cls, folder: str or None, named_graph: str or None):
+        """
+        The store of a named graph, created empty if there is none yet
+
+        :param str or None folder: the setting that holds the folder, None if unused
+        :param str or None named_graph: the graph
+        :return: the store or None if the folder or the graph is not set
+        """
+        if not folder or not named_graph:
+            return None
+        os.makedirs(folder, exist_ok=True)
+        return cls(cls.graph_file(folder, named_graph))
+
+
+class DeltaStore(_GraphStore):
+    """
+    Local record of what was loaded into one named graph, for every subject a hash of its triples and, if wanted, the
+    triples themselves. Processing compares new data against it so only the actual changes reach the triplestore, the
+    insert steps write the new state back after a chunk was loaded. An empty store is no problem as unknown subjects
+    are always deleted and inserted entirely
+    """
+    TABLE = "CREATE TABLE IF NOT EXISTS subjects (subject TEXT PRIMARY KEY, hash TEXT NOT NULL, triples BLOB)"
+
+    @staticmethod
+    def subject_hash(lines) -> str:
+        """
+        :param lines: the predicate object pairs of one subject in N-Triples notation
+        :return: a hash of those independent of their order and duplicates
+        :rtype: str
+        """
+        return hashlib.sha1("\n".join(sorted(set(lines))).encode("utf-8")).hexdigest()
+
+    def lookup(self, subjects) -> dict:
+        """
+        :param subjects: subjects in N-Triples notation
+        :return: a dictionary subject -> (hash, list of predicate object pairs or None) of all known subjects
+        :rtype: dict
+        """
+        subjects = list(subjects)
+        known = {}
+        for i in range(0, len(subjects), self.LOOKUP_SIZE):
+            batch = subjects[i:i + self.LOOKUP_SIZE]
+            rows = self.connection.execute(f"SELECT subject, hash, triples FROM subjects WHERE subject IN "
+                                           f"({','.join('?' * len(batch))})", batch)
+            for subject, digest, triples in rows:
+                if triples is not None:
+                    triples = gzip.decompress(triples).decode("utf-8").split("\n")
+                known[subject] = (digest, triples)
+        return known
+
+    def commit(self, rows) -> int:
+        """
+        Writes the new state of subjects in one transaction
+
+        :param rows: iterable of (subject, hash, list of predicate object pairs or None)
+        :return: number of written subjects
+        :rtype: int
+        """
+        written = 0
+        with self.connection:
+            for subject, digest, triples in rows:
+                if triples is not None:
+                    triples = gzip.compress("\n".join(triples).encode("utf-8"), compresslevel=6)
+                self.connection.execute("INSERT OR REPLACE INTO subjects VALUES (?, ?, ?)", (subject, digest, triples))
+                written += 1
+        return written
+
+
+class RecordIndex(_GraphStore):
+    """
+    Hash of every raw record that was loaded into one named graph, computed over the record, the descriptor and the
+    subject. A record with the same hash as last time would produce the very same triples, processing skips it
+
+    Lives next to the delta stores if both are used, hence the different suffix
+    """
+    SUFFIX = ".records.sqlite"
+    TABLE = "CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, hash TEXT NOT NULL)"
+
+    @staticmethod
+    def record_hash(record: dict, salt: str) -> str:
+        """
+        :param dict record: a raw record as it comes from solr
+        :param str salt: everything else the output depends on, the descriptor hash and the subject
+        :return: hash of the record that is independent of the order of its fields
+        :rtype: str
+        """
+        return hashlib.sha256(f"{salt}|{json.dumps(record, sort_keys=True, default=str)}".encode("utf-8")).hexdigest()
+
+    def get(self, record_id: str) -> str or None:
+        """
+        :param str record_id: identifier of a record
+        :return: the hash the record had when it was loaded the last time, None if never
+        :rtype: str or None
+        """
+        row = self.connection.execute("SELECT hash FROM records WHERE id = ?", (record_id,)).fetchone()
+        return row[0] if row else None
+
+    def commit(self, rows) -> int:
+        """
+        Writes the hashes of loaded records in one transaction
+
+        :param rows: iterable of (record id, hash)
+        :return: number of written records
+        :rtype: int
+        """
+        written = 0
+        with self.connection:
+            for record_id, digest in rows:
+                self.connection.execute("INSERT OR REPLACE INTO records VALUES (?, ?)", (record_id, digest))
+                written += 1
+        return written
+
+
 def cprint_type(object, show_type=False):
     # debug function, prints depending on variable type
     colors = {
@@ -272,6 +1166,7 @@ def delta_now(zero_time, rounding=2):
 
 def delta_time_human(**kwargs):
     # https://stackoverflow.com/a/11157649
+    from dateutil.relativedelta import relativedelta
     attrs = ['years', 'months', 'days', 'hours', 'minutes', 'seconds', 'microseconds']
     delta = relativedelta(**kwargs)
     human_string = ""
@@ -298,10 +1193,64 @@ def test_json(json_str: str) -> dict or bool:
         return None
 
 
+def compression_of(file_path: str) -> str or None:
+    """
+    Guesses the compression of a file by its suffix
+
+    :param str file_path: path or name of a file
+    :return: 'gzip', 'zstd' or None for an uncompressed file
+    :rtype: str or None
+    """
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if str(file_path).endswith(suffix):
+            return compression
+    return None
+
+
+def strip_compression(file_path: str) -> str:
+    """
+    Removes the compression suffix of a file path if there is any, 'chunk.json.gz' becomes 'chunk.json'
+
+    :param str file_path: path or name of a file
+    :return: the path without the compression suffix
+    :rtype: str
+    """
+    compression = compression_of(file_path)
+    if compression:
+        return str(file_path)[:-len(COMPRESSION_SUFFIXES[compression])]
+    return str(file_path)
+
+
+def open_file(file_path: str, mode="r", compression=None):
+    """
+    Opens a file that might be compressed as stream, works like the builtin open. Text modes are always utf-8
+
+    :param str file_path: path of the file
+    :param str mode: the usual 'r', 'w', 'a', 'rb', 'wb' and 'ab'
+    :param str compression: 'gzip' or 'zstd', if None it gets guessed by the suffix of the file
+    :return: a file object, to be used in a with statement
+    :raises ModuleNotFoundError: if the file is zstd compressed but the zstandard package is not installed
+    :raises ValueError: for an unknown compression
+    """
+    if compression is None:
+        compression = compression_of(file_path)
+    encoding = None if "b" in mode else "utf-8"
+    if not compression:
+        return open(file_path, mode, encoding=encoding)
+    if "b" not in mode and "t" not in mode:
+        mode += "t"  # ? gzip and zstandard default to binary
+    if compression == "gzip":
+        return gzip.open(file_path, mode, compresslevel=6, encoding=encoding)
+    if compression == "zstd":
+        import zstandard
+        return zstandard.open(file_path, mode, encoding=encoding)
+    raise ValueError(f"Unknown compression '{compression}', must be one of {', '.join(COMPRESSION_SUFFIXES)}")
+
+
 def load_from_json(file_path):
     # TODO: give me actually helpful insights about the json here, especially where its wrong, validation and all
     try:
-        with open(file_path, mode='r') as file:
+        with open_file(file_path, mode='r') as file:
             return json.load(file)
     except FileNotFoundError:
         logger.error(f"Couldnt open file '{file_path}' cause it couldnt be found")
@@ -28,6 +28,19 @@ arguments = {
                 "metavar": ["order_name", "fetch_method", "processing_type", "insert_method"],
                 "nargs": 4
             },
+        "CreateRecomputeOrder":
+            {
+                "type": "str",
+                "help": "Creates an update order that only computes the nodes of a changed descriptor again, from the raw chunks of an earlier order",
+                "metavar": ["order_name", "source_order", "old_descriptor", "new_descriptor", "insert_method"],
+                "nargs": 5
+            },
+        "later_orders":
+            {
+                "type": "str",
+                "nargs": "+",
+                "help": "All work orders of the same graph that were inserted after the source order of --CreateRecomputeOrder, oldest first, their records replace the older versions"
+            },
         "CreateOrderPara":
             {
                 "action": "store_true",
@@ -46,12 +59,12 @@ arguments = {
         "process":
             {
                 "type": "str",
-                "help": "Processing type, either 'insert' or 'update'"
+                "help": "Processing type, either 'insert', 'update' or 'swap', swap loads into a staging graph and replaces the named graph with it"
             },
         "insert":
             {
                 "type": "str",
-                "help": "method of inserting into triplestore: 'isql', 'obdc' or 'sparql'"
+                "help": "method of inserting into triplestore: 'isql', 'odbc', 'gsp' or 'sparql'"
             },
         "FetchSolrOrder":
             {
@@ -144,6 +157,128 @@ arguments = {
                 "help": "Number of parallel processes used, should be <= cpu_count",
                 "default": 1
             },
+        "record_time_budget":
+            {
+                "type": "float",
+                "help": "Maximum time in seconds a single record may take while processing, slower records are written to a quarantine file"
+            },
+        "rdf_writer":
+            {
+                "type": "str",
+                "help": "How processed triples are written, 'turtle' and 'nt' stream each record to the file, 'rdflib' builds a graph of the entire chunk first, 'termdict' is a compact binary format the insert steps read without rdf parsing",
+                "choices": ["turtle", "nt", "rdflib", "termdict"]
+            },
+        "payload_size":
+            {
+                "type": "int",
+                "help": "If set, processing also writes ready sparql INSERT DATA blocks of at most this many bytes that the sparql insert sends without parsing"
+            },
+        "delete_batch_size":
+            {
+                "type": "int",
+                "help": "Number of subjects removed by one delete request of an update order, the sparql delete adapts it to the speed of the endpoint"
+            },
+        "fused_update":
+            {
+                "action": "store_true",
+                "default": None,
+                "help": "Update orders delete and insert each batch of subjects in one request instead of two separate steps"
+            },
+        "subject_registry":
+            {
+                "type": "str",
+                "help": "Folder of the per graph subject registries, deletes of update orders skip subjects that were never inserted, needs --SeedSubjectRegistry once"
+            },
+        "delta_store":
+            {
+                "type": "str",
+                "help": "Folder of the per graph delta stores, update orders then only send triples that actually changed since the last load"
+            },
+        "delta_triples":
+            {
+                "action": "store_true",
+                "default": None,
+                "help": "Keep the loaded triples in the delta store and not only their hash, changed records lose single triples instead of being replaced entirely"
+            },
+        "record_index":
+            {
+                "type": "str",
+                "help": "Folder of the per graph record indices, update orders skip records that did not change since they were loaded, empty it when the graph is cleared"
+            },
+        "keep_raw_chunks":
+            {
+                "action": "store_true",
+                "default": None,
+                "help": "The clean up keeps the downloaded raw chunks so later descriptor changes can be applied with --CreateRecomputeOrder"
+            },
+        "insert_processes":
+            {
+                "type": "int",
+                "help": "Number of parallel processes for the insert and delete steps, each works on its own chunks, default 1"
+            },
+        "bulk_loaders":
+            {
+                "type": "int",
+                "help": "isql inserts register all chunks first and load them with that many parallel rdf_loader_run followed by a single checkpoint"
+            },
+        "insert_batch_bytes":
+            {
+                "type": "int",
+                "help": "Size in bytes of the first sparql insert requests, the size adapts to the speed of the endpoint afterwards, default 262144"
+            },
+        "sparql_concurrency":
+            {
+                "type": "int",
+                "help": "Number of sparql insert requests that are under way at the same time, default 1"
+            },
+        "swap_min_ratio":
+            {
+                "type": "float",
+                "help": "Share of the processed triples that must have arrived in the staging graph before a swap order replaces the named graph, default 0.9"
+            },
+        "request_retries":
+            {
+                "type": "int",
+                "help": "Retries of a request to solr or a triplestore after a connection error or a 429, 502, 503 or 504, the wait in between grows exponentially, default 5"
+            },
+        "request_backoff":
+            {
+                "type": "float",
+                "help": "Wait in seconds before the first retry of a request, doubled for each further retry and randomised, default 1"
+            },
+        "request_rate":
+            {
+                "type": "float",
+                "help": "Maximum requests per second to one endpoint and process, in the config file also a dictionary with 'host:port' as keys, default no limit"
+            },
+        "endpoint_concurrency":
+            {
+                "type": "int",
+                "help": "Maximum requests at the same time to one endpoint and process, in the config file also a dictionary with 'host:port' as keys, default no limit"
+            },
+        "request_timeout":
+            {
+                "type": "float",
+                "help": "Seconds to wait for the connection to solr or a triplestore and for each answer, a timeout is retried like a connection error, 0 waits for ever, default 300"
+            },
+        "SeedSubjectRegistry":
+            {
+                "action": "store_true",
+                "help": "Creates the subject registry of a graph from the triplestore, needs parameters: --subject_registry, --sparql_endpoint, --named_graph"
+            },
+        "compression":
+            {
+                "type": "str",
+                "help": "Compression of the chunk and rdf files of a newly created work order, zstd needs the package 'zstandard'",
+                "choices": ["gzip", "zstd"]
+            },
+        "ReplayQuarantine":
+            {
+                "type": "str",
+                "help": "Processes all records of a quarantine file again with debug output, uses --record_time_budget if given",
+                "metavar": ["quarantine_file", "graph/subject", "spcht_descriptor"],
+                "nargs": 3
+            },
         "InsertISQLOrder":
             {
                 "type": "str",
@@ -166,6 +301,27 @@ arguments = {
                 "type": "str",
                 "help": "File path to the OpenLink Virtuoso isql executable, usually 'isql-v' or 'isql-v.exe"
             },
+        "odbc_dsn":
+            {
+                "type": "str",
+                "help": "Data source name of the virtuoso odbc driver or a complete connection string, used by the insert method 'odbc'"
+            },
+        "odbc_connections":
+            {
+                "type": "int",
+                "help": "Number of pooled odbc connections, that many chunks are inserted at the same time, default 2"
+            },
+        "gsp_endpoint":
+            {
+                "type": "str",
+                "help": "URL of a sparql 1.1 graph store protocol endpoint, used by the insert method 'gsp', for virtuoso usually ends with /sparql-graph-crud-auth"
+            },
+        "gsp_gzip":
+            {
+                "action": "store_true",
+                "default": None,
+                "help": "The insert method 'gsp' sends gzip compressed files as they are with Content-Encoding gzip, the endpoint has to support it"
+            },
         "virt_folder":
             {
                 "type": "str",
@@ -244,7 +400,7 @@ arguments = {
         "CompileSpcht":
             {
                 "type": "str",
-                "help": "Inserts all includes of a spcht descriptor in one file, resolving all include relations",
+                "help": "Inserts all includes of a spcht descriptor in one file, resolving all include relations, a FILEPATH ending in '.spchtc' creates a json artifact that is loaded instead of the descriptor while its input files stay unchanged",
                 "metavar": ["SPCHT_FILE", "FILEPATH"],
                 "nargs": 2
             },
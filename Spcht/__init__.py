@@ -1,11 +1,24 @@
+import importlib
+
 from .Core import SpchtErrors, SpchtCore, SpchtUtility, WorkOrder
 from .Utils import local_tools, main_arguments, SpchtConstants
-try:
-    from .Gui import SpchtBuilder, SpchtCheckerGui_interface, SpchtCheckerGui_i18n
-except ModuleNotFoundError as e:
-    pass  # Pyside2 and appdirs for GUI
-
-try:
-    from .foliotools import foliotools
-except ModuleNotFoundError as e:
-    pass  # pytz needed for foliotools
+
+# ? the gui (PySide2 and appdirs) and the foliotools (pytz) are heavy and optional, they only get imported when
+# ? accessed as attribute of the package, a missing dependency results in the attribute simply not being there
+_LAZY_MODULES = {
+    "SpchtBuilder": ".Gui.SpchtBuilder",
+    "SpchtCheckerGui_interface": ".Gui.SpchtCheckerGui_interface",
+    "SpchtCheckerGui_i18n": ".Gui.SpchtCheckerGui_i18n",
+    "foliotools": ".foliotools.foliotools"
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_MODULES:
+        try:
+            module = importlib.import_module(_LAZY_MODULES[name], __name__)
+        except ModuleNotFoundError as e:
+            raise AttributeError(f"module '{__name__}' has no attribute '{name}' ({e})") from e
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -96,10 +96,10 @@ def location_update(location_hashes, opening_hashes, location_objects, opening_o
     # ? be only one key for opening_hour hashes but this method would even work with more, no clue how 'expensive'
     # ? this is but it should not matter a lot
 
+    stale_nodes = [node for hash_key in changed for node in location_objects[hash_key]]
+    sparql_delete_node_plus1(secret.named_graph, stale_nodes, secret.sparql_url, secret.triple_user, secret.triple_password)
+    sparql_delete_node_plus1(secret.named_graph, "?s", secret.sparql_url, secret.triple_user, secret.triple_password, sobject=stale_nodes)
     for hash_key in changed:
-        for node in location_objects[hash_key]:
-            sparql_delete_node_plus1(secret.named_graph, node, secret.sparql_url, secret.triple_user, secret.triple_password)
-            sparql_delete_node_plus1(secret.named_graph, "?s", secret.sparql_url, secret.triple_user, secret.triple_password, sobject=node)
         if not changed[hash_key]:  #delete disappeard entries
             del location_objects[hash_key]
             del location_hashes[hash_key]
@@ -139,15 +139,13 @@ def opening_update(opening_hashes: dict, opening_object: dict):
     opening_hashes.update({k: v['hash'] for k, v in changed.items()})
 
     # ! discard processing
-    for key in changed.keys():
-        sobject = opening_object[key]
-        status, discard = sparql_delete_node_plus1(secret.named_graph,
-                                                   sobject,
-                                                   secret.sparql_url,
-                                                   secret.triple_user,
-                                                   secret.triple_password,
-                                                   "<https://schema.org/openingHoursSpecification>"
-                                                   )
+    sparql_delete_node_plus1(secret.named_graph,
+                             [opening_object[key] for key in changed.keys()],
+                             secret.sparql_url,
+                             secret.triple_user,
+                             secret.triple_password,
+                             "<https://schema.org/openingHoursSpecification>"
+                             )
 
     if part4_work_order(all_triples):
         return [key for key in changed.keys()]
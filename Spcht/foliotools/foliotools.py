@@ -32,7 +32,7 @@ from datetime import datetime
 from string import Template
 
 # import local modules
-from Spcht.Utils.local_tools import sparqlQuery
+from Spcht.Utils.local_tools import sparqlQuery, sparql_delete_values
 import foliotools.folio2triplestore_config as secret
 
 logger = logging.getLogger(__name__)
@@ -266,6 +266,19 @@ def create_location_node(location: dict, inst: dict, lib: dict):
 
 
 def sparql_delete_node_plus1(named_graph, subject, sparql_endpoint, sparql_user, sparql_pw, predicate = "?p", sobject = "?o"):
+    """
+    Deletes all triples of a node, either subject or object can also be a list of nodes, those get deleted in batches
+    with as few requests as possible
+
+    :return: True if the deletion went through
+    :rtype: bool
+    """
+    if isinstance(subject, (list, tuple, set)):
+        return sparql_delete_values(subject, sparql_endpoint, named_graph, "?s", f"?s {predicate} {sobject}",
+                                    auth=sparql_user, pwd=sparql_pw)
+    if isinstance(sobject, (list, tuple, set)):
+        return sparql_delete_values(sobject, sparql_endpoint, named_graph, "?o", f"{subject} {predicate} ?o",
+                                    auth=sparql_user, pwd=sparql_pw)
     query = f"""DELETE 
                 {{ GRAPH <{named_graph}>
                     {{ {subject} {predicate} {sobject} }}
@@ -33,13 +33,9 @@ import Spcht.Core.WorkOrder as WorkOrder
 import Spcht.Utils.local_tools as local_tools
 from Spcht.Utils.local_tools import load_from_json
 from Spcht.Utils.main_arguments import arguments
+from Spcht.Utils import SpchtConstants
 from Spcht.Core.SpchtCore import Spcht
-
-try:
-    from termcolor import colored  # only needed for debug print
-except ModuleNotFoundError:
-    def colored(text, *args, **kwargs):
-        return text  # throws args away returns non colored text
+from Spcht.Utils.local_tools import colored
 
 __VERSION__ = "0.8"
 
@@ -59,7 +55,14 @@ def load_config(file_path="config.json"):
     global PARA
     expected_settings = ("solr_url", "query", "total_rows", "chunk_size", "spcht_path", "save_folder",
                          "subject", "named_graph", "isql_path", "user", "password", "isql_port", "virt_folder",
-                         "processes", "sparql_endpoint", "spcht_descriptor", "max_age")
+                         "processes", "sparql_endpoint", "spcht_descriptor", "max_age", "record_time_budget",
+                         "rdf_writer", "compression", "payload_size",
+                         "delete_batch_size", "fused_update", "subject_registry", "delta_store", "delta_triples",
+                         "record_index", "keep_raw_chunks", "swap_min_ratio",
+                         "insert_batch_bytes", "sparql_concurrency", "insert_processes",
+                         "bulk_loaders", "odbc_dsn", "odbc_connections", "gsp_endpoint", "gsp_gzip",
+                         "request_retries", "request_backoff", "request_rate", "endpoint_concurrency", "request_timeout",
+                         "later_orders")
     config_dict = load_from_json(file_path)
     if not config_dict:
         return False
@@ -101,7 +104,13 @@ if __name__ == "__main__":
 
     simple_parameters = ["work_order_file", "solr_url", "query", "chunk_size", "total_rows", "spcht_descriptor", "save_folder",
                          "subject", "named_graph", "isql_path", "user", "password", "virt_folder", "sparql_endpoint", "force",
-                         "debug"]
+                         "debug", "record_time_budget", "rdf_writer", "compression",
+                         "payload_size", "delete_batch_size", "fused_update", "subject_registry", "delta_store",
+                         "delta_triples", "record_index", "keep_raw_chunks", "swap_min_ratio",
+                         "insert_batch_bytes", "sparql_concurrency", "insert_processes",
+                         "bulk_loaders", "odbc_dsn", "odbc_connections", "gsp_endpoint", "gsp_gzip",
+                         "request_retries", "request_backoff", "request_rate", "endpoint_concurrency", "request_timeout",
+                         "later_orders"]
     default_parameters = ["chunk_size", "total_rows", "isql_port", "save_folder"]  # ? default would overwrite config file settings
 
     for arg in vars(args):
@@ -110,12 +119,20 @@ if __name__ == "__main__":
                 pass  # i was simply to lazy to write the "not" variant of this
             else:
                 PARA[arg] = getattr(args, arg)
+    local_tools.configure_requests(**PARA)
 
     if args.CreateOrder:
         par = args.CreateOrder
-        order_name = WorkOrder.CreateWorkOrder(par[0], par[1], par[2], par[3])
+        order_name = WorkOrder.CreateWorkOrder(par[0], par[1], par[2], par[3], compression=PARA.get('compression'))
         print(f"Created Order '{order_name}'")
 
+    if args.CreateRecomputeOrder:
+        par = args.CreateRecomputeOrder
+        order_name = WorkOrder.CreateRecomputeOrder(par[0], par[1], par[2], par[3], par[4],
+                                                    later_orders=PARA.get('later_orders'))
+        if order_name:
+            print(f"Created Order '{order_name}', continue it with --spcht_descriptor {par[3]}")
+
     # ! FETCH OPERATION
     if args.FetchSolrOrder:
         par = args.FetchSolrOrder
@@ -146,7 +163,10 @@ if __name__ == "__main__":
         if not heron:
             print("Loading of Spcht failed, aborting")
             exit(1)
-        status = WorkOrder.FulfillProcessingOrder(par[0], par[1], heron)
+        status = WorkOrder.FulfillProcessingOrder(par[0], par[1], heron, record_time_budget=PARA.get('record_time_budget'),
+                                                  rdf_writer=PARA.get('rdf_writer'), payload_size=PARA.get('payload_size'),
+                                                  named_graph=PARA.get('named_graph'), delta_store=PARA.get('delta_store'),
+                                                  delta_triples=PARA.get('delta_triples'), record_index=PARA.get('record_index'))
         if not status:
             print("Something went wrong, check log file for details")
 
@@ -160,7 +180,11 @@ if __name__ == "__main__":
                     print(f"\t{colored(avery, attrs=['bold'])} - {colored(arguments[avery]['help'], 'green')}")
                 exit(1)
         crow = Spcht(PARA['spcht_descriptor'])
-        status = WorkOrder.FulfillProcessingOrder(PARA['work_order_file'], PARA['subject'], crow)
+        status = WorkOrder.FulfillProcessingOrder(PARA['work_order_file'], PARA['subject'], crow,
+                                                  record_time_budget=PARA.get('record_time_budget'),
+                                                  rdf_writer=PARA.get('rdf_writer'), payload_size=PARA.get('payload_size'),
+                                                  named_graph=PARA.get('named_graph'), delta_store=PARA.get('delta_store'),
+                                                  delta_triples=PARA.get('delta_triples'), record_index=PARA.get('record_index'))
         if not status:
             print("Something went wrong, check log file for details")
 
@@ -170,7 +194,11 @@ if __name__ == "__main__":
         if dove:
             print("Spcht loading failed")
             exit(1)
-        WorkOrder.ProcessOrderMultiCore(par[0], graph=par[1], spcht_object=dove, processes=int(par[3]))
+        WorkOrder.ProcessOrderMultiCore(par[0], graph=par[1], spcht_object=dove, processes=int(par[3]),
+                                        record_time_budget=PARA.get('record_time_budget'),
+                                        rdf_writer=PARA.get('rdf_writer'), payload_size=PARA.get('payload_size'),
+                                        named_graph=PARA.get('named_graph'), delta_store=PARA.get('delta_store'),
+                                        delta_triples=PARA.get('delta_triples'), record_index=PARA.get('record_index'))
         # * multi does not give any process update, it just happens..or does not, it might print something to console
 
     if args.SpchtProcessingMultiPara:
@@ -183,7 +211,11 @@ if __name__ == "__main__":
                     print(f"\t{colored(avery, attrs=['bold'])} - {colored(arguments[avery]['help'], 'green')}")
                 exit(1)
         eagle = Spcht(PARA['spcht_descriptor'])
-        WorkOrder.ProcessOrderMultiCore(PARA['work_order_file'], graph=PARA['subject'], spcht_object=eagle, processes=PARA['processes'])
+        WorkOrder.ProcessOrderMultiCore(PARA['work_order_file'], graph=PARA['subject'], spcht_object=eagle, processes=PARA['processes'],
+                                        record_time_budget=PARA.get('record_time_budget'),
+                                        rdf_writer=PARA.get('rdf_writer'), payload_size=PARA.get('payload_size'),
+                                        named_graph=PARA.get('named_graph'), delta_store=PARA.get('delta_store'),
+                                        delta_triples=PARA.get('delta_triples'), record_index=PARA.get('record_index'))
 
     # ! inserting operation
 
@@ -275,13 +307,13 @@ if __name__ == "__main__":
             print(colored("Only fetch method 'solr' is allowed", "red"))
             exit(1)
         # * Processing Type
-        if par[2].lower() == "insert" or par[2].lower() == "update":
+        if par[2].lower() in ("insert", "update", "swap"):
             dynamic_requirements.append("spcht_descriptor")
             dynamic_requirements.append("subject")
             if par[2].lower() == "update":
                 dynamic_requirements.append("max_age")
         else:
-            print(colored("Only processing types 'update' and 'insert' are allowed"))
+            print(colored("Only processing types 'update', 'insert' and 'swap' are allowed"))
         if par[2].lower() == "update":
             dynamic_requirements.append("sparql_endpoint")
             dynamic_requirements.append("user")
@@ -299,8 +331,22 @@ if __name__ == "__main__":
             dynamic_requirements.append("password")
             dynamic_requirements.append("named_graph")
             dynamic_requirements.append("virt_folder")
+        elif par[3].lower() == 'odbc':
+            dynamic_requirements.append("odbc_dsn")
+            dynamic_requirements.append("user")
+            dynamic_requirements.append("password")
+            dynamic_requirements.append("named_graph")
+            if par[2].lower() == "swap":  # ? the staging graph is prepared and swapped over sparql
+                dynamic_requirements.append("sparql_endpoint")
+        elif par[3].lower() == 'gsp':
+            dynamic_requirements.append("gsp_endpoint")
+            dynamic_requirements.append("named_graph")
+            if par[2].lower() in ("update", "swap"):  # ? deletes and the graph swap run over sparql
+                dynamic_requirements.append("sparql_endpoint")
+                dynamic_requirements.append("user")
+                dynamic_requirements.append("password")
         else:
-            print(colored("Only insert methods 'sparql' and 'isql' are allowed"))
+            print(colored("Only insert methods 'sparql', 'isql', 'odbc' and 'gsp' are allowed"))
         # * delete duplicates
         dynamic_requirements = list(set(dynamic_requirements))
         for each in dynamic_requirements:
@@ -323,7 +369,7 @@ if __name__ == "__main__":
         PARA['spcht_object'] = seagull
         try:
             old_res = 0
-            work_order = WorkOrder.CreateWorkOrder(par[0], par[1], par[2], par[3])
+            work_order = WorkOrder.CreateWorkOrder(par[0], par[1], par[2], par[3], compression=PARA.get('compression'))
             print("Starting new FullOrder, this might take a long while, see log and worker file for progress")
             print(f"Work order file: '{work_order}'")
             for i in range(0, 6):
@@ -360,6 +406,29 @@ if __name__ == "__main__":
         if not status:
             print("Given work order file path seems to be wrong")
 
+    if args.ReplayQuarantine:
+        par = args.ReplayQuarantine
+        kauz = Spcht(par[2])
+        if not kauz:
+            print("Loading of Spcht failed, aborting")
+            exit(1)
+        for each in WorkOrder.ReplayQuarantine(par[0], par[1], kauz, PARA.get('record_time_budget')):
+            print(f"{each['id']:<24}{each['seconds']:>10}s {each['triples']:>6} triples - {each['outcome']}")
+
+    if args.SeedSubjectRegistry:
+        expected = ("subject_registry", "sparql_endpoint", "named_graph")
+        missing = WorkOrder.CheckForParameters(expected, **PARA)
+        if missing:
+            print("SeedSubjectRegistry - registering all subjects of a graph")
+            print("All parameters have to loaded either by config file or manually as parameter")
+            for avery in missing:
+                print(f"\t{colored(avery, attrs=['bold'])} - {colored(arguments[avery]['help'], 'green')}")
+            exit(1)
+        if WorkOrder.SeedSubjectRegistry(**PARA):
+            print("Subject registry seeded, update orders can now skip deletes of new subjects")
+        else:
+            print("Seeding of the subject registry failed, check log files for details")
+
     if args.CleanUp:
         if WorkOrder.CleanUpWorkOrder(args.CleanUp, **PARA):
             print("Clean up sequence finished successfully")
@@ -390,8 +459,15 @@ if __name__ == "__main__":
         if args.debug:
             debugmode = True
         sperber = Spcht(args.CompileSpcht[0], debug=debugmode)
-        sperber.export_full_descriptor(args.CompileSpcht[1])
-        print(colored("Succesfully compiled spcht, file:", "cyan"), args.CompileSpcht[1])
+        if args.CompileSpcht[1].endswith(SpchtConstants.COMPILED_SUFFIX):
+            # ? json artifact that gets loaded instead of the descriptor as long as no input file changes
+            status = sperber.export_compiled_descriptor(args.CompileSpcht[1])
+        else:
+            status = sperber.export_full_descriptor(args.CompileSpcht[1])
+        if status is False:
+            print("Compiling of the spcht failed, see log for details")
+        else:
+            print(colored("Succesfully compiled spcht, file:", "cyan"), args.CompileSpcht[1])
 
     if args.CheckSpcht:
         debugmode = False
@@ -74,6 +74,9 @@ with open("README.md", "r") as readme:
         extras_require={"dev": [
                                 "termcolor"
                                 ],
+                        "regex": [
+                                "regex>=2021.8.3"
+                                ],
                         "gui": [
                                 "pyside2",
                                 "appdirs"
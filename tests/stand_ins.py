@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2022 by Leipzig University Library, http://ub.uni-leipzig.de
+#                   JP Kanter, <kanter@ub.uni-leipzig.de>
+#
+# This file is part of the Spcht.
+#
+# This program is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Spcht.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+stand-ins for the servers the work orders talk to, the tests run without a virtuoso, a solr or a graph store
+"""
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+
+class StandInCase(unittest.TestCase):
+    """
+    Base of the tests that need files and fake servers, every test gets a fresh folder that is removed afterwards
+    """
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.folder = temp_dir.name
+
+    def fake_isql(self) -> str:
+        # ? stands in for virtuoso's isql, answers the marker select and reports an error for statements with FAIL, every
+        # ? statement is appended to statements.log next to it. The bulk loader's load list is kept in load_list.json,
+        # ? shared by all running fakes, rdf_loader_run fails every file with 'broken' in its name
+        isql_path = os.path.join(self.folder, "isql")
+        with open(isql_path, "w") as isql_file:
+            isql_file.write(f"""#!{sys.executable}
+import fcntl, json, os, re, sys
+folder = os.path.dirname(sys.argv[0])
+state_file = os.path.join(folder, "load_list.json")
+print("started with", " ".join(sys.argv[1:]), flush=True)
+for line in sys.stdin:
+    if line.startswith("EXIT"):
+        break
+    if not line.startswith("SELECT '"):
+        with open(os.path.join(folder, "statements.log"), "a") as log:
+            log.write(line)
+    if "FAIL" in line:
+        print("*** Error 37000: [Virtuoso Driver][Virtuoso Server]SQ074: Line 1: syntax error", flush=True)
+    with open(state_file + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        files = json.load(open(state_file)) if os.path.exists(state_file) else {{}}
+        if line.startswith("DELETE FROM DB.DBA.load_list"):
+            for each in re.findall(r"'(.*?)'", line):
+                files.pop(each, None)
+        added = re.match(r"ld_add\\('(.*?)', '(.*?)'\\);", line)
+        if added:
+            files[added.group(1)] = [0, None]
+        if line.startswith("rdf_loader_run"):
+            for name, entry in files.items():
+                if entry[0] == 0:
+                    files[name] = [2, "37000 syntax error" if "broken" in name else None]
+        if line.startswith("SELECT concat"):
+            for name, (status, error) in files.items():  # ? padded to the column width like isql does
+                print(f"SPCHT_LL|{{status}}|{{error or ''}}|{{name}}".ljust(250), flush=True)
+        json.dump(files, open(state_file, "w"))
+    marker = re.match(r"SELECT '(.*)';", line)
+    print(marker.group(1) if marker else "Done. -- 1 msec.", flush=True)
+""")
+        os.chmod(isql_path, 0o755)
+        return isql_path
+
+    def stand_in_server(self, answer) -> str:
+        """
+        Starts a local http server that lives as long as the test, every request is handed to answer
+
+        :param answer: function(method, path, headers, body) that returns (status code, headers, body) of the response
+        :return: the base url of the server, without a trailing slash
+        :rtype: str
+        """
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def respond(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, headers, content = answer(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = respond
+
+            def log_message(self, *args):
+                pass
+
+        class Server(http.server.ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                if not isinstance(sys.exc_info()[1], ConnectionError):  # ? clients that ran into their timeout
+                    super().handle_error(request, client_address)
+
+        server = Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2022 by Leipzig University Library, http://ub.uni-leipzig.de
+#                   JP Kanter, <kanter@ub.uni-leipzig.de>
+#
+# This file is part of the Spcht.
+#
+# This program is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Spcht.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+the cli and the cron jobs import the core modules on every call, the heavy libraries should only be loaded by the
+functions that actually use them, each check runs in a fresh interpreter as this one has already everything loaded
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ("rdflib", "pymarc", "jsonschema", "requests", "dateutil", "termcolor", "regex", "PySide2", "pytz")
+# ? wall clock time depends on the machine, the budget in seconds is only checked if given in the environment
+IMPORT_BUDGET = float(os.environ.get("SPCHT_IMPORT_BUDGET", 0)) or None
+
+
+def fresh_import(*modules: str) -> dict:
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+for each in {modules!r}:
+    __import__(each)
+duration = time.perf_counter() - start
+print(json.dumps({{"duration": duration, "loaded": [x for x in {HEAVY_MODULES!r} if x in sys.modules]}}))
+"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(x for x in sys.path if x)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    def test_core_imports_stay_light(self):
+        for module in ("Spcht.Core.WorkOrder", "Spcht.Core.SpchtCore", "Spcht.Utils.local_tools"):
+            with self.subTest(module):
+                report = fresh_import(module)
+                self.assertEqual([], report['loaded'])
+                if IMPORT_BUDGET:
+                    self.assertLess(report['duration'], IMPORT_BUDGET)
+
+    def test_package_import_stays_light(self):
+        report = fresh_import("Spcht")
+        self.assertEqual([], report['loaded'])
+        if IMPORT_BUDGET:
+            self.assertLess(report['duration'], IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright 2022 by Leipzig University Library, http://ub.uni-leipzig.de
+#                   JP Kanter, <kanter@ub.uni-leipzig.de>
+#
+# This file is part of the Spcht.
+#
+# This program is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Spcht.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+import concurrent.futures
+import datetime
+import email.utils
+import io
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+import unittest
+import unittest.mock
+
+import Spcht.Core.SpchtErrors as SpchtErrors
+import Spcht.Utils.local_tools as local_tools
+from stand_ins import StandInCase
+
+
+class TestLocalTools(StandInCase):
+
+    def test_open_file_compressed(self):
+        records = [{"id": "1", "title": "Über"}]
+        for suffix in (".gz", ".zst", ""):
+            if suffix == ".zst" and importlib.util.find_spec("zstandard") is None:
+                continue
+            with self.subTest(suffix or "plain"):
+                file_path = os.path.join(self.folder, f"chunk.json{suffix}")
+                with local_tools.open_file(file_path, "w") as chunk:
+                    json.dump(records, chunk)
+                self.assertEqual(records, local_tools.load_from_json(file_path))
+                self.assertEqual(os.path.join(self.folder, "chunk.json"), local_tools.strip_compression(file_path))
+
+    def test_sparql_delete_values_adapts(self):
+        requests = []
+
+        def fake_query(query, *args, **kwargs):
+            requests.append(query.count("<"))
+            if len(requests) == 2:  # ? the second request is too much for the server
+                return False, local_tools.SparqlFailure("rejected", 500, "SR325: transaction log is full")
+            return True, ""
+
+        nodes = [f"<https://example.org/{i}>" for i in range(100)]
+        with unittest.mock.patch.object(local_tools, "sparqlQuery", fake_query):
+            self.assertTrue(local_tools.sparql_delete_values(nodes, "http://localhost/sparql", "g", batch_size=10))
+        # 1 graph + 10 nodes, doubled, failed and halved to 10 again, then growing
+        self.assertEqual([11, 21, 11, 21, 41, 21], requests)
+        requests.clear()
+        dead = unittest.mock.Mock(return_value=(False, local_tools.SparqlFailure("unreachable", None, "refused")))
+        with unittest.mock.patch.object(local_tools, "sparqlQuery", dead):
+            self.assertFalse(local_tools.sparql_delete_values(nodes, "http://localhost/sparql", "g", batch_size=10))
+        self.assertEqual(1, dead.call_count)  # ? no splitting for a server that is not there
+
+    def test_sparql_insert_data(self):
+        accepted, rejected, lock = [], [], threading.Lock()
+
+        def fake_query(query, *args, **kwargs):
+            lines = re.findall(r"<https://example.org/(\d+)>", query)
+            ok = len(lines) <= 25 and "13" not in lines  # ? the endpoint refuses big requests and one bad triple
+            with lock:
+                (accepted if ok else rejected).append(lines)
+            return ok, "" if ok else local_tools.SparqlFailure("rejected", 400, "SP030: syntax error")
+
+        lines = [f"<https://example.org/{i}> <https://example.org/p> \"{i:05d}\" .\n" for i in range(200) if i != 13]
+        size = len(lines[0].encode("utf-8"))
+        with unittest.mock.patch.object(local_tools, "sparqlQuery", fake_query):
+            self.assertTrue(local_tools.sparql_insert_data(lines, "http://localhost/sparql", "g", batch_bytes=10 * size,
+                                                           concurrency=4))
+            self.assertEqual(10, len(accepted[0]))  # ? bounded by bytes, growing afterwards as the endpoint is fast
+            self.assertGreater(max(len(x) for x in accepted), 10)
+            self.assertTrue(rejected)  # ? the grown batches were split in half again
+            self.assertEqual(sorted(x.split()[0] for x in lines), sorted(f"<https://example.org/{x}>" for y in accepted for x in y))
+            rejected.clear()
+            bad = [f"<https://example.org/{i}> <https://example.org/p> \"{i:05d}\" .\n" for i in range(10, 20)]
+            self.assertFalse(local_tools.sparql_insert_data(bad, "http://localhost/sparql", "g", batch_bytes=4 * size))
+            self.assertEqual(["13"], rejected[-1])
+        for reason, code in (("unreachable", None), ("denied", 401), ("unavailable", 503)):
+            failing = unittest.mock.Mock(return_value=(False, local_tools.SparqlFailure(reason, code, "")))
+            with self.subTest(reason), unittest.mock.patch.object(local_tools, "sparqlQuery", failing):
+                self.assertFalse(local_tools.sparql_insert_data(lines, "http://localhost/sparql", "g",
+                                                                batch_bytes=10 * size))
+                self.assertEqual(1, failing.call_count)  # ? aborted right away instead of splitting down to triples
+
+    def test_isql_session(self):
+        isql_path = self.fake_isql()
+        with local_tools.IsqlSession(isql_path, 1111, "dba", "dba") as isql:
+            first = isql.execute(["sparql CLEAR GRAPH <http://example.org/>;", "checkpoint;"])
+            self.assertEqual(3, len(first))  # the greeting and two statements, one process for everything
+            self.assertTrue(first[0].startswith("started with 1111 dba dba"))
+            with self.assertRaises(SpchtErrors.IsqlError):
+                isql.execute(["FAIL;"])
+            self.assertEqual(["Done. -- 1 msec.\n"], isql.execute(["checkpoint;"]))
+        self.assertIsNone(isql.process)
+
+    def fresh_request_policies(self, **settings):
+        # ? the policies are process wide, the test gets its own and the old ones come back afterwards
+        for patch in (unittest.mock.patch.dict(local_tools._request_settings),
+                      unittest.mock.patch.dict(local_tools._endpoint_policies, clear=True)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        local_tools.configure_requests(**settings)
+
+    def test_request_retry_and_rate(self):
+        # ? the stand-in is overloaded for the first two requests and counts how many are under way at once
+        seen, lock, state = [], threading.Lock(), {"running": 0, "peak": 0}
+
+        def overloaded(method, path, headers, body):
+            with lock:
+                seen.append(body if method == "POST" else path.encode("utf-8"))
+                number = len(seen)
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.05)
+            with lock:
+                state['running'] -= 1
+            return (503 if number <= 2 else 200), ({"Retry-After": "0"} if number == 2 else {}), b"{}"
+
+        url = self.stand_in_server(overloaded)
+        self.fresh_request_policies(request_retries=3, request_backoff=0.01, endpoint_concurrency=2)
+        # ? the body of the third attempt has to be the whole document again
+        self.assertTrue(local_tools.gsp_post(io.BytesIO(b"<a> <b> <c> ."), f"{url}/gsp", "g", {}))
+        self.assertEqual([b"<a> <b> <c> ."] * 3, seen)
+        with concurrent.futures.ThreadPoolExecutor(6) as pool:
+            results = list(pool.map(lambda x: local_tools.sparqlQuery(f"ASK {{ <{x}> ?p ?o }}", f"{url}/sparql"),
+                                    range(6)))
+        self.assertEqual([(True, {})] * 6, results)
+        self.assertEqual(2, state['peak'])
+        self.assertFalse(local_tools.sparqlQuery("ASK {}", "http://127.0.0.1:9/sparql")[0])  # ? nobody there
+        policy = local_tools.EndpointPolicy(rate=50)
+        zero_time = time.monotonic()
+        for _ in range(100):
+            policy.take()
+        self.assertGreater(time.monotonic() - zero_time, 0.9)  # ? a burst of 50 and 50 more at 50 per second
+        self.assertEqual(7, local_tools.EndpointPolicy(backoff=5).delay(3, retry_after="7"))
+        later = email.utils.format_datetime(datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30),
+                                            usegmt=True)
+        self.assertTrue(25 < local_tools.EndpointPolicy(backoff=5).delay(3, retry_after=later) <= 30)
+        self.assertEqual(0, local_tools.EndpointPolicy().delay(0, retry_after="Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertTrue(0 <= local_tools.EndpointPolicy(backoff=0.5).delay(0, retry_after="soon") <= 0.5)
+        self.assertTrue(all(0 <= local_tools.EndpointPolicy(backoff=5).delay(30) <= local_tools.MAX_BACKOFF
+                            for _ in range(20)))
+
+    def test_request_timeout(self):
+        # ? the stand-in keeps the first request waiting longer than the timeout, the retry gets an answer
+        seen = []
+
+        def sluggish(method, path, headers, body):
+            seen.append(path)
+            if len(seen) == 1:
+                time.sleep(1)
+            return 200, {}, b"{}"
+
+        url = self.stand_in_server(sluggish)
+        self.fresh_request_policies(request_retries=1, request_backoff=0.01, request_timeout=0.2)
+        self.assertEqual((True, {}), local_tools.sparqlQuery("ASK {}", f"{url}/sparql"))
+        self.assertEqual(2, len(seen))
+        local_tools.configure_requests(request_retries=0)
+        seen.clear()
+        self.assertEqual("unreachable", local_tools.sparqlQuery("ASK {}", f"{url}/sparql")[1].reason)
+
+    def test_subject_registry(self):
+        graph = "http://example.org/graph/"
+        self.assertIsNone(local_tools.SubjectRegistry.for_graph(self.folder, graph))  # ? unseeded skips nothing
+        self.assertIsNone(local_tools.SubjectRegistry.for_graph(None, graph))
+        registry = local_tools.SubjectRegistry(local_tools.SubjectRegistry.graph_file(self.folder, graph), capacity=1000)
+        registry.update(f"<http://example.org/{i}>" for i in range(1000))
+        registry.save()
+        loaded = local_tools.SubjectRegistry.for_graph(self.folder, graph)
+        self.assertAlmostEqual(1000, len(loaded), delta=20)  # ? a false positive counts as already known
+        self.assertTrue(all(f"<http://example.org/{i}>" in loaded for i in range(1000)))
+        false_positives = sum(f"<http://example.org/new/{i}>" in loaded for i in range(10000))
+        self.assertLess(false_positives, 300)  # ~1% expected
+        # ? a second worker saving its own copy must not lose the subjects of the first one
+        other = local_tools.SubjectRegistry(registry.file_path, capacity=1000)
+        other.update(["<http://example.org/other>"])
+        other.save()
+        merged = local_tools.SubjectRegistry.load(registry.file_path)
+        self.assertIn("<http://example.org/other>", merged)
+        self.assertTrue(all(f"<http://example.org/{i}>" in merged for i in range(1000)))
+        self.assertAlmostEqual(1001, len(merged), delta=30)
+        with open(loaded.file_path, "r+b") as broken:
+            broken.truncate(40)
+        with self.assertRaises(SpchtErrors.ParsingError):
+            local_tools.SubjectRegistry.load(loaded.file_path)
+
+    def test_delta_store(self):
+        pairs = ['<http://example.org/p> "one"', '<http://example.org/p> "two"']
+        digest = local_tools.DeltaStore.subject_hash(pairs)
+        self.assertEqual(digest, local_tools.DeltaStore.subject_hash(reversed(pairs + pairs[:1])))
+        self.assertIsNone(local_tools.DeltaStore.for_graph(None, "http://example.org/graph/"))
+        with local_tools.DeltaStore.for_graph(self.folder, "http://example.org/graph/") as store:
+            self.assertEqual(2, store.commit([("<http://example.org/1>", digest, pairs),
+                                              ("<http://example.org/2>", digest, None)]))
+            store.LOOKUP_SIZE = 1  # ? forces several lookups
+            known = store.lookup(["<http://example.org/1>", "<http://example.org/2>", "<http://example.org/3>"])
+        self.assertEqual({"<http://example.org/1>": (digest, pairs), "<http://example.org/2>": (digest, None)}, known)
+
+    def test_record_index(self):
+        record = {"id": "1", "title": "Something", "author": ["A", "B"]}
+        digest = local_tools.RecordIndex.record_hash(record, "descriptor|subject")
+        self.assertEqual(digest, local_tools.RecordIndex.record_hash(dict(reversed(record.items())), "descriptor|subject"))
+        self.assertNotEqual(digest, local_tools.RecordIndex.record_hash(record, "other descriptor|subject"))
+        graph = "http://example.org/graph/"
+        with local_tools.RecordIndex.for_graph(self.folder, graph) as index:
+            self.assertIsNone(index.get("1"))
+            index.commit([("1", digest)])
+        with local_tools.RecordIndex.for_graph(self.folder, graph) as index:
+            self.assertEqual(digest, index.get("1"))
+        # ? both stores may live in the same folder
+        self.assertNotEqual(local_tools.RecordIndex.graph_file(self.folder, graph),
+                            local_tools.DeltaStore.graph_file(self.folder, graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
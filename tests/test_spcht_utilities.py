@@ -20,13 +20,22 @@
 # along with Spcht.  If not, see <http://www.gnu.org/licenses/>.
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+import io
 import json
+import os
+import tempfile
 import unittest
+import unittest.mock
 
+import Spcht.Core.SpchtCore as SpchtCore
 import Spcht.Core.SpchtUtility as SpchtUtility
+import Spcht.Core.SpchtErrors as SpchtErrors
 from Spcht.Core.SpchtCore import Spcht, SpchtThird, SpchtTriple
 from Spcht.Core.SpchtUtility import list_wrapper, insert_list_into_str, is_dictkey, list_has_elements, all_variants, \
-    match_positions, fill_var
+    match_positions, fill_var, TermDictWriter, SparqlPayloadWriter
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(SpchtUtility.__file__), "..", "SpchtSchema.json")
 
 
 class TestFunc(unittest.TestCase):
@@ -250,6 +259,211 @@ ns1:adress ns1:cat "Miau",
         computed = SpchtUtility.process2RDF([triple_1, triple_2])
         self.assertEqual(expected, computed)
 
+    def test_write_rdf_stream(self):
+        one_uri = SpchtThird("https://schema.org/adress", uri=True)
+        snd_uri = SpchtThird("https://schema.org/cat", uri=True)
+        triples = [SpchtTriple(one_uri, snd_uri, SpchtThird('say "Miau"\n', language="en")),
+                   SpchtTriple(one_uri, snd_uri, SpchtThird(42)),
+                   SpchtTriple(one_uri, snd_uri, SpchtThird(42)),
+                   SpchtTriple(one_uri, snd_uri, SpchtThird("https://schema.org/not an iri", uri=True))]
+        with self.subTest("n-triples"):
+            expected = """<https://schema.org/adress> <https://schema.org/cat> "say \\"Miau\\"\\n"@en .
+<https://schema.org/adress> <https://schema.org/cat> "42"^^<http://www.w3.org/2001/XMLSchema#integer> .
+"""
+            buffer = io.StringIO()
+            self.assertEqual(2, SpchtUtility.write_rdf_stream(triples, buffer, "nt"))
+            self.assertEqual(expected, buffer.getvalue())
+        with self.subTest("grouped turtle"):
+            expected = """<https://schema.org/adress> <https://schema.org/cat> "say \\"Miau\\"\\n"@en ;
+    <https://schema.org/cat> "42"^^<http://www.w3.org/2001/XMLSchema#integer> .
+
+"""
+            buffer = io.StringIO()
+            self.assertEqual(2, SpchtUtility.write_rdf_stream(triples, buffer, "turtle"))
+            self.assertEqual(expected, buffer.getvalue())
+
+    def test_term_dict_roundtrip(self):
+        one_uri = SpchtThird("https://schema.org/adress", uri=True)
+        snd_uri = SpchtThird("https://schema.org/cat", uri=True)
+        triples = [SpchtTriple(one_uri, snd_uri, SpchtThird('say "Miau"', language="en")),
+                   SpchtTriple(one_uri, snd_uri, SpchtThird(42)),
+                   SpchtTriple(snd_uri, snd_uri, one_uri)]
+        buffer = io.BytesIO()
+        writer = TermDictWriter(buffer)
+        self.assertEqual(3, writer.write(triples))
+        self.assertEqual(1, writer.write(triples[:1]))  # duplicates only get removed within one call
+        expected = [tuple(SpchtUtility.rdf_term(x) for x in (y.subject, y.predicate, y.sobject)) for y in triples]
+        buffer.seek(0)
+        self.assertEqual(expected + expected[:1], list(SpchtUtility.read_term_dict(buffer)))
+        with self.subTest("not a term dictionary"):
+            with self.assertRaises(SpchtErrors.ParsingError):
+                list(SpchtUtility.read_term_dict(io.BytesIO(b"<a> <b> <c> .")))
+
+    def test_sparql_payload_batches(self):
+        subject = SpchtThird("https://schema.org/adress", uri=True)
+        predicate = SpchtThird("https://schema.org/cat", uri=True)
+        triples = [SpchtTriple(subject, predicate, SpchtThird(f"Miau number {i}")) for i in range(20)]
+        buffer = io.StringIO()
+        writer = SparqlPayloadWriter(buffer, max_bytes=300)
+        self.assertEqual(20, writer.write(triples))
+        writer.flush()
+        buffer.seek(0)
+        blocks = list(SpchtUtility.read_sparql_payloads(buffer))
+        self.assertEqual(writer.batches, len(blocks))
+        self.assertTrue(all(len(x.encode("utf-8")) <= 300 for x in blocks))
+        self.assertEqual(20, sum(x.count(" .\n") for x in blocks))
+
+    @unittest.skipIf(SpchtUtility.NOREGEX, "regex module not installed")
+    def test_regex_timeout(self):
+        evil_text = "1" * 3000
+        with self.subTest("regex search without timeout"):
+            self.assertIsNotNone(SpchtUtility.regex_search(r"^1+$", evil_text, "regex", 1))
+        with self.subTest("regex search with timeout"):
+            with self.assertRaises(SpchtErrors.RegexTimeoutError):
+                SpchtUtility.regex_search(r"(\d+)*\d*[a-z]", evil_text, "regex", 0.1)
+        with self.subTest("node preprocessing with timeout"):
+            node = {"match": r"(\d+)*\d*[a-z]", "regex_engine": "regex", "regex_timeout": 0.1}
+            with self.assertRaises(SpchtErrors.RegexTimeoutError):
+                Spcht._node_preprocessing([SpchtThird(evil_text)], node)
+
+    def test_validate_regex_engine(self):
+        self.assertTrue(SpchtUtility.validate_regex(r"^\d{4}", "regex"))
+        self.assertFalse(SpchtUtility.validate_regex(r"(\d{4}", "regex"))
+        self.assertFalse(SpchtUtility.validate_regex(r"(\d{4}", "re"))
+
+    def test_compiled_descriptor(self):
+        schema = os.path.join(os.path.dirname(SpchtUtility.__file__), "..", "SpchtSchema.json")
+        with tempfile.TemporaryDirectory() as folder:
+            map_path = os.path.join(folder, "languages.json")
+            with open(map_path, "w") as map_file:
+                json.dump({"ger": "german"}, map_file)
+            descriptor = {"id_source": "dict", "id_field": "id", "nodes": [
+                {"name": "Language", "source": "dict", "field": "lang", "predicate": "http://example.org/lang",
+                 "required": "optional", "mapping_settings": {"$ref": map_path}}]}
+            descriptor_path = os.path.join(folder, "test.spcht.json")
+            with open(descriptor_path, "w") as descriptor_file:
+                json.dump(descriptor, descriptor_file)
+            original = Spcht(descriptor_path, schema_path=schema)
+            compiled = original.export_compiled_descriptor()
+            self.assertEqual(os.path.join(folder, "test.spchtc"), compiled)
+            with open(compiled) as artifact_file:
+                artifact = json.load(artifact_file)  # ? plain json, nothing that could run code on load
+            self.assertEqual(original._DESCRI, artifact['descriptor'])
+            with unittest.mock.patch.object(Spcht, "load_json", side_effect=AssertionError("not compiled")):
+                self.assertEqual(original._DESCRI, Spcht(descriptor_path, schema_path=schema)._DESCRI)
+            with self.subTest("edited artifact"):
+                artifact['descriptor']['nodes'][0]['predicate'] = "http://example.org/evil"
+                with open(compiled, "w") as artifact_file:
+                    json.dump(artifact, artifact_file)
+                self.assertFalse(Spcht(schema_path=schema)._load_compiled_descriptor(compiled))
+                self.assertEqual(original._DESCRI, Spcht(descriptor_path, schema_path=schema)._DESCRI)
+            with self.subTest("old pickled artifact"):
+                with open(compiled, "wb") as artifact_file:
+                    artifact_file.write(b"\x80\x05\x95\x00")
+                self.assertFalse(Spcht(schema_path=schema)._load_compiled_descriptor(compiled))
+            with self.subTest("changed map"):
+                original.export_compiled_descriptor()
+                with open(map_path, "w") as map_file:
+                    json.dump({"ger": "deutsch"}, map_file)
+                self.assertFalse(Spcht(schema_path=schema)._load_compiled_descriptor(compiled))
+
+    def test_referenced_maps(self):
+        with tempfile.TemporaryDirectory() as folder, unittest.mock.patch.dict(SpchtCore._REF_FILE_CACHE, clear=True):
+            map_path, joined_path = os.path.join(folder, "languages.json"), os.path.join(folder, "kinds.json")
+            with open(map_path, "w") as map_file:
+                json.dump({"ger": "german", "eng": "english"}, map_file)
+            with open(joined_path, "w") as map_file:
+                json.dump({"a": "http://example.org/a", "b": "http://example.org/b"}, map_file)
+            nodes = [{"name": "Language", "source": "dict", "field": "lang", "predicate": "http://example.org/lang",
+                      "required": "optional", "mapping_settings": {"$ref": map_path}},
+                     {"name": "Original", "source": "dict", "field": "orig", "predicate": "http://example.org/orig",
+                      "required": "optional", "mapping": {"ger": "deutsch"}, "mapping_settings": {"$ref": map_path}},
+                     {"name": "Kind", "source": "dict", "field": "title", "predicate": "http://example.org/title",
+                      "required": "optional", "joined_field": "kind", "joined_map": {"a": "http://example.org/own"},
+                      "joined_map_ref": joined_path}]
+            descriptor_path = os.path.join(folder, "test.spcht.json")
+            with open(descriptor_path, "w") as descriptor_file:
+                json.dump({"id_source": "dict", "id_field": "id", "nodes": nodes}, descriptor_file)
+            load_json = Spcht.load_json
+
+            def loads():
+                with unittest.mock.patch.object(Spcht, "load_json", autospec=True, side_effect=load_json) as reader:
+                    heron = Spcht(descriptor_path, schema_path=SCHEMA_PATH)
+                return heron, [x.args[1] for x in reader.call_args_list if x.args[1] != descriptor_path]
+
+            heron, reads = loads()
+            with self.subTest("read once"):
+                self.assertEqual([map_path, joined_path], reads)  # ? the second node gets the map of the first
+                self.assertEqual([], loads()[1])  # ? a further descriptor load takes the process wide cache
+            with self.subTest("own entries first"):
+                first, second, third = heron._DESCRI['nodes']
+                self.assertEqual({"ger": "german", "eng": "english"}, first['mapping'])
+                self.assertEqual({"ger": "deutsch", "eng": "english"}, second['mapping'])
+                self.assertEqual({"a": "http://example.org/own", "b": "http://example.org/b"}, third['joined_map'])
+                self.assertEqual("german", SpchtCore._REF_FILE_CACHE[map_path][2]['ger'])  # ? the shared map is untouched
+            with self.subTest("touched file"):
+                stats = os.stat(map_path)
+                os.utime(map_path, (stats.st_atime, stats.st_mtime + 10))
+                self.assertEqual([map_path], loads()[1])
+                with open(map_path, "w") as map_file:
+                    json.dump({"ger": "germanic", "eng": "english"}, map_file)
+                heron, reads = loads()
+                self.assertEqual(([map_path], "germanic"), (reads, heron._DESCRI['nodes'][0]['mapping']['ger']))
+
+    def test_file_stamp(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "map.json")
+            with open(file_path, "w") as map_file:
+                map_file.write('{"ger": "german"}')
+            stamp = SpchtUtility.file_stamp(file_path)
+            with self.subTest("unchanged file"):
+                self.assertTrue(SpchtUtility.file_stamp_matches(stamp))
+            with self.subTest("only touched file"):
+                os.utime(file_path, (stamp['mtime'] + 10, stamp['mtime'] + 10))
+                self.assertTrue(SpchtUtility.file_stamp_matches(stamp))
+            with self.subTest("changed file"):
+                with open(file_path, "w") as map_file:
+                    map_file.write('{"ger": "germen"}')
+                self.assertFalse(SpchtUtility.file_stamp_matches(stamp))
+            with self.subTest("missing file"):
+                os.remove(file_path)
+                self.assertIsNone(SpchtUtility.file_stamp_matches(stamp))
+
+    def test_schema_validation_cache(self):
+        schema = {"type": "object", "properties": {"name": {"type": "string"}}, "required": ["name"]}
+        good, bad = {"name": "something"}, {"name": 42}
+        self.assertTrue(SpchtUtility.schema_validation(good, schema)[0])
+        self.assertFalse(SpchtUtility.schema_validation(bad, schema)[0])
+        key, validator = SpchtUtility._schema_validator(schema)
+        with self.subTest("validator reused"):
+            self.assertIs(validator, SpchtUtility._schema_validator(dict(schema))[1])
+        with self.subTest("results remembered"):
+            self.assertEqual(2, len([x for x in SpchtUtility._VALIDATION_RESULTS if x[0] == key]))
+            self.assertEqual(SpchtUtility.schema_validation(bad, schema),
+                             SpchtUtility.schema_validation({"name": 42}, schema))
+
+    def test_descriptor_node_diff(self):
+        old = {"id_source": "dict", "id_field": "id", "nodes": [
+            {"source": "dict", "field": "title", "predicate": "http://example.org/title", "required": "optional"},
+            {"source": "dict", "field": "isbn", "predicate": "http://example.org/isbn", "required": "optional"},
+            {"source": "dict", "field": "issn", "predicate": "http://example.org/isbn", "required": "optional"},
+            {"source": "dict", "field": "kind", "predicate": "http://example.org/type", "required": "optional",
+             "joined_field": "kind", "joined_map": {"a": "http://example.org/a"}}]}
+        new = json.loads(json.dumps(old))
+        self.assertEqual({"predicates": [], "nodes": [], "changed": 0}, SpchtUtility.descriptor_node_diff(old, new))
+        new['nodes'][1]['field'] = "isbn_str"
+        new['nodes'][3]['joined_map']['b'] = "http://example.org/b"
+        diff = SpchtUtility.descriptor_node_diff(old, new)
+        # ? the untouched issn node writes the same predicate and has to be part of the recompute
+        self.assertEqual([1, 2, 3], diff['nodes'])
+        self.assertEqual(["http://example.org/a", "http://example.org/b", "http://example.org/isbn", "http://example.org/type"],
+                         diff['predicates'])
+        new['id_field'] = "other_id"
+        self.assertIsNone(SpchtUtility.descriptor_node_diff(old, new))
+        new = json.loads(json.dumps(old))
+        new['nodes'][0]['sub_nodes'] = [{"source": "dict", "field": "x", "predicate": "http://example.org/x"}]
+        self.assertIsNone(SpchtUtility.descriptor_node_diff(old, new))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
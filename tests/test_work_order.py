@@ -21,28 +21,597 @@
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 
+"""
+the processing and all the insert methods of work orders, the triplestores are stand-ins, see stand_ins.py
+"""
+import io
 import json
+import multiprocessing
 import os
+import re
+import sys
+import time
+import unittest
+import unittest.mock
 
-import SpchtCore.WorkOrder as WorkOrder
-import Utils.local_tools as local_tools
+import Spcht.Core.SpchtErrors as SpchtErrors
+import Spcht.Core.SpchtUtility as SpchtUtility
+import Spcht.Core.WorkOrder as WorkOrder
+import Spcht.Utils.local_tools as local_tools
+from Spcht.Core.SpchtCore import Spcht, SpchtThird, SpchtTriple
+from stand_ins import StandInCase
 
+SCHEMA_PATH = os.path.join(os.path.dirname(SpchtUtility.__file__), "..", "SpchtSchema.json")
+TITLE_NODES = [{"name": "Title", "source": "dict", "field": "title", "predicate": "http://example.org/title",
+                "required": "optional"},
+               {"name": "ISBN", "source": "dict", "field": "isbn", "predicate": "http://example.org/isbn",
+                "required": "optional"}]
+BUDGET_NODES = [dict(TITLE_NODES[0], match="^.*$"), TITLE_NODES[1]]  # ? the title runs through regex_search
 
-"""
-I am not very sure if i really want to do this as unit test, especially cause half of those tests are only possible
-if you actually have a running virtuoso server with the right credentials
-"""
 
-try:
-    with open("work_order_sets.json", "r") as all_orders:
-        ORDERS = json.load(all_orders)
-except json.JSONDecodeError as e:
-    print(e)
-except OSError as osi:
-    print(osi.errno, " - ", osi)
+class TestWorkOrder(StandInCase):
+
+    @staticmethod
+    def claim_entries(order_file: str, result_file: str):
+        # ? runs in a process of its own, each one claims what it gets
+        with open(result_file, "w") as claims:
+            for key in local_tools.load_from_json(order_file)['file_list']:
+                if WorkOrder.ClaimWorkOrderEntry(order_file, key, (4,), 7, 'insert_start'):
+                    claims.write(f"{key}\n")
+
+    def update_order(self, chunks: int, method="sparql") -> str:
+        # ? an update order with processed chunks of two subjects each, ready for the delete and insert steps
+        file_list = {}
+        for key in range(chunks):
+            rdf_file = os.path.join(self.folder, f"chunk{key}_rdf.ttl")
+            subject_file = os.path.join(self.folder, f"chunk{key}_subjects.txt")
+            with open(rdf_file, "w") as rdf, open(subject_file, "w") as subjects:
+                for sub in (f"<http://example.org/{key}a>", f"<http://example.org/{key}b>"):
+                    rdf.write(f"{sub} <http://example.org/p> \"{key}\" .\n")
+                    subjects.write(f"{sub}\n")
+            file_list[str(key)] = {"status": 4, "rdf_file": rdf_file, "subject_file": subject_file}
+        order_file = os.path.join(self.folder, "update.json")
+        with open(order_file, "w") as order:
+            json.dump({"meta": {"status": 4, "fetch": "file", "type": "update", "method": method},
+                       "file_list": file_list}, order)
+        return order_file
+
+    def descriptor(self, nodes: list, name="order") -> Spcht:
+        descriptor_path = os.path.join(self.folder, f"{name}.spcht.json")
+        with open(descriptor_path, "w") as descriptor_file:
+            json.dump({"id_source": "dict", "id_field": "id", "nodes": nodes}, descriptor_file)
+        return Spcht(descriptor_path, schema_path=SCHEMA_PATH)
+
+    def processed_order(self, records: list, nodes: list, typus="insert", name="order", **kwargs) -> str:
+        # ? descriptor, one raw chunk and a fetched work order, processed like FulfillProcessingOrder does it
+        heron = self.descriptor(nodes, name)
+        chunk_file = os.path.join(self.folder, f"{name}_0.json")
+        with open(chunk_file, "w") as chunk:
+            json.dump(records, chunk)
+        order_file = os.path.join(self.folder, f"{name}.json")
+        with open(order_file, "w") as order:
+            json.dump({"meta": {"status": 2, "fetch": "file", "type": typus, "method": "sparql"},
+                       "file_list": {"0": {"file": chunk_file, "status": 2}}}, order)
+        if not WorkOrder.FulfillProcessingOrder(order_file, "http://example.org/", heron, **kwargs):
+            raise AssertionError(f"processing of {order_file} failed")
+        return order_file
+
+    def swap_order(self, method: str) -> str:
+        # ? a processed swap order, the processing wrote 10 triples
+        order_file = os.path.join(self.folder, "swap.json")
+        with open(order_file, "w") as order:
+            json.dump({"meta": {"status": 4, "fetch": "file", "type": "swap", "method": method},
+                       "file_list": {"0": {"status": 4, "elements": 2, "triples": 10}}}, order)
+        return order_file
+
+    @staticmethod
+    def counting_store(store: dict):
+        # ? triple count per graph, enough of an endpoint for the swap, drops and moves change the dictionary
+        def fake_query(query, url, **kwargs):
+            if query.startswith("SELECT"):
+                count = store.get(re.search(r"GRAPH <(.*?)>", query).group(1), 0)
+                return True, {"results": {"bindings": [{"n": {"type": "literal", "value": str(count)}}]}}
+            if query.startswith("DROP"):
+                store.pop(re.search(r"<(.*?)>", query).group(1), None)
+            if query.startswith("MOVE"):
+                source, target = re.findall(r"<(.*?)>", query)
+                store[target] = store.pop(source, 0)
+            return True, ""
+
+        return unittest.mock.patch.object(WorkOrder, "sparqlQuery", fake_query)
+
+    @staticmethod
+    def stalling_regex():
+        # ? the match of a title with 'slow' takes its time, one with 'evil' runs into the timeout of the regex engine
+        search = SpchtUtility.regex_search
+
+        def stalling_search(pattern, text, *args, **kwargs):
+            if "slow" in text:
+                time.sleep(0.2)
+            if "evil" in text:
+                raise SpchtErrors.RegexTimeoutError(f"'{pattern}' took too long")
+            return search(pattern, text, *args, **kwargs)
+
+        return unittest.mock.patch.object(SpchtUtility, "regex_search", stalling_search)
+
+    def test_check_work_order(self):
+        with open(os.path.join(os.path.dirname(__file__), "work_order_sets.json")) as all_orders:
+            orders = json.load(all_orders)
+        order_file = os.path.join(self.folder, "status0.json")
+        with open(order_file, "w") as order:
+            json.dump(orders['status0'], order)
+        self.assertIsNot(False, WorkOrder.CheckWorkOrder(order_file))
+
+    def test_record_time_budget(self):
+        heron = self.descriptor(BUDGET_NODES)
+        with self.stalling_regex():
+            with self.assertRaises(SpchtErrors.RecordTimeoutError):
+                heron.process_data({"id": "1", "title": "slow", "isbn": "111"}, "http://example.org/", time_budget=0.1)
+            # ? the budget belongs to a single record, the next one starts fresh
+            triples = heron.process_data({"id": "2", "title": "fast", "isbn": "222"}, "http://example.org/",
+                                         time_budget=0.1)
+        self.assertEqual(2, len(triples))
+
+    def test_quarantine(self):
+        records = [{"id": "1", "title": "slow", "isbn": "111"}, {"id": "2", "title": "fast", "isbn": "222"},
+                   {"id": "3", "title": "evil", "isbn": "333"}]
+        with self.stalling_regex():
+            order_file = self.processed_order(records, BUDGET_NODES, record_time_budget=0.1)
+            entry = local_tools.load_from_json(order_file)['file_list']["0"]
+            self.assertEqual((1, 2, 1), (entry['elements'], entry['quarantined'], entry['regex_timeouts']))
+            self.assertEqual(os.path.join(self.folder, "order_0_quarantine.jsonl"), entry['quarantine_file'])
+            with open(entry['quarantine_file']) as quarantine:
+                lines = [json.loads(x) for x in quarantine]
+            self.assertEqual([("1", "time_budget", records[0]), ("3", "regex_timeout", records[2])],
+                             [(x['id'], x['reason'], x['record']) for x in lines])
+            heron = self.descriptor(BUDGET_NODES)
+            with self.subTest("replay"):
+                report = WorkOrder.ReplayQuarantine(entry['quarantine_file'], "http://example.org/", heron)
+                self.assertEqual(["1", "3"], [x['id'] for x in report])
+                self.assertEqual(("ok", 2), (report[0]['outcome'], report[0]['triples']))  # ? no budget this time
+                self.assertTrue(report[1]['outcome'].startswith("regex_timeout"))
+                self.assertFalse(heron.debug)  # ? the replay traces the nodes only for itself
+            with self.subTest("rerun"):
+                WorkOrder.UpdateWorkOrder(order_file, update=[("meta", "status", 2), ("file_list", "0", "status", 2)],
+                                          force=True)
+                self.assertTrue(WorkOrder.FulfillProcessingOrder(order_file, "http://example.org/", heron))
+                with open(entry['quarantine_file']) as quarantine:  # ? only the record that still fails, once
+                    self.assertEqual(["3"], [json.loads(x)['id'] for x in quarantine])
+
+    def test_nt_writer(self):
+        records = [{"id": "1", "title": "One", "isbn": "111"}]
+        order_file = self.processed_order(records, TITLE_NODES, rdf_writer="nt")
+        entry = local_tools.load_from_json(order_file)['file_list']["0"]
+        self.assertEqual(os.path.join(self.folder, "order_0_rdf.nt"), entry['rdf_file'])
+        with unittest.mock.patch.dict(sys.modules, {"rdflib": None}):  # ? read line by line, nothing gets parsed
+            self.assertEqual([("<http://example.org/1>", "<http://example.org/title>", '"One"'),
+                              ("<http://example.org/1>", "<http://example.org/isbn>", '"111"')],
+                             list(WorkOrder.ReadTriples(entry['rdf_file'])))
+        document, headers = WorkOrder.GspDocument(entry['rdf_file'])
+        document.close()
+        self.assertEqual("application/n-triples", headers['Content-Type'])
+
+    def test_subject_sidecar(self):
+        records = [{"id": "1", "title": "One", "isbn": ["111", "112"]}, {"id": "2", "title": "Two", "isbn": "222"}]
+        deleted = []
+
+        def fake_delete(subjects, *args, **kwargs):
+            deleted.extend(subjects)
+            return True
+
+        order_file = self.processed_order(records, TITLE_NODES, typus="update")
+        entry = local_tools.load_from_json(order_file)['file_list']["0"]
+        expected = ["<http://example.org/1>", "<http://example.org/2>"]
+        with open(entry['subject_file']) as subject_file:
+            self.assertEqual(expected, subject_file.read().splitlines())  # ? one line per subject, not per triple
+        self.assertEqual(expected, list(WorkOrder.ChunkSubjects(entry)))
+        without = {key: value for key, value in entry.items() if key != "subject_file"}
+        self.assertEqual(expected, sorted(WorkOrder.ChunkSubjects(without)))  # ? orders of older versions
+        WorkOrder.UpdateWorkOrder(order_file, update=("meta", "status", 5), force=True)
+        with unittest.mock.patch.object(WorkOrder, "sparql_delete_values", fake_delete), \
+                unittest.mock.patch.object(WorkOrder, "ReadTriples", side_effect=AssertionError("parsed rdf")):
+            self.assertTrue(WorkOrder.IntermediateStepSparqlDelete(order_file, "http://localhost/sparql", "dba",
+                                                                   "dba", "http://example.org/graph/"))
+        self.assertEqual(expected, deleted)
+        self.assertEqual(6, local_tools.load_from_json(order_file)['file_list']["0"]['status'])
+
+    def test_fused_sparql_update(self):
+        queries = []
+
+        def fake_query(query, *args, **kwargs):
+            queries.append(query)
+            return True, ""
+
+        with unittest.mock.patch.object(WorkOrder, "sparqlQuery", fake_query):
+            order_file = self.update_order(3)
+            self.assertEqual(8, WorkOrder.UseWorkOrder(order_file, sparql_endpoint="http://localhost/sparql", user="dba",
+                                                       password="dba", named_graph="http://example.org/graph/",
+                                                       fused_update=True))
+            order = local_tools.load_from_json(order_file)
+        self.assertTrue(order['meta']['fused_update'])
+        self.assertEqual([8, 8, 8], [x['status'] for x in order['file_list'].values()])
+        self.assertEqual(3, len(queries))  # ? one request per chunk with the delete and the insert of its subjects
+        for key, query in enumerate(queries):
+            delete, insert = query.split(" ;\n")
+            chunk = [f"<http://example.org/{key}a>", f"<http://example.org/{key}b>"]
+            self.assertTrue(delete.startswith("WITH") and insert.startswith("INSERT DATA"))
+            self.assertEqual(chunk, sorted(re.findall(r"<http://example.org/\d\w>", delete)))
+            self.assertEqual(chunk, sorted(re.findall(r"<http://example.org/\d\w>", insert)))
+
+    def test_fused_isql_update(self):
+        virt_folder = os.path.join(self.folder, "virtuoso")
+        os.mkdir(virt_folder)
+        order_file = self.update_order(2, method="isql")
+        self.assertEqual(8, WorkOrder.UseWorkOrder(order_file, isql_path=self.fake_isql(), user="dba",
+                                                   password="dba", named_graph="http://example.org/graph/",
+                                                   virt_folder=virt_folder, fused_update=True))
+        order = local_tools.load_from_json(order_file)
+        with open(os.path.join(self.folder, "statements.log")) as log:
+            statements = log.read().splitlines()
+        self.assertEqual([], os.listdir(virt_folder))  # ? the copies for the bulk loader are removed again
+        self.assertEqual([8, 8], [x['status'] for x in order['file_list'].values()])
+        kinds = [x.split("(")[0].split(" ")[0] for x in statements]
+        self.assertEqual(["sparql", "ld_add", "rdf_loader_run", "checkpoint;"] * 2, kinds)  # ? chunk by chunk
+        for key in range(2):
+            self.assertIn(f"<http://example.org/{key}a> <http://example.org/{key}b>", statements[key * 4])
+            self.assertIn(f"chunk{key}_rdf.ttl", statements[key * 4 + 1])
+
+    def test_bulk_load_isql_order(self):
+        isql_path = self.fake_isql()
+        virt_folder = os.path.join(self.folder, "virtuoso")
+        os.makedirs(virt_folder)
+        file_list = {}
+        for key, name in enumerate(("one", "broken", "three")):
+            rdf_file = os.path.join(self.folder, f"{name}_rdf.nt")
+            with open(rdf_file, "w") as rdf:
+                rdf.write(f"<http://example.org/{name}> <http://example.org/p> \"{name}\" .\n")
+            file_list[str(key)] = {"status": 4, "rdf_file": rdf_file}
+        order_file = os.path.join(self.folder, "order.json")
+        with open(order_file, "w") as order:
+            json.dump({"meta": {"status": 7, "method": "isql"}, "file_list": file_list}, order)
+        self.assertFalse(WorkOrder.FulfillISqlInsertOrder(order_file, isql_path, "dba", "dba", "http://example.org/g",
+                                                          virt_folder=virt_folder, bulk_loaders=2))
+        with open(os.path.join(self.folder, "statements.log")) as log:
+            calls = [x.split("(")[0].strip() for x in log]
+        self.assertEqual(3, calls.count("ld_add"))
+        self.assertEqual(2, calls.count("rdf_loader_run"))
+        self.assertEqual(1, calls.count("checkpoint;"))
+        order = local_tools.load_from_json(order_file)
+        self.assertEqual([8, 7, 8], [order['file_list'][x]['status'] for x in ("0", "1", "2")])
+        self.assertEqual(["broken_rdf.nt"], os.listdir(virt_folder))  # ? loaded copies are gone
+
+    def test_odbc_update_order(self):
+        # ? stands in for pyodbc, statements become visible with the commit, anything 'broken' fails
+        committed, connections = [], []
+
+        class FakeError(Exception):
+            pass
+
+        class FakeCursor:
+            def __init__(self, connection):
+                self.connection = connection
+
+            def execute(self, statement):
+                if "broken" in statement:
+                    raise FakeError("SQ074: syntax error")
+                self.connection.pending.append(statement)
+
+            def close(self):
+                pass
+
+        class FakeConnection:
+            def __init__(self, connection_string, autocommit=True):
+                self.connection_string, self.autocommit, self.pending = connection_string, autocommit, []
+                connections.append(self)
+
+            def cursor(self):
+                return FakeCursor(self)
+
+            def commit(self):
+                committed.extend(self.pending)
+                self.pending = []
+
+            def rollback(self):
+                self.pending = []
+
+            def close(self):
+                pass
+
+        fake_pyodbc = type(sys)("pyodbc")
+        fake_pyodbc.Error, fake_pyodbc.connect = FakeError, FakeConnection
+        with unittest.mock.patch.dict(sys.modules, {"pyodbc": fake_pyodbc}):
+            file_list = {}
+            for key, name in enumerate(("one", "broken", "three")):
+                rdf_file = os.path.join(self.folder, f"{name}_rdf.nt")
+                subject_file = os.path.join(self.folder, f"{name}_subjects.txt")
+                with open(rdf_file, "w") as rdf, open(subject_file, "w") as subjects:
+                    rdf.write(f"<http://example.org/{name}> <http://example.org/p> \"{name}\" .\n")
+                    subjects.write(f"<http://example.org/{name}>\n")
+                file_list[str(key)] = {"status": 4, "rdf_file": rdf_file, "subject_file": subject_file}
+            order_file = os.path.join(self.folder, "order.json")
+            with open(order_file, "w") as order:
+                json.dump({"meta": {"status": 7, "type": "update", "method": "odbc"}, "file_list": file_list}, order)
+            self.assertFalse(WorkOrder.FulfillOdbcUpdateOrder(order_file, "VOS", "dba", "secret", "http://example.org/g",
+                                                              odbc_connections=2))
+            order = local_tools.load_from_json(order_file)
+            self.assertEqual([8, 7, 8], [order['file_list'][x]['status'] for x in ("0", "1", "2")])
+        self.assertLessEqual(len(connections), 2)
+        self.assertEqual("DSN=VOS;UID=dba;PWD=secret", connections[0].connection_string)
+        self.assertFalse(connections[0].autocommit)
+        self.assertEqual(4, len(committed))  # ? delete and insert of the two good chunks, nothing of the broken one
+        self.assertFalse([x for x in committed if "broken" in x or not x.startswith("SPARQL ")])
+        self.assertEqual("DSN=VOS;UID=x", local_tools.odbc_connection_string("DSN=VOS;UID=x", "dba"))
+
+    def test_gsp_insert_order(self):
+        # ? the graph store keeps every body it gets and refuses the broken one
+        import gzip
+        received = []
+
+        def graph_store(method, path, headers, body):
+            received.append((path, headers['Content-Type'], headers.get('Content-Encoding'), body))
+            return (500 if b"broken" in body else 201), {}, b""
+
+        endpoint = f"{self.stand_in_server(graph_store)}/sparql-graph-crud"
+        triple = "<http://example.org/{0}> <http://example.org/p> \"{0}\" .\n"
+        file_list = {}
+        for key, (name, suffix) in enumerate((("one", "_rdf.ttl.gz"), ("two", "_rdf.ttl"), ("broken", "_rdf.ttl"))):
+            rdf_file = os.path.join(self.folder, f"{name}{suffix}")
+            with local_tools.open_file(rdf_file, "w") as rdf:
+                rdf.write(triple.format(name))
+            file_list[str(key)] = {"status": 4, "rdf_file": rdf_file}
+        order_file = os.path.join(self.folder, "order.json")
+        with open(order_file, "w") as order:
+            json.dump({"meta": {"status": 7, "type": "insert", "method": "gsp"}, "file_list": file_list}, order)
+        self.assertFalse(WorkOrder.FulfillGspInsertOrder(order_file, endpoint, "http://example.org/g", gsp_gzip=True))
+        order = local_tools.load_from_json(order_file)
+        self.assertEqual([8, 8, 7], [order['file_list'][x]['status'] for x in ("0", "1", "2")])
+        self.assertEqual(3, len(received))
+        path, content_type, encoding, body = received[0]
+        self.assertEqual("/sparql-graph-crud?graph=http%3A%2F%2Fexample.org%2Fg", path)
+        self.assertEqual(("text/turtle", "gzip"), (content_type, encoding))
+        self.assertEqual(triple.format("one"), gzip.decompress(body).decode("utf-8"))
+        self.assertEqual(triple.format("two").encode("utf-8"), received[1][3])
+        # ? without the flag the compressed file is unpacked before sending
+        document, headers = WorkOrder.GspDocument(file_list["0"]['rdf_file'])
+        with document:
+            self.assertEqual(triple.format("one").encode("utf-8"), document.read())
+        self.assertNotIn("Content-Encoding", headers)
+
+    def test_seed_subject_registry(self):
+        subjects = [f"http://example.org/{i:03d}" for i in range(25)]
+        requests, state = [], {"gone": 0}
+
+        def fake_query(query, *args, **kwargs):
+            if "COUNT" in query:
+                return True, {"results": {"bindings": [{"n": {"type": "literal", "value": str(len(subjects))}}]}}
+            limit, offset = map(int, re.search(r"LIMIT (\d+) OFFSET (\d+)", query).groups())
+            requests.append(offset)
+            rows = subjects[offset:min(offset + limit, len(subjects) - state['gone'])][:10]  # ? capped like virtuoso
+            return True, {"results": {"bindings": [{"s": {"type": "uri", "value": x}} for x in rows]}}
+
+        with unittest.mock.patch.object(WorkOrder, "sparqlQuery", fake_query):
+            graph = "http://example.org/graph/"
+            self.assertTrue(WorkOrder.SeedSubjectRegistry(self.folder, "http://localhost/sparql", graph, page_size=100))
+            self.assertEqual([0, 10, 20, 25], requests)  # ? each page starts after the rows actually received
+            registry = local_tools.SubjectRegistry.for_graph(self.folder, graph)
+            self.assertTrue(all(f"<{x}>" in registry for x in subjects))
+            state['gone'] = 5  # ? the store ends early, less subjects than counted
+            self.assertFalse(WorkOrder.SeedSubjectRegistry(self.folder, "http://localhost/sparql", graph, page_size=100))
+
+    def test_diff_record(self):
+        subject = SpchtThird("http://example.org/1", uri=True)
+        title, isbn = SpchtThird("http://example.org/title", uri=True), SpchtThird("http://example.org/isbn", uri=True)
+        first = [SpchtTriple(subject, title, SpchtThird("One")), SpchtTriple(subject, isbn, SpchtThird("111"))]
+        second = [SpchtTriple(subject, title, SpchtThird("One")), SpchtTriple(subject, isbn, SpchtThird("112"))]
+
+        def diff(store, record, keep_triples=True):
+            files, stats = {x: io.StringIO() for x in ("state", "delta", "retract", "wipe")}, {"unchanged": 0, "changed": 0, "new": 0}
+            added = WorkOrder.DiffRecord(record, store, files, stats, keep_triples)
+            store.commit(tuple(json.loads(x)) for x in files['state'].getvalue().splitlines())
+            return added, {x: y.getvalue() for x, y in files.items()}, stats
+
+        with local_tools.DeltaStore.for_graph(self.folder, "http://example.org/graph/") as store:
+            added, files, stats = diff(store, first)
+            self.assertEqual(first, added)
+            self.assertEqual("<http://example.org/1>\n", files['wipe'])  # ? unknown, replaced entirely
+            self.assertEqual({"unchanged": 0, "changed": 0, "new": 1}, stats)
+            added, files, stats = diff(store, second)
+            self.assertEqual(second[1:], added)
+            self.assertEqual('<http://example.org/1> <http://example.org/isbn> "112" .\n', files['delta'])
+            self.assertEqual('<http://example.org/1> <http://example.org/isbn> "111" .\n', files['retract'])
+            self.assertEqual("", files['wipe'])
+            self.assertEqual({"unchanged": 0, "changed": 1, "new": 0}, stats)
+            pairs = store.lookup(["<http://example.org/1>"])["<http://example.org/1>"][1]
+            self.assertEqual(['<http://example.org/title> "One"', '<http://example.org/isbn> "112"'], pairs)
+            added, files, stats = diff(store, second)
+            self.assertEqual(([], 1, ""), (added, stats['unchanged'], files['state']))
+            diff(store, first, keep_triples=False)
+            self.assertIsNone(store.lookup(["<http://example.org/1>"])["<http://example.org/1>"][1])
+            added, files, stats = diff(store, second)  # ? only the hash is known, no single triples to retract
+            self.assertEqual((second, "<http://example.org/1>\n", ""), (added, files['wipe'], files['retract']))
+
+    def test_delta_update_order(self):
+        graph = "http://example.org/graph/"
+        queries = []
+
+        def fake_query(query, *args, **kwargs):
+            queries.append(query)
+            return True, ""
+
+        settings = {"delta_store": os.path.join(self.folder, "delta"), "named_graph": graph, "delta_triples": True}
+        first = self.processed_order([{"id": "1", "title": "One", "isbn": "111"}], TITLE_NODES, name="first",
+                                     **settings)
+        load_state = WorkOrder.OpenLoadState(**settings)
+        WorkOrder.CommitLoadState(load_state, local_tools.load_from_json(first)['file_list']["0"])
+        WorkOrder.CloseLoadState(load_state)
+        second = self.processed_order([{"id": "1", "title": "One", "isbn": "112"}], TITLE_NODES,
+                                      typus="update", name="second", **settings)
+        entry = local_tools.load_from_json(second)['file_list']["0"]
+        self.assertEqual({"unchanged": 0, "changed": 1, "new": 0}, entry['delta'])
+        self.assertEqual(entry['delta_file'], WorkOrder.InsertFile(entry))
+        self.assertEqual([('<http://example.org/1>', '<http://example.org/isbn>', '"112"')],
+                         list(WorkOrder.ReadTriples(entry['delta_file'])))
+        self.assertEqual(['<http://example.org/1> <http://example.org/isbn> "111" .\n'],
+                         list(WorkOrder.RetractBlocks(entry)))
+        self.assertEqual([], list(WorkOrder.DeleteSubjects(entry)))  # ? nothing to wipe, only a single triple
+        WorkOrder.UpdateWorkOrder(second, update=("meta", "status", 4), force=True)
+        with unittest.mock.patch.object(WorkOrder, "sparqlQuery", fake_query):
+            self.assertTrue(WorkOrder.FulfillSparqlUpdateOrder(second, "http://localhost/sparql", "dba", "dba",
+                                                               **settings))
+        self.assertEqual([f'DELETE DATA {{ GRAPH <{graph}> {{ <http://example.org/1> <http://example.org/isbn> "111" .\n }} }} ;\n'
+                          f'INSERT DATA {{ GRAPH <{graph}> {{ <http://example.org/1> <http://example.org/isbn> "112" .\n }} }}'],
+                         queries)
+        with local_tools.DeltaStore.for_graph(settings['delta_store'], graph) as store:
+            pairs = store.lookup(["<http://example.org/1>"])["<http://example.org/1>"][1]
+        self.assertEqual(['<http://example.org/title> "One"', '<http://example.org/isbn> "112"'], pairs)
+
+    def test_record_index_skips(self):
+        graph = "http://example.org/graph/"
+        settings = {"record_index": os.path.join(self.folder, "index"), "named_graph": graph}
+        records = [{"id": "1", "title": "One", "isbn": "111"}, {"id": "2", "title": "Two", "isbn": "222"}]
+        answer = {"ok": False}
+
+        def fake_query(query, *args, **kwargs):
+            return (True, "") if answer['ok'] else (False, local_tools.SparqlFailure("denied", 401, ""))
+
+        def counts(order_file):
+            entry = local_tools.load_from_json(order_file)['file_list']["0"]
+            return entry['elements'], entry['unchanged_records']
+
+        def insert(order_file):
+            WorkOrder.UpdateWorkOrder(order_file, update=[("meta", "status", 4), ("file_list", "0", "status", 4)],
+                                      force=True)
+            with unittest.mock.patch.object(local_tools, "sparqlQuery", fake_query):
+                return WorkOrder.FulfillSparqlInsertOrder(order_file, "http://localhost/sparql", "dba", "dba", **settings)
+
+        first = self.processed_order(records, TITLE_NODES, name="first", **settings)
+        self.assertEqual((2, 0), counts(first))
+        self.assertFalse(insert(first))
+        with self.subTest("failed insert"):  # ? the hashes only count once the triples are in the graph
+            with local_tools.RecordIndex.for_graph(settings['record_index'], graph) as index:
+                self.assertIsNone(index.get("1"))
+            again = self.processed_order(records, TITLE_NODES, typus="update", name="again", **settings)
+            self.assertEqual((2, 0), counts(again))
+        answer['ok'] = True
+        self.assertTrue(insert(first))
+        with self.subTest("unchanged record"):
+            changed = [records[0], dict(records[1], title="Second")]
+            update = self.processed_order(changed, TITLE_NODES, typus="update", name="update", **settings)
+            self.assertEqual((1, 1), counts(update))
+            rdf_file = local_tools.load_from_json(update)['file_list']["0"]['rdf_file']
+            self.assertEqual({"<http://example.org/2>"}, {x[0] for x in WorkOrder.ReadTriples(rdf_file)})
+        with self.subTest("insert order"):
+            self.assertEqual((2, 0), counts(self.processed_order(records, TITLE_NODES, name="insert", **settings)))
+
+    def test_graph_swap(self):
+        graph = "http://example.org/graph/"
+        store = {graph: 7}
+        with self.counting_store(store):
+            order_file = self.swap_order("sparql")
+            settings = {"subject_registry": os.path.join(self.folder, "registry"), "sparql_endpoint": "http://localhost/sparql",
+                        "user": "dba", "password": "dba", "named_graph": graph}
+            staging = WorkOrder.PrepareGraphSwap(order_file, **settings)
+            self.assertEqual(staging, local_tools.load_from_json(order_file)['meta']['staging_graph'])
+            self.assertTrue(os.path.exists(local_tools.SubjectRegistry.graph_file(settings['subject_registry'], staging)))
+            store[staging] = 5  # ? half of the load went missing, the live graph has to stay
+            self.assertFalse(WorkOrder.SwapStagingGraph(order_file, **settings))
+            self.assertEqual(7, store[graph])
+            store[staging] = 9
+            self.assertTrue(WorkOrder.SwapStagingGraph(order_file, **settings))
+            self.assertEqual({graph: 9}, store)
+            self.assertEqual([os.path.basename(local_tools.SubjectRegistry.graph_file(settings['subject_registry'], graph))],
+                             [x for x in os.listdir(settings['subject_registry']) if x.endswith(".registry")])
+
+    def test_odbc_graph_swap(self):
+        graph = "http://example.org/graph/"
+        store = {graph: 7}
+        loaded = []
+
+        def fake_stage(step, **kwargs):  # ? stands in for the odbc load
+            loaded.append((step, kwargs['named_graph']))
+            store[kwargs['named_graph']] = 10
+            return True
+
+        with self.counting_store(store), unittest.mock.patch.object(WorkOrder, "RunStage", fake_stage):
+            order_file = self.swap_order("odbc")
+            settings = {"work_order_file": order_file, "named_graph": graph, "odbc_dsn": "Virtuoso",
+                        "sparql_endpoint": "http://localhost/sparql", "user": "dba", "password": "dba"}
+            self.assertEqual(8, WorkOrder.UseWorkOrder(**settings))
+            staging = local_tools.load_from_json(order_file)['meta']['staging_graph']
+            self.assertEqual([(WorkOrder.FulfillOdbcInsertOrder, staging)], loaded)
+            self.assertEqual(7, store[graph])
+            WorkOrder.UseWorkOrder(**settings)
+            self.assertEqual({graph: 10}, store)
+
+    def test_claim_work_order_entry(self):
+        order_file = os.path.join(self.folder, "order.json")
+        with open(order_file, "w") as order:
+            json.dump({"meta": {"status": 6}, "file_list": {str(i): {"status": 4} for i in range(40)}}, order)
+        workers = [multiprocessing.Process(target=self.claim_entries,
+                                           args=(order_file, os.path.join(self.folder, f"{i}.txt"))) for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        claimed = []
+        for i in range(4):
+            with open(os.path.join(self.folder, f"{i}.txt")) as claims:
+                claimed += claims.read().split()
+        self.assertEqual(sorted(str(i) for i in range(40)), sorted(claimed))  # ? every entry exactly once
+        order = local_tools.load_from_json(order_file)
+        self.assertTrue(all(x['status'] == 7 and 'insert_start' in x for x in order['file_list'].values()))
+        self.assertIsNone(WorkOrder.ClaimWorkOrderEntry(order_file, "0", (4,), 7, 'insert_start'))
+
+    def test_recompute_order(self):
+        records = [{"id": str(i), "title": f"Title {i}", "isbn": f"{i}{i}{i}"} for i in range(1, 4)]
+        new_nodes = json.loads(json.dumps(TITLE_NODES))
+        new_nodes[1]['field'] = "isbn13"
+        old_cwd = os.getcwd()
+        os.chdir(self.folder)  # ? CreateWorkOrder writes into the current folder
+        try:
+            source = self.processed_order([dict(x, isbn13=f"978{x['isbn']}") for x in records], TITLE_NODES,
+                                          name="source")
+            later = self.processed_order([{"id": "2", "title": "Newer", "isbn": "222", "isbn13": "978new"}],
+                                         TITLE_NODES, typus="update", name="later")
+            new_descriptor = os.path.join(self.folder, "new.spcht.json")
+            with open(new_descriptor, "w") as descriptor_file:
+                json.dump({"id_source": "dict", "id_field": "id", "nodes": new_nodes}, descriptor_file)
+            old_descriptor = os.path.join(self.folder, "source.spcht.json")
+            arguments = ("recompute", source, old_descriptor, new_descriptor, "sparql")
+            with self.subTest("unfinished later order"):
+                self.assertFalse(WorkOrder.CreateRecomputeOrder(*arguments, later_orders=[later]))
+            for each in (source, later):
+                WorkOrder.UpdateWorkOrder(each, update=("meta", "status", 9), force=True)
+            order_file = WorkOrder.CreateRecomputeOrder(*arguments, later_orders=[later])
+            order = local_tools.load_from_json(order_file)
+            self.assertEqual(2, order['meta']['status'])
+            self.assertEqual([1], order['meta']['recompute']['nodes'])  # ? only the isbn node is processed again
+            self.assertEqual(["http://example.org/isbn"], order['meta']['recompute']['predicates'])
+            first, second = order['file_list']["0"], order['file_list']["1"]
+            self.assertEqual(os.path.join(self.folder, "source_0.json"), first['source_file'])
+            self.assertEqual(["1", "3"], [x['id'] for x in local_tools.load_from_json(first['file'])])
+            self.assertEqual({"file": os.path.join(self.folder, "later_0.json"), "status": 2}, second)
+            heron = Spcht(new_descriptor, schema_path=SCHEMA_PATH)
+            with self.subTest("filter is reset after a failure"):
+                with unittest.mock.patch.object(heron, "process_data", side_effect=RuntimeError("broken")):
+                    self.assertFalse(WorkOrder.FulfillProcessingOrder(order_file, "http://example.org/", heron))
+                self.assertIsNone(heron.node_filter)
+                WorkOrder.UpdateWorkOrder(order_file, update=[("file_list", "0", "status", 2)], force=True)
+            self.assertTrue(WorkOrder.FulfillProcessingOrder(order_file, "http://example.org/", heron))
+            self.assertIsNone(heron.node_filter)
+            order = local_tools.load_from_json(order_file)
+            triples = sorted(x for entry in order['file_list'].values() for x in WorkOrder.ReadTriples(entry['rdf_file']))
+            self.assertEqual([("<http://example.org/1>", "<http://example.org/isbn>", '"978111"'),
+                              ("<http://example.org/2>", "<http://example.org/isbn>", '"978new"'),
+                              ("<http://example.org/3>", "<http://example.org/isbn>", '"978333"')], triples)
+            WorkOrder.UpdateWorkOrder(order_file, update=[("meta", "status", 8), ("file_list", "0", "status", 8),
+                                                          ("file_list", "1", "status", 8)], force=True)
+            self.assertTrue(WorkOrder.CleanUpWorkOrder(order_file))
+            self.assertFalse(os.path.exists(first['file']))  # ? the rewritten chunk belongs to the recompute
+            self.assertTrue(os.path.exists(first['source_file']) and os.path.exists(second['file']))
+        finally:
+            os.chdir(old_cwd)
 
-with open("temp_throwaway.json", "w") as temp_file:
-    json.dump(ORDERS['status0'], temp_file)
-WorkOrder.CheckWorkOrder("temp_throwaway.json")
-os.remove("temp_throwaway.json")
 
+if __name__ == '__main__':
+    unittest.main()